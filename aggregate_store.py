@@ -0,0 +1,185 @@
+import os
+import sqlite3
+import time
+import argparse
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+
+DEFAULT_STORE_PATH = 'data/aggregates.sqlite'
+
+# Приращение по продажам между двумя значениями saleid, агрегированное в базе
+DAILY_DELTA_QUERY = """
+SELECT DATE(s.saletime) as sale_date,
+       c.catname,
+       u.state,
+       COUNT(s.saleid) as sales_count,
+       SUM(s.pricepaid) as revenue,
+       SUM(s.qtysold) as tickets,
+       SUM(l.priceperticket) as listprice_sum
+FROM sale s
+JOIN events e ON s.eventid = e.eventid
+JOIN category c ON e.catid = c.catid
+JOIN "user" u ON s.buyerid = u.userid
+JOIN listing l ON s.listid = l.listid
+WHERE s.saleid > :low AND s.saleid <= :high
+GROUP BY DATE(s.saletime), c.catname, u.state
+"""
+
+VENUE_DELTA_QUERY = """
+SELECT v.venueid, e.eventid, v.venuename, v.venuecity, v.venuestate,
+       COUNT(s.saleid) as sales_count,
+       SUM(s.pricepaid) as revenue
+FROM sale s
+JOIN events e ON s.eventid = e.eventid
+JOIN venue v ON e.venueid = v.venueid
+WHERE s.saleid > :low AND s.saleid <= :high
+GROUP BY v.venueid, e.eventid, v.venuename, v.venuecity, v.venuestate
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_sales (
+    sale_date TEXT NOT NULL,
+    catname TEXT NOT NULL,
+    state TEXT NOT NULL,
+    sales_count INTEGER NOT NULL,
+    revenue REAL NOT NULL,
+    tickets INTEGER NOT NULL,
+    listprice_sum REAL NOT NULL,
+    PRIMARY KEY (sale_date, catname, state)
+);
+CREATE TABLE IF NOT EXISTS venue_events (
+    venueid INTEGER NOT NULL,
+    eventid INTEGER NOT NULL,
+    venuename TEXT,
+    venuecity TEXT,
+    venuestate TEXT,
+    sales_count INTEGER NOT NULL,
+    revenue REAL NOT NULL,
+    PRIMARY KEY (venueid, eventid)
+);
+CREATE TABLE IF NOT EXISTS watermark (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_saleid INTEGER NOT NULL,
+    last_saletime TEXT,
+    refreshed_at TEXT NOT NULL
+);
+"""
+
+UPSERT_DAILY = """
+INSERT INTO daily_sales (sale_date, catname, state, sales_count, revenue, tickets, listprice_sum)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (sale_date, catname, state) DO UPDATE SET
+    sales_count = sales_count + excluded.sales_count,
+    revenue = revenue + excluded.revenue,
+    tickets = tickets + excluded.tickets,
+    listprice_sum = listprice_sum + excluded.listprice_sum
+"""
+
+UPSERT_VENUE = """
+INSERT INTO venue_events (venueid, eventid, venuename, venuecity, venuestate, sales_count, revenue)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (venueid, eventid) DO UPDATE SET
+    venuename = excluded.venuename,
+    venuecity = excluded.venuecity,
+    venuestate = excluded.venuestate,
+    sales_count = sales_count + excluded.sales_count,
+    revenue = revenue + excluded.revenue
+"""
+
+
+class AggregateStore:
+    """Локальное хранилище дневных агрегатов продаж с инкрементальным обновлением.
+
+    Обновление опирается на монотонно растущий saleid: строки с saleid ниже
+    сохраненной отметки, добавленные задним числом, подхватит только полная пересборка.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def watermark(self):
+        """Текущая отметка: (последний saleid, время последней продажи)"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT last_saleid, last_saletime FROM watermark WHERE id = 1").fetchone()
+        return row if row else (0, None)
+
+    def refresh(self, engine, full_rebuild=False):
+        """Догрузка продаж после отметки saleid (или полная пересборка)"""
+        started = time.perf_counter()
+        low = 0 if full_rebuild else self.watermark()[0]
+
+        with engine.connect() as db:
+            high, last_saletime = db.execute(
+                text("SELECT MAX(saleid), MAX(saletime) FROM sale")).one()
+            high = high or 0
+            if high <= low and not full_rebuild:
+                print(f"[INFO] Агрегаты актуальны, отметка saleid={low}")
+                return 0
+
+            params = {'low': low, 'high': high}
+            daily = pd.read_sql_query(text(DAILY_DELTA_QUERY), db, params=params)
+            venues = pd.read_sql_query(text(VENUE_DELTA_QUERY), db, params=params)
+
+        daily['sale_date'] = pd.to_datetime(daily['sale_date']).dt.strftime('%Y-%m-%d')
+        daily = daily.astype({'sales_count': 'int64', 'revenue': 'float64',
+                              'tickets': 'int64', 'listprice_sum': 'float64'})
+        venues = venues.astype({'venueid': 'int64', 'eventid': 'int64',
+                                'sales_count': 'int64', 'revenue': 'float64'})
+
+        with closing(self._connect()) as conn:
+            with conn:
+                if full_rebuild:
+                    conn.execute("DELETE FROM daily_sales")
+                    conn.execute("DELETE FROM venue_events")
+                conn.executemany(UPSERT_DAILY, daily.itertuples(index=False, name=None))
+                conn.executemany(UPSERT_VENUE, venues.itertuples(index=False, name=None))
+                conn.execute(
+                    "INSERT OR REPLACE INTO watermark (id, last_saleid, last_saletime, refreshed_at) "
+                    "VALUES (1, ?, ?, ?)",
+                    (int(high), str(last_saletime) if last_saletime is not None else None,
+                     datetime.now().isoformat(timespec='seconds')))
+
+        mode = "Полная пересборка" if full_rebuild else "Инкрементальное обновление"
+        new_sales = int(daily['sales_count'].sum())
+        print(f"[SUCCESS] {mode} агрегатов: {new_sales} продаж (saleid {low}..{high}), "
+              f"{time.perf_counter() - started:.2f} с")
+        return new_sales
+
+    def load_daily(self):
+        """Агрегаты день × категория × штат"""
+        with closing(self._connect()) as conn:
+            df = pd.read_sql_query("SELECT * FROM daily_sales", conn)
+        df['sale_date'] = pd.to_datetime(df['sale_date'])
+        return df.astype({'catname': 'category', 'state': 'category'})
+
+    def load_venues(self):
+        """Агрегаты площадка × событие"""
+        with closing(self._connect()) as conn:
+            df = pd.read_sql_query("SELECT * FROM venue_events", conn)
+        return df.astype({'venuename': 'category', 'venuecity': 'category', 'venuestate': 'category'})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Обновление локального хранилища агрегатов продаж")
+    parser.add_argument('--full-rebuild', action='store_true', help="пересобрать агрегаты с нуля")
+    parser.add_argument('--path', default=DEFAULT_STORE_PATH, help="путь к файлу хранилища")
+    args = parser.parse_args(argv)
+
+    from db import get_engine
+    AggregateStore(args.path).refresh(get_engine(), full_rebuild=args.full_rebuild)
+
+
+if __name__ == "__main__":
+    main()
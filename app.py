@@ -1,9 +1,15 @@
-from flask import Flask, render_template, send_file, send_from_directory
+from flask import (Flask, render_template, send_file, send_from_directory, jsonify, request,
+                   Response, stream_with_context, abort)
 import os
-import glob
-from datetime import datetime
-import subprocess
 import sys
+import mimetypes
+
+from werkzeug.exceptions import NotFound
+
+from jobs import JobManager
+from artifacts import ArtifactIndex, ENCODINGS, version
+import plot_payload
+from time_window import window_from_args
 
 app = Flask(__name__)
 
@@ -12,138 +18,194 @@ import io
 
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
+jobs = JobManager(max_workers=int(os.environ.get('JOB_WORKERS', 2)))
+
+# Списки графиков и отчетов на страницах - из манифеста артефактов в памяти, без обхода каталогов
+artifact_index = ArtifactIndex()
+
+# Срок кэширования в браузере файлов, адрес которых меняется вместе с содержимым:
+# общего plotly.js с версией в имени и файлов из манифеста с хэшем в адресе (?v=), - год
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _display_name(filename):
+    """Название графика по имени файла"""
+    return os.path.splitext(filename)[0].replace('_', ' ').title()
+
+
+def _interactive_list():
+    return [{'filename': entry['filename'], 'name': _display_name(entry['filename']), 'version': version(entry)}
+            for entry in artifact_index.artifacts('interactive')]
+
 
 @app.route('/')
 def index():
     """Главная страница с графиками"""
-    chart_files = glob.glob('charts/*.png')
     charts = []
-
-    for chart_file in chart_files:
-        chart_name = os.path.basename(chart_file)
-        chart_type = chart_name.replace('.png', '').replace('_', ' ').title()
+    for entry in artifact_index.artifacts('chart'):
+        export = artifact_index.get(f"exports/charts/{entry['filename']}")
         charts.append({
-            'filename': chart_name,
-            'name': chart_type,
-            'created_time': datetime.fromtimestamp(os.path.getctime(chart_file)).strftime('%Y-%m-%d %H:%M:%S')
+            'filename': entry['filename'],
+            'name': _display_name(entry['filename']),
+            'fresh': entry.get('fresh', False),
+            'checked_time': (entry.get('checked_at') or '').replace('T', ' '),
+            'version': version(entry),
+            'export_filename': export['filename'] if export else None,
+            'export_version': version(export) if export else None
         })
 
-    interactive_charts = glob.glob('charts/*.html')
-    interactive_list = []
-
-    for chart_file in interactive_charts:
-        chart_name = os.path.basename(chart_file)
-        chart_type = chart_name.replace('.html', '').replace('_', ' ').title()
-        interactive_list.append({
-            'filename': chart_name,
-            'name': chart_type
-        })
-
-    excel_files = glob.glob('exports/*.xlsx')
     exports = []
-
-    for excel_file in excel_files:
+    for entry in artifact_index.artifacts('export'):
         exports.append({
-            'filename': os.path.basename(excel_file),
-            'size': f"{os.path.getsize(excel_file) / 1024:.1f} KB"
+            'filename': entry['filename'],
+            'size': f"{entry['size'] / 1024:.1f} KB",
+            'version': version(entry)
         })
 
     return render_template('index.html',
                            charts=charts,
-                           interactive_charts=interactive_list,
+                           interactive_charts=_interactive_list(),
                            exports=exports)
 
 
+def _accepted_encoding(entry):
+    """Сжатая копия из манифеста, которую принимает клиент (Accept-Encoding), или None"""
+    for encoding, suffix in ENCODINGS:
+        if encoding in entry.get('encodings', {}) and request.accept_encodings[encoding] > 0:
+            return encoding, suffix
+    return None
+
+
+def _send_artifact(directory, filename, as_attachment=False):
+    """Отдача созданного файла: сжатая копия по Accept-Encoding, строгий ETag по хэшу
+    содержимого, долгое кэширование для адресов с версией и запросы диапазонов (Range)"""
+    entry = artifact_index.current(f'{directory}/{filename}')
+    hashed = plot_payload.is_plotly_js(filename) or (
+        entry is not None and request.args.get('v') == version(entry))
+    max_age = IMMUTABLE_MAX_AGE if hashed else 0
+    if entry is None:
+        # Файла нет в манифесте (или он перезаписан после записи манифеста) - отдача как есть
+        response = send_from_directory(directory, filename, as_attachment=as_attachment, max_age=max_age)
+        response.cache_control.immutable = hashed or None
+        return response
+
+    accepted = _accepted_encoding(entry)
+    response = None
+    if accepted is not None:
+        encoding, suffix = accepted
+        try:
+            # У каждого представления свой строгий ETag: байты сжатой копии другие
+            response = send_from_directory(directory, filename + suffix, as_attachment=as_attachment,
+                                           download_name=filename, mimetype=mimetypes.guess_type(filename)[0],
+                                           etag=f"{entry['sha256']}-{encoding}", max_age=max_age)
+            response.headers['Content-Encoding'] = encoding
+        except NotFound:
+            response = None
+    if response is None:
+        response = send_from_directory(directory, filename, as_attachment=as_attachment,
+                                       etag=entry['sha256'], max_age=max_age)
+    if entry.get('encodings'):
+        response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = hashed or None
+    return response
+
+
 @app.route('/charts/<filename>')
 def serve_chart(filename):
     """Отдача файлов графиков"""
-    return send_file(f'charts/{filename}')
+    return _send_artifact('charts', filename)
 
 
 @app.route('/interactive/<filename>')
 def serve_interactive_chart(filename):
-    """Отдача интерактивных HTML графиков"""
-    return send_from_directory('charts', filename)
+    """Отдача интерактивных HTML графиков и общего файла plotly.js"""
+    return _send_artifact('charts', filename)
 
 
 @app.route('/exports/<filename>')
 def serve_export(filename):
-    """Отдача Excel файлов"""
-    return send_file(f'exports/{filename}')
+    """Отдача Excel файлов (с поддержкой докачки по диапазонам)"""
+    return _send_artifact('exports', filename)
+
+
+@app.route('/exports/charts/<filename>')
+def serve_export_chart(filename):
+    """Отдача графиков высокого разрешения для печати"""
+    return _send_artifact('exports/charts', filename, as_attachment=True)
+
+
+def _complete_analysis_job(job):
+    """Задача полного анализа в потоке пула (тяжелые библиотеки загружаются при первом запуске)"""
+    from analytics import TicketSalesAnalyzer
+    from shards import default_shard_set
+    # С DATABASE_SHARDS полный анализ выполняется по всем шардам
+    analyzer = TicketSalesAnalyzer(shards=default_shard_set())
+    analyzer.run_complete_analysis(progress=job.progress)
+    if analyzer.errors:
+        # Ошибки этапов печатаются и не прерывают анализ, но задача считается неуспешной
+        raise RuntimeError(f"Анализ завершен с ошибками ({len(analyzer.errors)}): {analyzer.errors[0]}")
+
+
+def _import_analysis_stack():
+    """Прогрев пула: однократный импорт тяжелых библиотек анализа"""
+    import analytics
 
 
 @app.route('/run-analysis')
 def run_analysis():
-    """Запуск анализа и обновление страницы"""
-    try:
-        env = os.environ.copy()
-        env['PYTHONIOENCODING'] = 'utf-8'
-
-        result = subprocess.run(
-            [sys.executable, "analytics.py"],
-            capture_output=True,
-            text=True,
-            cwd=os.getcwd(),
-            env=env,
-            encoding='utf-8',
-            errors='replace'
-        )
-
-        output = result.stdout if result.stdout else "Нет вывода"
-        error = result.stderr if result.stderr else "Нет ошибок"
-
-        if result.returncode == 0:
-            return f"""
-            <html>
-            <head>
-                <meta charset="UTF-8">
-                <title>Анализ завершен</title>
-            </head>
-            <body style="font-family: Arial; padding: 20px;">
-                <h2 style="color: green;">Анализ успешно выполнен!</h2>
-                <h3>Вывод программы:</h3>
-                <pre style="background: #f5f5f5; padding: 15px; border-radius: 5px; white-space: pre-wrap;">{output}</pre>
-                <a href='/' style="background: #007bff; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Вернуться на главную</a>
-            </body>
-            </html>
-            """
-        else:
-            return f"""
-            <html>
-            <head>
-                <meta charset="UTF-8">
-                <title>Ошибка анализа</title>
-            </head>
-            <body style="font-family: Arial; padding: 20px;">
-                <h2 style="color: red;">Ошибка при выполнении анализа</h2>
-                <h3>Вывод программы:</h3>
-                <pre style="background: #f5f5f5; padding: 15px; border-radius: 5px; white-space: pre-wrap;">{output}</pre>
-                <h3>Ошибки:</h3>
-                <pre style="background: #ffe6e6; padding: 15px; border-radius: 5px; white-space: pre-wrap; color: red;">{error}</pre>
-                <a href='/' style="background: #007bff; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Вернуться на главную</a>
-            </body>
-            </html>
-            """
-    except Exception as e:
-        return f"""
-        <html>
-        <head>
-            <meta charset="UTF-8">
-        </head>
-        <body style="font-family: Arial; padding: 20px;">
-            <h2 style="color: red;">Ошибка: {e}</h2>
-            <a href='/' style="background: #007bff; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Вернуться на главную</a>
-        </body>
-        </html>
-        """
+    """Постановка полного анализа в фоновую очередь и страница прогресса"""
+    job, created = jobs.submit('complete_analysis', _complete_analysis_job, "Полный анализ")
+    return render_template('job.html', job=job.to_dict(), joined=not created)
+
+
+@app.route('/jobs')
+def list_jobs():
+    """Список последних фоновых задач"""
+    return jsonify([job.to_dict() for job in jobs.list()])
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Статус и прогресс фоновой задачи"""
+    job = jobs.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/log')
+def job_log(job_id):
+    """Потоковая отдача журнала задачи (follow=0 - только накопленный вывод)"""
+    job = jobs.get(job_id)
+    if job is None:
+        abort(404)
+    offset = request.args.get('offset', 0, type=int)
+    if request.args.get('follow', '1') == '0':
+        return Response(''.join(line + '\n' for line in job.lines[offset:]), mimetype='text/plain')
+    return Response(stream_with_context(job.follow(offset)), mimetype='text/plain',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+
+def _sample_from_args():
+    """Выборка для приближенного построения из ?sample=<процент>&sample_method=, иначе None"""
+    if 'sample' not in request.args:
+        return None
+    from sampling import SaleSample
+    return SaleSample(float(request.args['sample']), request.args.get('sample_method', 'system'))
 
 
 @app.route('/create-interactive-category')
 def create_interactive_category():
-    """Создание только интерактивной диаграммы категорий"""
+    """Создание только интерактивной диаграммы категорий (?sample=10 - панель продаж по выборке)"""
     try:
         from analytics import TicketSalesAnalyzer
-        analyzer = TicketSalesAnalyzer()
+        from query_cache import get_default_cache
+        from shards import default_shard_set
+        analyzer = TicketSalesAnalyzer(query_cache=get_default_cache(), shards=default_shard_set())
+        sample = _sample_from_args()
+        if sample is not None:
+            analyzer.sample = sample
+            analyzer.approx_steps = {'advanced_interactive_dashboard'}
 
         analyzer.create_interactive_category_sales()
         analyzer.create_advanced_interactive_dashboard()
@@ -181,21 +243,196 @@ def create_interactive_category():
         """
 
 
+@app.route('/cache/stats')
+def cache_stats():
+    """Счетчики кэша результатов запросов"""
+    from query_cache import get_default_cache
+    return jsonify(get_default_cache().stats())
+
+
+@app.route('/cache/invalidate', methods=['POST'])
+def cache_invalidate():
+    """Сброс кэша результатов запросов (целиком или по тексту запроса)"""
+    from query_cache import get_default_cache
+    query = request.form.get('query')
+    removed = get_default_cache().invalidate(query)
+    return jsonify({'invalidated': removed})
+
+
+_chart_renderer = None
+
+
+def _get_chart_renderer():
+    """Общий для процесса отрисовщик графиков по запросу"""
+    global _chart_renderer
+    if _chart_renderer is None:
+        from chart_render import ChartRenderer
+        from query_cache import get_default_cache
+        from shards import default_shard_set
+        _chart_renderer = ChartRenderer(query_cache=get_default_cache(),
+                                        source=os.environ.get('RENDER_SOURCE', 'sql'),
+                                        shards=default_shard_set())
+    return _chart_renderer
+
+
+@app.route('/render/<chart_name>')
+def render_chart(chart_name):
+    """Отрисовка графика по запросу: ?start=&end= (или last_days=, year=, window=)&dpi=&format=png|svg|webp
+    (&sample=<процент> - приближенно по выборке продаж, для графиков с таким вариантом)"""
+    from chart_render import RENDERABLE_CHARTS, RENDER_FORMATS
+    if chart_name not in RENDERABLE_CHARTS:
+        abort(404)
+    fmt = request.args.get('format', 'png').lower()
+    if fmt not in RENDER_FORMATS:
+        abort(400)
+    try:
+        dpi = int(request.args.get('dpi', 100))
+        window = window_from_args(request.args)
+        sample = _sample_from_args()
+    except ValueError:
+        abort(400)
+
+    chart = _get_chart_renderer().render(chart_name, window=window, dpi=dpi, fmt=fmt, sample=sample)
+    if chart is None:
+        abort(404)
+    return send_file(io.BytesIO(chart.body), mimetype=chart.mimetype, etag=chart.etag,
+                     last_modified=chart.rendered_at, conditional=True, max_age=0)
+
+
+@app.route('/render/stats')
+def render_stats():
+    """Счетчики кэша отрисованных графиков"""
+    return jsonify(_get_chart_renderer().cache.stats())
+
+
+_sales_api = None
+
+# Срок, в течение которого браузер использует ответ API без перепроверки
+API_MAX_AGE = int(os.environ.get('API_MAX_AGE', 60))
+
+
+def _get_sales_api():
+    """Общий для процесса источник данных API"""
+    global _sales_api
+    if _sales_api is None:
+        from sales_api import SalesAPI
+        from query_cache import get_default_cache
+        from shards import default_shard_set
+        _sales_api = SalesAPI(query_cache=get_default_cache(),
+                              source=os.environ.get('API_SOURCE', 'sql'),
+                              shards=default_shard_set())
+    return _sales_api
+
+
+def _list_arg(name):
+    """Значения параметра: повторами (?state=CA&state=NY) или через запятую"""
+    return [value.strip() for arg in request.args.getlist(name) for value in arg.split(',') if value.strip()]
+
+
+def _api_response(dataset):
+    """Ответ API: колоночный JSON или Arrow IPC (?format=arrow или Accept), с ETag"""
+    from sales_api import API_FORMATS, DEFAULT_LIMIT
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'arrow' if request.accept_mimetypes.best == API_FORMATS['arrow'] else 'json'
+    if fmt not in API_FORMATS:
+        abort(400)
+    # Ошибка настройки источника API - не ошибка параметров запроса
+    api = _get_sales_api()
+    try:
+        window = window_from_args(request.args)
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+        result = api.encoded(dataset, fmt, window=window,
+                             categories=_list_arg('category'), states=_list_arg('state'),
+                             limit=limit, split=request.args.get('by') or None)
+    except ValueError:
+        abort(400)
+    if result is None:
+        abort(500)
+
+    response = Response(result.body, mimetype=result.mimetype)
+    response.set_etag(result.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = API_MAX_AGE
+    response.vary.add('Accept')
+    return response.make_conditional(request)
+
+
+@app.route('/api/sales/daily')
+def api_sales_daily():
+    """Продажи по дням: ?start=&end=&category=&state=&by=category|state&limit=&format=json|arrow"""
+    return _api_response('daily')
+
+
+@app.route('/api/sales/by-category')
+def api_sales_by_category():
+    """Продажи по категориям с фильтрами"""
+    return _api_response('by-category')
+
+
+@app.route('/api/sales/by-state')
+def api_sales_by_state():
+    """Продажи по штатам покупателей с фильтрами"""
+    return _api_response('by-state')
+
+
+@app.route('/api/venues/top')
+def api_top_venues():
+    """Площадки по выручке; state фильтрует по штату площадки"""
+    return _api_response('top-venues')
+
+
+@app.route('/api/sales/filters')
+def api_sales_filters():
+    """Значения фильтров: категории и штаты"""
+    return jsonify(_get_sales_api().filter_values())
+
+
+@app.route('/explorer')
+def sales_explorer():
+    """Клиентская страница графиков, запрашивающая данные через API"""
+    return render_template('sales_explorer.html', plotly_js=plot_payload.ensure_plotly_js('charts'))
+
+
+@app.route('/last-run')
+def last_run():
+    """Разбивка последнего запуска анализа по этапам и фазам"""
+    from tracing import load_last_run
+    phases = [('query', 'Запрос'), ('frame_build', 'Подготовка данных'),
+              ('render', 'Отрисовка'), ('write', 'Запись')]
+    return render_template('last_run.html', run=load_last_run(), phases=phases)
+
+
+@app.route('/last-run.json')
+def last_run_json():
+    """Сводка последнего запуска в JSON"""
+    from tracing import load_last_run
+    run = load_last_run()
+    if run is None:
+        abort(404)
+    return jsonify(run)
+
+
+@app.route('/metrics')
+def metrics():
+    """Метрики процесса: пул соединений с базой и кэши"""
+    from db import pool_status
+    from query_cache import get_default_cache
+    result = {
+        'db_pool': pool_status(),
+        'query_cache': get_default_cache().stats(),
+        'jobs': {'total': len(jobs.list()),
+                 'running': sum(1 for job in jobs.list() if job.status == 'running')},
+    }
+    if _chart_renderer is not None:
+        result['render_cache'] = _chart_renderer.cache.stats()
+    return jsonify(result)
+
+
 @app.route('/interactive-charts')
 def interactive_charts():
     """Страница со всеми интерактивными графиками"""
-    interactive_files = glob.glob('charts/*.html')
-    charts = []
-
-    for chart_file in interactive_files:
-        chart_name = os.path.basename(chart_file)
-        chart_display_name = chart_name.replace('.html', '').replace('_', ' ').title()
-        charts.append({
-            'filename': chart_name,
-            'name': chart_display_name
-        })
-
-    return render_template('interactive_charts.html', charts=charts)
+    return render_template('interactive_charts.html', charts=_interactive_list())
 
 
 if __name__ == '__main__':
@@ -203,5 +440,10 @@ if __name__ == '__main__':
     os.makedirs('exports', exist_ok=True)
     os.makedirs('templates', exist_ok=True)
 
+    # По умолчанию сервер стартует только с Flask; ANALYSIS_WARM_UP=1 заранее
+    # загружает pandas/matplotlib/SQLAlchemy в фоне, чтобы первый анализ не ждал импорта
+    if os.environ.get('ANALYSIS_WARM_UP', '0') == '1':
+        jobs.warm_up(_import_analysis_stack)
+
     print("Запуск веб-сервера на http://127.0.0.1:56777")
     app.run(host='127.0.0.1', port=56777, debug=False)
\ No newline at end of file
@@ -0,0 +1,182 @@
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from sqlalchemy import text
+
+
+FETCH_BACKENDS = ('pandas', 'arrow')
+
+# Блок разбора CSV: типы колонок выводятся по первому блоку
+BLOCK_SIZE = 16 * 2 ** 20
+
+
+def default_backend():
+    """Способ выборки результатов из окружения (FETCH_BACKEND)"""
+    backend = os.environ.get('FETCH_BACKEND', 'pandas')
+    return backend if backend in FETCH_BACKENDS else 'pandas'
+
+
+def supports_copy(engine):
+    return engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2'
+
+
+def arrow_to_frame(table):
+    """DataFrame из таблицы Arrow: строки остаются в Arrow, числа и даты - без копирования в numpy"""
+    def types_mapper(arrow_type):
+        if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+            return pd.StringDtype('pyarrow')
+        return None
+    return table.to_pandas(types_mapper=types_mapper, date_as_object=False)
+
+
+class _CopyStream:
+    """COPY (запрос) TO STDOUT в отдельном потоке, вывод читается из канала"""
+
+    def __init__(self, engine, query, params):
+        self.connection = engine.raw_connection()
+        self.error = None
+        self.reader = self._writer = None
+        try:
+            with self.connection.cursor() as cursor:
+                sql = cursor.mogrify(str(text(query).compile(dialect=engine.dialect)), params or {})
+            if isinstance(sql, bytes):
+                sql = sql.decode(self.connection.encoding or 'utf-8')
+            self.sql = f"COPY ({sql.strip().rstrip(';')}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+            read_fd, write_fd = os.pipe()
+            self.reader = os.fdopen(read_fd, 'rb')
+            self._writer = os.fdopen(write_fd, 'wb')
+            self._thread = threading.Thread(target=self._copy, daemon=True)
+            self._thread.start()
+        except BaseException:
+            # Поток COPY не запущен: канал и соединение из пула освобождаются здесь, а не в close()
+            for stream in (self.reader, self._writer):
+                if stream is not None:
+                    stream.close()
+            self.connection.close()
+            raise
+
+    def _copy(self):
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.copy_expert(self.sql, self._writer)
+        except Exception as e:
+            self.error = e
+        finally:
+            try:
+                self._writer.close()
+            except OSError:
+                pass
+
+    def close(self):
+        """Закрытие канала и соединения; COPY, писавший в закрытый канал, завершается"""
+        if not self.reader.closed:
+            self.reader.close()
+            self._thread.join()
+            self.connection.close()
+
+    def raise_error(self):
+        """Ошибка COPY (например, в тексте запроса), если она была"""
+        self.close()
+        if self.error is not None and not isinstance(self.error, BrokenPipeError):
+            raise self.error
+
+
+def _read_options(column_types):
+    return (pa_csv.ReadOptions(block_size=BLOCK_SIZE),
+            pa_csv.ParseOptions(newlines_in_values=True),
+            pa_csv.ConvertOptions(column_types=column_types or {}, strings_can_be_null=True))
+
+
+def read_arrow_table(engine, query, params=None, column_types=None):
+    """Результат запроса как таблица Arrow: в PostgreSQL - через COPY в CSV, разбираемый Arrow"""
+    if not supports_copy(engine):
+        # Без COPY: обычная выборка с переводом в Arrow
+        frame = pd.read_sql_query(text(query), engine, params=params) if params \
+            else pd.read_sql_query(query, engine)
+        return pa.Table.from_pandas(frame, preserve_index=False)
+
+    read_options, parse_options, convert_options = _read_options(column_types)
+    stream = _CopyStream(engine, query, params)
+    try:
+        table = pa_csv.read_csv(stream.reader, read_options=read_options,
+                                parse_options=parse_options, convert_options=convert_options)
+    except pa.ArrowInvalid:
+        # Пустой или оборванный CSV - следствие ошибки COPY, она важнее
+        stream.raise_error()
+        raise
+    finally:
+        stream.close()
+    stream.raise_error()
+    return table
+
+
+def iter_record_batches(engine, query, params=None, column_types=None):
+    """Потоковое чтение результата блоками Arrow с ограниченным потреблением памяти"""
+    if not supports_copy(engine):
+        for frame in pd.read_sql_query(text(query), engine, params=params, chunksize=200_000):
+            yield from pa.Table.from_pandas(frame, preserve_index=False).to_batches()
+        return
+
+    # Потоковый читатель Arrow (open_csv) читает файл Python в своем фоновом потоке, и его
+    # удаление при досрочном закрытии ждет это чтение, удерживая GIL, нужный самому чтению.
+    # Поэтому канал читается здесь частями по BLOCK_SIZE, а Arrow разбирает их из памяти
+    read_options, parse_options, convert_options = _read_options(column_types)
+    stream = _CopyStream(engine, query, params)
+    try:
+        for chunk in _csv_chunks(stream.reader, BLOCK_SIZE):
+            table = pa_csv.read_csv(pa.BufferReader(chunk), read_options=read_options,
+                                    parse_options=parse_options, convert_options=convert_options)
+            if not read_options.column_names:
+                # Следующие части - без заголовка и с типами колонок первой части
+                read_options = pa_csv.ReadOptions(block_size=BLOCK_SIZE, column_names=table.column_names)
+                convert_options = pa_csv.ConvertOptions(
+                    column_types={field.name: field.type for field in table.schema},
+                    strings_can_be_null=True)
+            yield from table.to_batches()
+    except pa.ArrowInvalid:
+        stream.raise_error()
+        raise
+    finally:
+        stream.close()
+    stream.raise_error()
+
+
+def _csv_chunks(stream, size):
+    """Вывод COPY частями около size байт, разрезанными по границам строк CSV"""
+    tail = b''
+    while True:
+        block = stream.read(size)
+        if not block:
+            if tail:
+                yield tail
+            return
+        data = tail + block
+        end = _row_boundary(data)
+        # Строка длиннее части - дочитывается следующей
+        tail = data[end:]
+        if end:
+            yield data[:end]
+
+
+def _row_boundary(data):
+    """Позиция после последнего перевода строки вне кавычек: в CSV из COPY кавычки
+    внутри значений удваиваются, поэтому перевод строки вне значения - после четного их числа"""
+    end = data.rfind(b'\n')
+    while end >= 0 and data.count(b'"', 0, end) % 2:
+        end = data.rfind(b'\n', 0, end)
+    return end + 1
+
+
+def read_frame(engine, query, params=None):
+    """Результат запроса как DataFrame на типах Arrow"""
+    try:
+        return arrow_to_frame(read_arrow_table(engine, query, params))
+    except pa.ArrowInvalid as e:
+        # Типы колонок выводятся по первому блоку CSV; при расхождении - обычная выборка
+        print(f"[WARNING] Разбор COPY в Arrow не удался ({e}), обычная выборка")
+        frame = pd.read_sql_query(text(query), engine, params=params) if params \
+            else pd.read_sql_query(query, engine)
+        return arrow_to_frame(pa.Table.from_pandas(frame, preserve_index=False))
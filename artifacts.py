@@ -0,0 +1,311 @@
+import os
+import glob
+import gzip
+import json
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+
+
+DEFAULT_MANIFEST_PATH = 'charts/manifest.json'
+
+# Сколько последних полных запусков анализа хранится; файлы, которые ни один из них
+# (и ни одна более поздняя отрисовка отдельного графика) не создавал, удаляются
+DEFAULT_KEEP_RUNS = 10
+
+# Тип артефакта по каталогу и расширению (первое совпадение)
+ARTIFACT_TYPES = (
+    ('exports/charts/', '.png', 'chart_export'),
+    ('charts/', '.png', 'chart'),
+    ('charts/', '.html', 'interactive'),
+    ('charts/', '.js', 'asset'),
+    ('exports/', '.xlsx', 'export'),
+)
+
+# Текстовые артефакты, рядом с которыми при создании сохраняются сжатые копии
+PRECOMPRESSED_TYPES = ('interactive', 'asset')
+PRECOMPRESS_MIN_SIZE = 1024
+
+# Кодировки сжатых копий в порядке предпочтения при отдаче: (Content-Encoding, суффикс файла)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Длина префикса хэша в адресах файлов (?v=...)
+VERSION_LENGTH = 16
+
+# Каталоги, которые просматривает rebuild при первом построении манифеста
+SCAN_PATTERNS = ('charts/*.png', 'charts/*.html', 'charts/plotly-*.js', 'exports/*.xlsx', 'exports/charts/*.png')
+
+
+def default_keep_runs():
+    """Число хранимых полных запусков из окружения (ARTIFACT_KEEP_RUNS, 0 - без удаления)"""
+    return int(os.environ.get('ARTIFACT_KEEP_RUNS', DEFAULT_KEEP_RUNS))
+
+
+def artifact_type(path):
+    path = path.replace(os.sep, '/')
+    for prefix, extension, kind in ARTIFACT_TYPES:
+        if path.startswith(prefix) and path.endswith(extension):
+            return kind
+    return 'other'
+
+
+def file_sha256(path, block_size=2 ** 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _compress(data, encoding):
+    if encoding == 'gzip':
+        # mtime=0: одинаковое содержимое дает одинаковые байты копии
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def _write_atomic(path, data):
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def precompress(path):
+    """Сжатые копии файла (.br, .gz) рядом с ним: {кодировка: {'path': ..., 'size': ...}}"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    encodings = {}
+    for encoding, suffix in ENCODINGS:
+        compressed = _compress(data, encoding)
+        if compressed is None:
+            print(f"[WARNING] brotli не установлен, копия {path}{suffix} не создана")
+        if compressed is None or len(compressed) >= len(data):
+            # Копия от прежнего содержимого файла больше не подходит
+            if os.path.exists(f'{path}{suffix}'):
+                os.remove(f'{path}{suffix}')
+            continue
+        _write_atomic(f'{path}{suffix}', compressed)
+        encodings[encoding] = {'path': f'{path}{suffix}', 'size': len(compressed)}
+    return encodings
+
+
+def version(entry):
+    """Версия файла для адреса (?v=): префикс хэша содержимого"""
+    return entry['sha256'][:VERSION_LENGTH]
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def load_manifest(path=DEFAULT_MANIFEST_PATH):
+    """Манифест артефактов: {'runs': [...], 'artifacts': {путь: запись}}"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    manifest.setdefault('runs', [])
+    manifest.setdefault('artifacts', {})
+    return manifest
+
+
+class ArtifactManifest:
+    """Манифест файлов, созданных запусками анализа.
+
+    Для каждого файла хранятся тип, размер, SHA-256, время создания, запуск, который
+    его создал, и время, когда файл в последний раз подтвердил какой-либо запуск.
+    Манифест записывается атомарно (временный файл и os.replace), так что страницы
+    приложения никогда не читают его наполовину записанным.
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH, keep_runs=None):
+        self.path = path
+        self.keep_runs = default_keep_runs() if keep_runs is None else keep_runs
+        self._lock = threading.Lock()
+
+    def _save(self, manifest):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _describe(self, path, run_id, previous, seen_at):
+        stat = os.stat(path)
+        created_at = datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds')
+        if (previous and previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns
+                and 'encodings' in previous and all(os.path.exists(copy['path']) for copy in previous.get('encodings', {}).values())):
+            # Файл не перезаписывался (отрисовка пропущена по отпечатку) - хэш, копии и запуск прежние
+            return dict(previous, seen_at=seen_at)
+        kind = artifact_type(path)
+        encodings = {}
+        if kind in PRECOMPRESSED_TYPES and stat.st_size >= PRECOMPRESS_MIN_SIZE:
+            encodings = precompress(path)
+        return {
+            'name': path,
+            'filename': os.path.basename(path),
+            'type': kind,
+            'size': stat.st_size,
+            'sha256': file_sha256(path),
+            'created_at': created_at,
+            'mtime_ns': stat.st_mtime_ns,
+            'run_id': run_id,
+            'seen_at': seen_at,
+            'encodings': encodings,
+        }
+
+    def publish(self, run_id, paths, complete=False, status=None):
+        """Запись файлов запуска в манифест; после полного запуска удаляются файлы старых запусков.
+
+        status - {путь: {'fresh': ..., 'checked_at': ...}} из отпечатков графиков.
+        """
+        status = status or {}
+        seen_at = _now()
+        with self._lock:
+            manifest = load_manifest(self.path)
+            artifacts = manifest['artifacts']
+            published = []
+            for path in dict.fromkeys(paths):
+                if not os.path.exists(path):
+                    continue
+                entry = self._describe(path, run_id, artifacts.get(path), seen_at)
+                if path in status:
+                    entry['fresh'] = status[path].get('fresh', False)
+                    entry['checked_at'] = status[path].get('checked_at')
+                artifacts[path] = entry
+                published.append(path)
+            if complete:
+                manifest['runs'].append({'run_id': run_id, 'finished_at': seen_at, 'artifacts': len(published)})
+            removed = self._collect_garbage(manifest)
+            self._save(manifest)
+        print(f"[INFO] Манифест артефактов: {len(published)} файлов запуска {run_id}"
+              + (f", удалено устаревших: {len(removed)}" if removed else ""))
+        return removed
+
+    def _collect_garbage(self, manifest):
+        """Удаление файлов, которые не подтверждал ни один из keep_runs последних полных запусков"""
+        if not self.keep_runs or len(manifest['runs']) <= self.keep_runs:
+            return []
+        manifest['runs'] = manifest['runs'][-self.keep_runs:]
+        # Отсечка - окончание самого старого хранимого запуска: он подтвердил все свои файлы
+        cutoff = manifest['runs'][0]['finished_at']
+        removed = []
+        for path, entry in list(manifest['artifacts'].items()):
+            if entry.get('seen_at', '') >= cutoff:
+                continue
+            for file_path in [path] + [copy['path'] for copy in entry.get('encodings', {}).values()]:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            del manifest['artifacts'][path]
+            removed.append(path)
+        return removed
+
+    def collect_garbage(self):
+        """Сборка мусора без нового запуска (например, после уменьшения keep_runs)"""
+        with self._lock:
+            manifest = load_manifest(self.path)
+            removed = self._collect_garbage(manifest)
+            self._save(manifest)
+        return removed
+
+    def rebuild(self, patterns=SCAN_PATTERNS):
+        """Однократный просмотр каталогов: внесение уже существующих файлов в манифест"""
+        paths = sorted(path.replace(os.sep, '/') for pattern in patterns for path in glob.glob(pattern))
+        return self.publish(f"rebuild-{datetime.now():%Y%m%d-%H%M%S}", paths)
+
+
+class ArtifactIndex:
+    """Копия манифеста в памяти для страниц приложения.
+
+    Файл манифеста перечитывается, только когда он заменен новым (другие inode,
+    время изменения или размер); проверка - один stat не чаще раза в check_interval.
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked_at = None
+        self._manifest = {'runs': [], 'artifacts': {}}
+
+    def _current(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._manifest
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                signature = None
+            if signature != self._signature:
+                self._manifest = load_manifest(self.path)
+                self._signature = signature
+            return self._manifest
+
+    def artifacts(self, kind):
+        """Записи артефактов типа kind, упорядоченные по имени файла"""
+        entries = self._current()['artifacts'].values()
+        return sorted((entry for entry in entries if entry.get('type') == kind), key=lambda e: e['filename'])
+
+    def get(self, name):
+        return self._current()['artifacts'].get(name)
+
+    def current(self, name):
+        """Запись файла, если файл на диске совпадает с ней (не перезаписан после записи манифеста)"""
+        entry = self.get(name)
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(name)
+        except FileNotFoundError:
+            return None
+        if (stat.st_size, stat.st_mtime_ns) != (entry.get('size'), entry.get('mtime_ns')):
+            return None
+        return entry
+
+    def runs(self):
+        return list(self._current()['runs'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Манифест файлов, созданных запусками анализа")
+    parser.add_argument('command', choices=('list', 'gc', 'rebuild'),
+                        help="list - содержимое манифеста; gc - удалить файлы старых запусков; "
+                             "rebuild - внести в манифест уже существующие файлы")
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST_PATH, help="путь к файлу манифеста")
+    parser.add_argument('--keep-runs', type=int, default=None,
+                        help="сколько последних полных запусков хранить (по умолчанию - ARTIFACT_KEEP_RUNS или 10)")
+    args = parser.parse_args(argv)
+
+    manifest = ArtifactManifest(args.manifest, keep_runs=args.keep_runs)
+    if args.command == 'rebuild':
+        manifest.rebuild()
+    elif args.command == 'gc':
+        removed = manifest.collect_garbage()
+        for path in removed:
+            print(f"[INFO] Удален: {path}")
+        print(f"[SUCCESS] Удалено файлов: {len(removed)}")
+    else:
+        data = load_manifest(args.manifest)
+        for run in data['runs']:
+            print(f"[INFO] Запуск {run['run_id']}: {run['finished_at']}, файлов: {run['artifacts']}")
+        for path, entry in sorted(data['artifacts'].items()):
+            print(f"{entry['type']:<12} {entry['size']:>10} {entry['sha256'][:12]} "
+                  f"{entry['created_at']} {entry['run_id']} {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import os
+import time
+import asyncio
+import importlib.util
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from db import load_db_config, get_engine
+from query_cache import make_cache_key
+
+
+# Асинхронные драйверы по диалекту в порядке предпочтения
+ASYNC_DRIVERS = {
+    'postgresql': ('asyncpg', 'psycopg'),
+    'sqlite': ('aiosqlite',),
+}
+
+DEFAULT_CONCURRENCY = 4
+
+
+class QueryTimeout(Exception):
+    """Запрос не уложился в отведенное время и был отменен"""
+
+
+def default_concurrency():
+    """Предел одновременных запросов из окружения (QUERY_CONCURRENCY)"""
+    return max(1, int(os.environ.get('QUERY_CONCURRENCY', DEFAULT_CONCURRENCY)))
+
+
+def default_timeout():
+    """Таймаут одного запроса в секундах из окружения (QUERY_TIMEOUT, 0 - без таймаута)"""
+    return float(os.environ.get('QUERY_TIMEOUT', 0)) or None
+
+
+def async_driver(url):
+    """Установленный асинхронный драйвер для URL базы данных или None"""
+    url = make_url(url)
+    for driver in ASYNC_DRIVERS.get(url.get_backend_name(), ()):
+        if importlib.util.find_spec(driver) is not None:
+            return driver
+    return None
+
+
+def build_async_engine(config, driver, pool_size, timeout=None):
+    """Асинхронный движок SQLAlchemy; таймаут дублируется на сервере как statement_timeout"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    url = make_url(config['url'])
+    url = url.set(drivername=f'{url.get_backend_name()}+{driver}')
+    kwargs = {'pool_pre_ping': config['pool_pre_ping']}
+    if url.get_backend_name() == 'postgresql':
+        kwargs.update(pool_size=pool_size, max_overflow=0, pool_timeout=config['pool_timeout'])
+        timeout_ms = int(timeout * 1000) if timeout else config['statement_timeout_ms']
+        if timeout_ms and driver == 'asyncpg':
+            kwargs['connect_args'] = {'server_settings': {'statement_timeout': str(timeout_ms)}}
+        elif timeout_ms:
+            kwargs['connect_args'] = {'options': f'-c statement_timeout={timeout_ms}'}
+    return create_async_engine(url, **kwargs)
+
+
+class AsyncQueryExecutor:
+    """Одновременное выполнение независимых запросов с пределом параллельности.
+
+    Запросы выполняются через асинхронный движок SQLAlchemy (asyncpg, psycopg 3,
+    aiosqlite); без асинхронного драйвера - через общий синхронный движок в
+    потоках. Запрос, превысивший таймаут, отменяется, его результат - QueryTimeout.
+    """
+
+    def __init__(self, concurrency=None, timeout=None, config=None):
+        self.concurrency = concurrency or default_concurrency()
+        self.timeout = timeout
+        self.config = config or load_db_config()
+        self.driver = async_driver(self.config['url'])
+
+    async def _read(self, engine, query, params):
+        if engine is None:
+            # Синхронный драйвер: запрос в потоке, отмена освобождает только ожидание
+            return await asyncio.to_thread(pd.read_sql_query, text(query), get_engine(), params=params)
+        async with engine.connect() as conn:
+            return await conn.run_sync(
+                lambda sync_conn: pd.read_sql_query(text(query), sync_conn, params=params))
+
+    async def _run_one(self, engine, semaphore, query, params, timings, key):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                return await asyncio.wait_for(self._read(engine, query, params), self.timeout)
+            except asyncio.TimeoutError:
+                return QueryTimeout(f"запрос отменен по таймауту {self.timeout:g} с")
+            except Exception as e:
+                return e
+            finally:
+                timings[key] = time.perf_counter() - started
+
+    async def _run_all(self, statements, timings):
+        engine = None
+        if self.driver is not None:
+            engine = build_async_engine(self.config, self.driver, self.concurrency, self.timeout)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            keys = list(statements)
+            results = await asyncio.gather(*(
+                self._run_one(engine, semaphore, query, params, timings, key)
+                for key, (query, params) in statements.items()))
+            return dict(zip(keys, results))
+        finally:
+            if engine is not None:
+                await engine.dispose()
+
+    def run(self, statements):
+        """Выполнение {ключ: (SQL, параметры)}; возвращает результаты и время каждого запроса.
+
+        Результат запроса - DataFrame или исключение (ошибка либо QueryTimeout).
+        """
+        timings = {}
+        results = asyncio.run(self._run_all(statements, timings))
+        return results, timings
+
+
+def prefetch(statements, concurrency=None, timeout=None):
+    """Результаты списка (SQL, параметры) по ключам кэша запросов (повторы выполняются один раз)"""
+    unique = {}
+    for query, params in statements:
+        unique.setdefault(make_cache_key(query, params), (query, params))
+    executor = AsyncQueryExecutor(concurrency=concurrency, timeout=timeout)
+    results, timings = executor.run(unique)
+    return results, timings, executor.driver
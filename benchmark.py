@@ -0,0 +1,260 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+
+DEFAULT_RESULTS_DIR = 'benchmarks/results'
+
+# Доля замедления этапа, после которой сравнение помечает регрессию
+REGRESSION_THRESHOLD = 0.10
+
+
+def _git_revision():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        return result.stdout.strip() + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss: килобайты в Linux, байты в macOS
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def _rows(data):
+    if data is None or isinstance(data, bool):
+        return 0
+    if isinstance(data, dict):
+        return sum(len(df) for df in data.values())
+    return len(data)
+
+
+class _FetchTimer:
+    """Учет времени, проведенного в обращениях к базе данных во время этапа"""
+
+    FETCH_METHODS = ('execute_query', 'execute_query_chunks', 'load_sales_facts')
+
+    def __init__(self, analyzer):
+        self.seconds = 0.0
+        self._depth = 0
+        for name in self.FETCH_METHODS:
+            setattr(analyzer, name, self._wrap(getattr(analyzer, name)))
+
+    def _wrap(self, method):
+        def timed(*args, **kwargs):
+            result = method(*args, **kwargs)
+            if hasattr(result, '__next__'):
+                return self._timed_iter(result)
+            return result
+
+        def outer(*args, **kwargs):
+            # Вложенные вызовы (load_sales_facts -> execute_query) учитываются один раз
+            self._depth += 1
+            started = time.perf_counter()
+            try:
+                return timed(*args, **kwargs)
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.seconds += time.perf_counter() - started
+        return outer
+
+    def _timed_iter(self, iterator):
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.seconds += time.perf_counter() - started
+                return
+            self.seconds += time.perf_counter() - started
+            yield item
+
+
+def _run_step(analyzer, fetch, query_method, render):
+    fetch.seconds = 0.0
+    started = time.perf_counter()
+    data = None
+    error = None
+    render_seconds = 0.0
+    try:
+        data = getattr(analyzer, query_method)()
+        prepared = time.perf_counter()
+        if render is not None and _rows(data):
+            render_started = time.perf_counter()
+            render(data, analyzer.colors)
+            render_seconds = time.perf_counter() - render_started
+    except Exception as e:
+        prepared = time.perf_counter()
+        error = str(e)
+    if error is None and data is None:
+        error = "нет данных"
+
+    query_seconds = min(fetch.seconds, prepared - started)
+    return {
+        'query': query_seconds,
+        'transform': prepared - started - query_seconds,
+        'render': render_seconds,
+        'total': time.perf_counter() - started,
+        'rows': _rows(data),
+        'error': error,
+    }
+
+
+def benchmark_steps(analyzer, repeat=1, trace_memory=True):
+    """Время фаз запроса, преобразования и отрисовки и пиковая память каждого этапа анализа.
+
+    Время берется медианой по repeat прогонам без трассировки; пиковая память
+    измеряется отдельным прогоном под tracemalloc, который замедляет выполнение.
+    """
+    fetch = _FetchTimer(analyzer)
+    results = {}
+    for name, query_method, render in analyzer.analysis_steps():
+        runs = [_run_step(analyzer, fetch, query_method, render) for _ in range(repeat)]
+        step = {phase: statistics.median(run[phase] for run in runs)
+                for phase in ('query', 'transform', 'render', 'total')}
+        step['rows'] = runs[-1]['rows']
+        step['error'] = runs[-1]['error']
+
+        step['peak_traced_mb'] = None
+        if trace_memory:
+            tracemalloc.start()
+            _run_step(analyzer, fetch, query_method, render)
+            step['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+        step['peak_rss_mb'] = _peak_rss_mb()
+        results[name] = step
+
+        status = f"ошибка: {step['error']}" if step['error'] else f"{step['rows']} строк"
+        memory = f", память {step['peak_traced_mb']:.1f} МБ" if trace_memory else ""
+        print(f"[TIME] {name}: запрос {step['query']:.3f} с, преобразование {step['transform']:.3f} с, "
+              f"отрисовка {step['render']:.3f} с{memory} ({status})")
+    return results
+
+
+def run_benchmark(url, scale, source='sql', repeat=1, seed=0, regenerate=False, trace_memory=True,
+                  workdir='benchmarks/work'):
+    """Полный прогон: подготовка данных, замер этапов, результат в виде словаря"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.engine import make_url
+    import tickit_synth
+
+    engine_url = make_url(url)
+    if engine_url.get_backend_name() == 'sqlite' and engine_url.database:
+        # Абсолютный путь: анализ выполняется из рабочего каталога
+        engine_url = engine_url.set(database=os.path.abspath(engine_url.database))
+        url = engine_url.render_as_string(hide_password=False)
+        os.makedirs(os.path.dirname(engine_url.database), exist_ok=True)
+        regenerate = regenerate or not os.path.exists(engine_url.database)
+
+    load = {'seconds': 0.0, 'rows': None}
+    if regenerate:
+        started = time.perf_counter()
+        load['rows'] = tickit_synth.load_synthetic_tickit(create_engine(url), scale=scale, seed=seed)
+        load['seconds'] = time.perf_counter() - started
+
+    # Анализатор берет подключение из DATABASE_URL; файлы графиков пишутся в рабочий каталог
+    os.environ['DATABASE_URL'] = url
+    import db
+    db.dispose_engine()
+    from analytics import TicketSalesAnalyzer
+
+    home = os.getcwd()
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    try:
+        started = time.perf_counter()
+        analyzer = TicketSalesAnalyzer(source=source, store_path='aggregates.sqlite', full_rebuild=True)
+        analyzer.force_render = True
+        setup_seconds = time.perf_counter() - started
+        steps = benchmark_steps(analyzer, repeat=repeat, trace_memory=trace_memory)
+    finally:
+        os.chdir(home)
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': engine_url.get_backend_name(),
+        'scale': scale,
+        'source': source,
+        'repeat': repeat,
+        'trace_memory': trace_memory,
+        'seed': seed,
+        'load': load,
+        'setup_seconds': setup_seconds,
+        'steps': steps,
+        'total_seconds': sum(step['total'] for step in steps.values()),
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Сравнение двух прогонов по времени этапов; возвращает список регрессий"""
+    regressions = []
+    print(f"[INFO] Сравнение {baseline.get('revision')} -> {current.get('revision')}")
+    for name, step in current['steps'].items():
+        before = baseline['steps'].get(name)
+        if before is None or not before['total']:
+            continue
+        change = step['total'] / before['total'] - 1
+        mark = ""
+        if change > threshold:
+            regressions.append(name)
+            mark = "  <-- регрессия"
+        print(f"[TIME] {name}: {before['total']:.3f} с -> {step['total']:.3f} с ({change:+.0%}){mark}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер производительности анализа на синтетических данных TICKIT")
+    parser.add_argument('--scale', type=float, default=1.0, help="масштаб данных (1, 10, 100)")
+    parser.add_argument('--url', default=None,
+                        help="база данных для прогона (по умолчанию - SQLite в data/tickit_sf<scale>.sqlite)")
+    parser.add_argument('--source', default='sql', choices=('sql', 'facts', 'store', 'rollups'),
+                        help="источник данных анализатора")
+    parser.add_argument('--repeat', type=int, default=1, help="повторов каждого этапа (берется медиана)")
+    parser.add_argument('--seed', type=int, default=0, help="зерно генератора данных")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="не измерять пиковую память (без дополнительного прогона под tracemalloc)")
+    parser.add_argument('--regenerate', action='store_true', help="сгенерировать данные заново")
+    parser.add_argument('--output', default=None, help="файл результата JSON")
+    parser.add_argument('--compare', metavar='BASELINE_JSON', help="сравнить с предыдущим прогоном")
+    args = parser.parse_args(argv)
+
+    url = args.url or f'sqlite:///data/tickit_sf{args.scale:g}.sqlite'
+    result = run_benchmark(url, args.scale, source=args.source, repeat=args.repeat,
+                           seed=args.seed, regenerate=args.regenerate, trace_memory=not args.no_memory)
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR,
+        f"{datetime.now():%Y%m%d-%H%M%S}-{result['revision'] or 'norev'}-sf{args.scale:g}-{args.source}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"[SUCCESS] Результаты замера сохранены: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare_results(baseline, result):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
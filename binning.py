@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+
+BIN_STRATEGIES = ('fixed', 'quantile', 'log')
+
+# Сетка для приближенных квантилей без поддержки на стороне базы
+SKETCH_BINS = 2048
+
+
+def fixed_edges(low, high, bins):
+    """Границы корзин одинаковой ширины"""
+    return np.linspace(low, high, bins + 1)
+
+
+def log_edges(low, high, bins):
+    """Границы корзин одинаковой ширины в логарифмической шкале"""
+    if low <= 0:
+        raise ValueError("Логарифмические корзины требуют положительной нижней границы")
+    return np.geomspace(low, high, bins + 1)
+
+
+def quantile_edges(quantiles, low, high):
+    """Границы корзин равной наполненности по значениям квантилей"""
+    edges = np.concatenate(([low], np.asarray(quantiles, dtype=float), [high]))
+    return np.unique(np.clip(edges, low, high))
+
+
+def quantiles_from_histogram(counts, edges, fractions):
+    """Квантили по гистограмме с линейной интерполяцией внутри корзины"""
+    cumulative = np.concatenate(([0], np.cumsum(counts, dtype=float)))
+    if cumulative[-1] == 0:
+        return np.full(len(fractions), np.nan)
+    return np.interp(np.asarray(fractions) * cumulative[-1], cumulative, edges)
+
+
+def histogram_frame(edges, counts, strategy):
+    """Результат биннинга: границы и число значений в каждой корзине"""
+    df = pd.DataFrame({
+        'bin_left': edges[:-1],
+        'bin_right': edges[1:],
+        'count': np.asarray(counts, dtype='int64'),
+    })
+    df.attrs['bin_strategy'] = strategy
+    return df
+
+
+class HistogramBinner:
+    """Гистограмма по столбцу запроса без выгрузки строк в pandas.
+
+    В PostgreSQL корзины считаются в базе через width_bucket, квантили -
+    через percentile_cont (приближенно - по выборке TABLESAMPLE). В остальных
+    СУБД значения читаются частями и накапливаются в массиве NumPy. С шардами
+    счетчики корзин складываются, а квантили, которые не складываются, считаются
+    по сетке из значений всех шардов.
+
+    source_sql - часть запроса после SELECT: FROM ... WHERE ..., в которой
+    {sample} отмечает место для TABLESAMPLE, а :low/:high ограничивают значения.
+    """
+
+    def __init__(self, analyzer, column, source_sql, params, low, high):
+        self.analyzer = analyzer
+        self.column = column
+        self.source_sql = source_sql
+        self.params = dict(params or {}, low=low, high=high)
+        self.low = low
+        self.high = high
+
+    @property
+    def server_side(self):
+        return self.analyzer.engine.dialect.name == 'postgresql'
+
+    def _source(self, sample_percent=None):
+        sample = f"TABLESAMPLE SYSTEM ({float(sample_percent)})" if sample_percent else ""
+        return self.source_sql.format(sample=sample)
+
+    def histogram(self, bins=30, strategy='fixed', approx=False, sample_percent=5, chunksize=200000):
+        """Число значений по корзинам выбранной стратегии"""
+        if strategy not in BIN_STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия биннинга: {strategy}")
+
+        if strategy == 'fixed':
+            edges = fixed_edges(self.low, self.high, bins)
+        elif strategy == 'log':
+            edges = log_edges(self.low, self.high, bins)
+        else:
+            fractions = np.arange(1, bins) / bins
+            quantiles = self.quantiles(fractions, approx=approx, sample_percent=sample_percent,
+                                       chunksize=chunksize)
+            if quantiles is None:
+                return None
+            edges = quantile_edges(quantiles, self.low, self.high)
+
+        if self.server_side:
+            counts = self._count_in_database(edges, uniform=strategy == 'fixed')
+        else:
+            counts = self._count_in_chunks(edges, chunksize)
+        if counts is None:
+            return None
+        return histogram_frame(edges, counts, strategy)
+
+    def quantiles(self, fractions, approx=False, sample_percent=5, chunksize=200000):
+        """Квантили столбца: точные или приближенные (по выборке строк или по сетке)"""
+        if self.server_side and self.analyzer.shards is None:
+            # Массив квантилей разворачивается в строки: выборка через COPY в CSV
+            # (FETCH_BACKEND=arrow) вернула бы массив строкой вида "{...}"
+            query = f"""
+            SELECT q.quantile
+            FROM (
+                SELECT percentile_cont(CAST(:fractions AS double precision[]))
+                       WITHIN GROUP (ORDER BY {self.column}) AS quantiles
+                {self._source(sample_percent if approx else None)}
+            ) p
+            CROSS JOIN LATERAL unnest(p.quantiles) WITH ORDINALITY AS q(quantile, position)
+            ORDER BY q.position
+            """
+            params = dict(self.params, fractions=[float(f) for f in fractions])
+            df = self.analyzer.execute_query(query, "Квантили для границ корзин", params)
+            if df is None or df.empty:
+                return None
+            return pd.to_numeric(df['quantile'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+        grid = fixed_edges(self.low, self.high, SKETCH_BINS)
+        counts = self._count_in_chunks(grid, chunksize)
+        if counts is None:
+            return None
+        return quantiles_from_histogram(counts, grid, fractions)
+
+    def _count_in_database(self, edges, uniform):
+        n_bins = len(edges) - 1
+        if uniform:
+            bucket = f"width_bucket({self.column}, :low, :high, :n_bins)"
+            params = dict(self.params, n_bins=n_bins)
+        else:
+            bucket = f"width_bucket({self.column}::double precision, CAST(:edges AS double precision[]))"
+            params = dict(self.params, n_bins=n_bins, edges=[float(edge) for edge in edges])
+        # Значения на правой границе попадают в последнюю корзину, как в numpy.histogram
+        query = f"""
+        SELECT LEAST(GREATEST({bucket}, 1), :n_bins) AS bucket, COUNT(*) AS count
+        {self._source()}
+        GROUP BY 1
+        ORDER BY 1;
+        """
+        df = self.analyzer.execute_query(query, "Корзины гистограммы (в базе данных)", params)
+        if df is None:
+            return None
+        counts = np.zeros(n_bins, dtype='int64')
+        # Строки шардов с одной корзиной складываются
+        np.add.at(counts, df['bucket'].astype(int).to_numpy() - 1, df['count'].to_numpy())
+        return counts
+
+    def _count_in_chunks(self, edges, chunksize):
+        query = f"SELECT {self.column} AS value {self._source()}"
+        counts = np.zeros(len(edges) - 1, dtype='int64')
+        try:
+            for chunk in self.analyzer.execute_query_chunks(query, "Корзины гистограммы (частями)",
+                                                            self.params, chunksize):
+                values = pd.to_numeric(chunk['value'], errors='coerce').dropna().to_numpy()
+                counts += np.histogram(values, bins=edges)[0]
+        except Exception as e:
+            self.analyzer.report_error(f"Ошибка выполнения запроса: {e}")
+            return None
+        return counts
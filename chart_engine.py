@@ -0,0 +1,103 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from matplotlib import style
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import tracing
+
+
+CHART_STYLE = 'seaborn-v0_8'
+
+# Цели отрисовки файлов графиков: каталог и разрешение.
+# Миниатюры показываются на главной странице, копии высокого разрешения - для печати и отчетов
+THUMBNAIL_DPI = 100
+EXPORT_DPI = 300
+EXPORT_CHARTS_DIR = 'exports/charts'
+
+# Надписи с кириллицей разных начертаний: шрифты и их метрики загружаются при настройке процесса
+_WARM_UP_TEXTS = (
+    ('Распределение выручки по категориям', {'fontsize': 14, 'fontweight': 'bold'}),
+    ('Количество продаж ($)', {}),
+    ('Площадки 0123456789', {'fontsize': 9}),
+    ('Категория', {'fontsize': 8}),
+)
+
+_lock = threading.Lock()
+_configured = False
+_targets = None
+
+
+def render_targets(thumbnail_dpi=None, export_dpi=None):
+    """Цели отрисовки {имя: (каталог, dpi)}; разрешения - из аргументов, окружения
+    (CHART_THUMBNAIL_DPI, CHART_EXPORT_DPI) или по умолчанию; export_dpi=0 отключает копии для печати"""
+    thumbnail_dpi = thumbnail_dpi or int(os.environ.get('CHART_THUMBNAIL_DPI', THUMBNAIL_DPI))
+    if export_dpi is None:
+        export_dpi = int(os.environ.get('CHART_EXPORT_DPI', EXPORT_DPI))
+    targets = {'thumbnail': ('charts', thumbnail_dpi)}
+    if export_dpi > 0:
+        targets['export'] = (EXPORT_CHARTS_DIR, export_dpi)
+    return targets
+
+
+def init_worker(targets=None):
+    """Однократная настройка процесса отрисовки: стиль, шрифты подписей и цели отрисовки"""
+    global _configured, _targets
+    with _lock:
+        if targets is not None:
+            _targets = dict(targets)
+        if _configured:
+            return
+        style.use(CHART_STYLE)
+        # Первая отрисовка текста ищет шрифт и загружает глифы; дальше они берутся из кэшей процесса
+        fig = Figure(figsize=(2, 2))
+        FigureCanvasAgg(fig)
+        for label, props in _WARM_UP_TEXTS:
+            fig.text(0.5, 0.5, label, **props)
+        fig.canvas.draw()
+        _configured = True
+
+
+def configured_targets():
+    """Цели отрисовки текущего процесса"""
+    return _targets if _targets is not None else render_targets()
+
+
+def target_paths(output, targets=None):
+    """Файлы графика по целям отрисовки: [(путь, dpi)]"""
+    filename = os.path.basename(output)
+    return [(os.path.join(directory, filename), dpi)
+            for directory, dpi in (targets or configured_targets()).values()]
+
+
+def new_figure(figsize):
+    """Фигура на собственном холсте Agg, без глобального состояния pyplot"""
+    if not _configured:
+        init_worker()
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def save_figure(fig, output, message, dpi=None, fmt=None):
+    """Сохранение фигуры в буфер или в файлы всех целей отрисовки (dpi задает одно разрешение)"""
+    if not isinstance(output, str):
+        fig.savefig(output, dpi=dpi, format=fmt, bbox_inches='tight')
+        return
+    paths = [(output, dpi)] if dpi is not None else target_paths(output)
+    for path, path_dpi in paths:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with tracing.span('write', path=path, dpi=path_dpi):
+            fig.savefig(path, dpi=path_dpi, format=fmt, bbox_inches='tight')
+    print(f"[SUCCESS] {message}: " + ", ".join(f"{path} ({path_dpi} dpi)" for path, path_dpi in paths))
+
+
+def render_pool(workers, targets=None):
+    """Пул процессов отрисовки; стиль, шрифты и цели настраиваются один раз на процесс"""
+    # spawn вместо fork: пул потоков с открытыми соединениями нельзя безопасно форкать
+    context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                               initializer=init_worker, initargs=(targets,))
@@ -0,0 +1,110 @@
+import os
+import json
+import hashlib
+import inspect
+import threading
+from datetime import datetime
+
+
+DEFAULT_FINGERPRINTS_PATH = 'charts/fingerprints.json'
+
+
+def _hash_frame(digest, df):
+    import pandas as pd
+    digest.update(json.dumps([str(col) for col in df.columns]).encode('utf-8'))
+    digest.update(json.dumps([str(dtype) for dtype in df.dtypes]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+
+
+def fingerprint_chart(data, render, params=None):
+    """Отпечаток входных данных графика, кода отрисовки и параметров отрисовки"""
+    digest = hashlib.sha256()
+    if isinstance(data, dict):
+        for name in sorted(data):
+            digest.update(name.encode('utf-8'))
+            _hash_frame(digest, data[name])
+    else:
+        _hash_frame(digest, data)
+
+    try:
+        render_code = inspect.getsource(render)
+    except (OSError, TypeError):
+        render_code = f'{render.__module__}.{render.__qualname__}'
+    digest.update(render_code.encode('utf-8'))
+    digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class FingerprintStore:
+    """Отпечатки отрисованных графиков в charts/: по ним повторная отрисовка пропускается.
+
+    Для каждого графика хранится отпечаток данных последней проверки и отпечаток,
+    с которым файл был отрисован; совпадение означает, что файл актуален.
+    """
+
+    def __init__(self, path=DEFAULT_FINGERPRINTS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._records, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def is_fresh(self, name, fingerprint, outputs):
+        """Файлы графика существуют и отрисованы из тех же данных"""
+        with self._lock:
+            record = self._records.get(name, {})
+            return (record.get('rendered_fingerprint') == fingerprint
+                    and all(os.path.exists(path) for path in outputs))
+
+    def record_checked(self, name, fingerprint, outputs):
+        """Отметка отпечатка данных, полученных в текущем запуске"""
+        with self._lock:
+            record = self._records.setdefault(name, {})
+            record['data_fingerprint'] = fingerprint
+            record['outputs'] = list(outputs)
+            record['checked_at'] = datetime.now().isoformat(timespec='seconds')
+            self._save()
+
+    def record_rendered(self, name, fingerprint):
+        """Отметка успешной отрисовки графика из данных с данным отпечатком"""
+        with self._lock:
+            record = self._records.setdefault(name, {})
+            record['rendered_fingerprint'] = fingerprint
+            record['rendered_at'] = datetime.now().isoformat(timespec='seconds')
+            self._save()
+
+
+def load_chart_status(path=DEFAULT_FINGERPRINTS_PATH):
+    """Статус актуальности по имени файла графика: {'charts/x.png': {'fresh': ..., ...}}"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            records = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+    status = {}
+    for name, record in records.items():
+        fresh = (record.get('rendered_fingerprint') is not None
+                 and record.get('rendered_fingerprint') == record.get('data_fingerprint'))
+        for output in record.get('outputs', []):
+            status[output] = {
+                'chart': name,
+                'fresh': fresh and os.path.exists(output),
+                'checked_at': record.get('checked_at'),
+                'rendered_at': record.get('rendered_at'),
+            }
+    return status
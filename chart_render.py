@@ -0,0 +1,136 @@
+import io
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from chart_fingerprints import fingerprint_chart
+
+
+# Графики matplotlib, доступные для отрисовки по запросу
+RENDERABLE_CHARTS = ('pie_chart', 'bar_chart', 'horizontal_bar_chart',
+                     'line_chart', 'histogram', 'scatter_plot', 'anomaly_chart')
+
+RENDER_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'webp': 'image/webp',
+}
+
+MIN_DPI = 30
+MAX_DPI = 600
+
+class RenderedChart:
+    """Отрисованный в памяти график: байты, MIME-тип, ETag и время отрисовки"""
+
+    def __init__(self, body, mimetype, etag, rendered_at):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.rendered_at = rendered_at
+
+
+class RenderCache:
+    """LRU отрисованных графиков, ограниченный суммарным размером в байтах"""
+
+    def __init__(self, max_bytes=64 * 2 ** 20, max_entries=256):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key):
+        with self._lock:
+            chart = self._entries.get(key)
+            if chart is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return chart
+
+    def put(self, key, chart):
+        size = len(chart.body)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key).body)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = chart
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, oldest = self._entries.popitem(last=False)
+                self._bytes -= len(oldest.body)
+                self._stats['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        return stats
+
+
+def _render_to_bytes(render, df, colors, dpi, fmt):
+    # Каждая отрисовка строит свою фигуру через объектный API: запросы рисуются параллельно
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        # Pillow умеет WebP, matplotlib - нет: рисуем PNG и перекодируем
+        from PIL import Image
+        png = io.BytesIO()
+        render(df, colors, output=png, dpi=dpi, fmt='png')
+        png.seek(0)
+        Image.open(png).save(buffer, format='WEBP', quality=90)
+    else:
+        render(df, colors, output=buffer, dpi=dpi, fmt=fmt)
+    return buffer.getvalue()
+
+
+class ChartRenderer:
+    """Отрисовка графиков по запросу в буфер в памяти.
+
+    Данные запрашиваются через анализатор с общим кэшем запросов, а ключом
+    кэша байтов служит отпечаток данных, кода отрисовки и параметров - он же ETag.
+    """
+
+    def __init__(self, query_cache=None, cache=None, source='sql', shards=None):
+        from shards import SHARDED_SOURCES
+        if shards is not None and source not in SHARDED_SOURCES:
+            raise ValueError(f"Источник {source} не поддерживает несколько баз "
+                             f"(доступны: {', '.join(SHARDED_SOURCES)})")
+        self.query_cache = query_cache
+        self.cache = cache or RenderCache()
+        self.source = source
+        self.shards = shards
+
+    def render(self, chart_name, window=None, dpi=100, fmt='png', sample=None):
+        """Отрисованный график или None, если для периода нет данных (sample - приближенно по выборке)"""
+        if chart_name not in RENDERABLE_CHARTS:
+            raise KeyError(chart_name)
+        if fmt not in RENDER_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат: {fmt}")
+        dpi = min(max(int(dpi), MIN_DPI), MAX_DPI)
+
+        from analytics import TicketSalesAnalyzer, ANALYSIS_STEPS
+        analyzer = TicketSalesAnalyzer(source=self.source, query_cache=self.query_cache, shards=self.shards,
+                                       request_scoped=True)
+        analyzer.window = window
+        if sample is not None:
+            analyzer.sample = sample
+            analyzer.approx_steps = {chart_name}
+        _, query_method, render = next(step for step in ANALYSIS_STEPS if step[0] == chart_name)
+
+        df = getattr(analyzer, query_method)()
+        if df is None or df.empty:
+            return None
+
+        etag = fingerprint_chart(df, render, {'colors': analyzer.colors, 'dpi': dpi, 'fmt': fmt})
+        chart = self.cache.get(etag)
+        if chart is not None:
+            return chart
+
+        body = _render_to_bytes(render, df, analyzer.colors, dpi, fmt)
+        chart = RenderedChart(body, RENDER_FORMATS[fmt], etag, datetime.now().replace(microsecond=0))
+        self.cache.put(etag, chart)
+        return chart
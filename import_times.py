@@ -0,0 +1,82 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+
+# Замер в отдельном процессе: сначала веб-приложение, затем стек анализа (первый запуск анализа)
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+web = time.perf_counter()
+import analytics
+analysis = time.perf_counter()
+print(json.dumps({'web_start': web - started, 'first_analysis': analysis - web}))
+"""
+
+# Холодный запуск - без байт-кода (.pyc компилируются из исходников),
+# теплый - следующий новый процесс, когда байт-код уже записан
+STARTS = ('cold', 'warm')
+
+
+def _probe(pycache_prefix):
+    # Без PYTHONDONTWRITEBYTECODE: холодный запуск должен записать байт-код для теплого
+    env = {name: value for name, value in os.environ.items() if name != 'PYTHONDONTWRITEBYTECODE'}
+    result = subprocess.run([sys.executable, '-X', f'pycache_prefix={pycache_prefix}', '-c', PROBE],
+                            capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), env=env, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(runs=5):
+    """Медианное время импорта по фазам в секундах для холодного и теплого запуска.
+
+    Каждый запуск получает пустой каталог байт-кода (pycache_prefix), поэтому
+    __pycache__ рядом с исходниками не читаются и не меняются.
+    """
+    samples = {start: [] for start in STARTS}
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix='pycache-') as prefix:
+            for start in STARTS:
+                samples[start].append(_probe(prefix))
+    return {start: {phase: statistics.median(sample[phase] for sample in samples[start])
+                    for phase in samples[start][0]}
+            for start in STARTS}
+
+
+def heaviest_imports(module, top=15):
+    """Самые долгие модули по выводу python -X importtime (в миллисекундах, накопительно)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        rows.append((int(cumulative_us.strip()) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер времени импорта веб-приложения и стека анализа")
+    parser.add_argument('--runs', type=int, default=5, help="число запусков для медианы")
+    parser.add_argument('--top', metavar='MODULE', help="показать самые долгие импорты модуля")
+    args = parser.parse_args(argv)
+
+    if args.top:
+        for cumulative_ms, name in heaviest_imports(args.top):
+            print(f"{cumulative_ms:9.1f} мс  {name}")
+        return
+
+    for start, phases in measure(args.runs).items():
+        for phase, seconds in phases.items():
+            print(f"[TIME] {start} {phase}: {seconds * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
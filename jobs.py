@@ -0,0 +1,185 @@
+import sys
+import uuid
+import threading
+import contextvars
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+# Задача текущего контекста: потоки, запущенные задачей с копией контекста
+# (contextvars.copy_context().run, asyncio.to_thread), пишут в ее журнал
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+
+class _JobOutput:
+    """Подмена sys.stdout: вывод потоков, выполняющих задачу, попадает в журнал задачи"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data):
+        job = _current_job.get()
+        if job is None:
+            return self.stream.write(data)
+        job.write(data)
+        return len(data)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class Job:
+    """Фоновая задача: статус, прогресс и журнал вывода"""
+
+    def __init__(self, key, description=""):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.description = description
+        self.status = 'queued'
+        self.progress_done = 0
+        self.progress_total = 0
+        self.current_step = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.lines = []
+        self._partial = ''
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    def write(self, data):
+        """Добавление вывода в журнал построчно"""
+        with self._cond:
+            text = self._partial + data
+            *complete, self._partial = text.split('\n')
+            if complete:
+                self.lines.extend(complete)
+                self._cond.notify_all()
+
+    def progress(self, done, total, step=None):
+        """Обновление прогресса задачи"""
+        with self._cond:
+            self.progress_done = done
+            self.progress_total = total
+            self.current_step = step
+            self._cond.notify_all()
+
+    def _set_status(self, status, error=None):
+        with self._cond:
+            if self._partial:
+                self.lines.append(self._partial)
+                self._partial = ''
+            self.status = status
+            self.error = error
+            if status == 'running':
+                self.started_at = datetime.now()
+            elif self.finished:
+                self.finished_at = datetime.now()
+            self._cond.notify_all()
+
+    def follow(self, offset=0, poll_interval=1.0):
+        """Генератор строк журнала: отдает накопленное и ждет новое до завершения задачи"""
+        while True:
+            with self._cond:
+                while offset >= len(self.lines) and not self.finished:
+                    self._cond.wait(poll_interval)
+                lines = self.lines[offset:]
+                finished = self.finished
+            offset += len(lines)
+            for line in lines:
+                yield line + '\n'
+            if finished and offset >= len(self.lines):
+                return
+
+    def to_dict(self):
+        """Статус задачи для JSON-ответа"""
+        with self._cond:
+            return {
+                'id': self.id,
+                'key': self.key,
+                'description': self.description,
+                'status': self.status,
+                'progress': {
+                    'done': self.progress_done,
+                    'total': self.progress_total,
+                    'step': self.current_step,
+                },
+                'error': self.error,
+                'created_at': self.created_at.isoformat(timespec='seconds'),
+                'started_at': self.started_at.isoformat(timespec='seconds') if self.started_at else None,
+                'finished_at': self.finished_at.isoformat(timespec='seconds') if self.finished_at else None,
+                'log_lines': len(self.lines),
+            }
+
+
+class JobManager:
+    """Планировщик фоновых задач внутри процесса.
+
+    Потоки пула живут все время работы приложения, поэтому тяжелые библиотеки
+    импортируются один раз. Повторный запуск задачи с тем же ключом, пока
+    предыдущая не завершилась, возвращает уже идущую задачу (single-flight).
+    """
+
+    def __init__(self, max_workers=2, history=50):
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+        if not isinstance(sys.stdout, _JobOutput):
+            sys.stdout = _JobOutput(sys.stdout)
+
+    def submit(self, key, func, description=""):
+        """Постановка задачи в очередь; func получает объект Job"""
+        with self._lock:
+            active = self._active.get(key)
+            if active is not None and not active.finished:
+                return active, False
+
+            job = Job(key, description)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            while len(self._jobs) > self.history:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if not oldest.finished:
+                    break
+                del self._jobs[oldest_id]
+
+        self._executor.submit(self._run, job, func)
+        return job, True
+
+    def warm_up(self, func):
+        """Фоновый прогрев пула (например, импорт тяжелых модулей)"""
+        self._executor.submit(func)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _run(self, job, func):
+        token = _current_job.set(job)
+        job._set_status('running')
+        try:
+            func(job)
+            job._set_status('succeeded')
+        except Exception as e:
+            job.write(traceback.format_exc())
+            job._set_status('failed', error=str(e))
+        finally:
+            _current_job.reset(token)
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
@@ -0,0 +1,149 @@
+import os
+import re
+import shutil
+import functools
+import importlib.util
+
+
+# Предел точек в одном кадре анимации plotly (0 - без ограничения)
+DEFAULT_POINT_BUDGET = 1000
+
+# Укрупнение зерна по порядку: день, неделя, месяц
+GRAINS = ('D', 'W', 'M')
+GRAIN_LABELS = {'D': 'день', 'W': 'неделя', 'M': 'месяц'}
+
+PLOTLY_JS_PREFIX = 'plotly-'
+PLOTLY_JS_SUFFIX = '.min.js'
+# Заголовок plotly.min.js: "* plotly.js v2.26.0"
+PLOTLY_JS_VERSION = re.compile(rb'plotly\.js v(\d+\.\d+\.\d+\S*)')
+
+
+def default_point_budget():
+    """Предел точек в кадре из окружения (PLOT_POINT_BUDGET)"""
+    try:
+        return max(0, int(os.environ.get('PLOT_POINT_BUDGET', DEFAULT_POINT_BUDGET)))
+    except ValueError:
+        return DEFAULT_POINT_BUDGET
+
+
+def _frame_starts(dates, frame_freq):
+    return dates.dt.to_period(frame_freq).dt.start_time
+
+
+def coarsen(df, date_column, grain, keys, sums, weighted, frame_freq='M'):
+    """Агрегация до зерна grain внутри кадров анимации.
+
+    Суммы складываются, средние из weighted ({колонка: колонка веса}) пересчитываются
+    как взвешенные; неделя на стыке месяцев делится между двумя кадрами.
+    """
+    columns = list(df.columns)
+    dates = df[date_column]
+    frame_start = _frame_starts(dates, frame_freq)
+    period_start = dates.dt.to_period(grain).dt.start_time
+    df = df.assign(**{date_column: period_start.where(period_start > frame_start, frame_start)})
+    df = df.assign(**{f'_{column}_x_w': df[column] * df[weight] for column, weight in weighted.items()})
+
+    group = [date_column, *keys]
+    aggregated = df.groupby(group, observed=True, sort=False).agg(
+        **{column: (column, 'sum') for column in sums},
+        **{f'_{column}_x_w': (f'_{column}_x_w', 'sum') for column in weighted},
+    ).reset_index()
+    for column, weight in weighted.items():
+        aggregated[column] = aggregated.pop(f'_{column}_x_w') / aggregated[weight]
+    return aggregated.sort_values(group, ignore_index=True)[columns]
+
+
+def sample_frames(df, frame, budget, seed=0):
+    """Равномерная выборка не более budget строк в каждом кадре (воспроизводимая)"""
+    import numpy as np
+    rank = df.assign(_rank=np.random.default_rng(seed).random(len(df))) \
+        .groupby(frame, observed=True)['_rank'].rank(method='first')
+    return df[rank <= budget].reset_index(drop=True)
+
+
+def fit_point_budget(df, date_column, keys, sums, weighted, budget, frame_freq='M'):
+    """Данные анимированного графика, уложенные в предел точек на кадр.
+
+    Зерно укрупняется (день - неделя - месяц), пока самый большой кадр не
+    уложится в budget; если не хватает и месячного зерна, в кадрах
+    оставляется равномерная выборка. Зерно и исходное число точек
+    записываются в df.attrs для подписей графика.
+    """
+    if df is None or df.empty:
+        return df
+    points = len(df)
+    result = df
+    grain = GRAINS[0]
+    for grain in GRAINS:
+        if grain != GRAINS[0]:
+            result = coarsen(df, date_column, grain, keys, sums, weighted, frame_freq)
+        largest = result.groupby(_frame_starts(result[date_column], frame_freq)).size().max()
+        if not budget or largest <= budget:
+            break
+
+    sampled = bool(budget) and largest > budget
+    if sampled:
+        result = sample_frames(result, _frame_starts(result[date_column], frame_freq), budget)
+    result.attrs.update(df.attrs)
+    result.attrs.update(grain=grain, sampled=sampled, source_points=points)
+    if grain != GRAINS[0] or sampled:
+        print(f"[DATA] Предел {budget} точек на кадр: {points} -> {len(result)} точек, "
+              f"зерно - {GRAIN_LABELS[grain]}" + (", равномерная выборка" if sampled else ""))
+    return result
+
+
+def payload_note(df):
+    """Подпись к заголовку графика, если данные укрупнены или прорежены"""
+    grain = df.attrs.get('grain', GRAINS[0])
+    if df.attrs.get('sampled'):
+        return f"<br><sup>выборка {len(df)} из {df.attrs['source_points']} точек, зерно - {GRAIN_LABELS[grain]}</sup>"
+    if grain != GRAINS[0]:
+        return f"<br><sup>агрегировано по зерну: {GRAIN_LABELS[grain]}</sup>"
+    return ""
+
+
+def plain_labels(df):
+    """Категориальные колонки - обычными строками: plotly express группирует по ним
+    без observed и строил бы пустые группы для категорий, которых нет в данных"""
+    columns = df.select_dtypes('category').columns
+    return df.assign(**{column: df[column].astype(object) for column in columns}) if len(columns) else df
+
+
+def packaged_plotly_js():
+    """Путь к plotly.min.js из пакета plotly; пакет находится без импорта"""
+    spec = importlib.util.find_spec('plotly')
+    if spec is None or spec.origin is None:
+        raise ModuleNotFoundError("Пакет plotly не установлен")
+    return os.path.join(os.path.dirname(spec.origin), 'package_data', 'plotly.min.js')
+
+
+@functools.lru_cache(maxsize=None)
+def plotly_js_filename():
+    """Имя общего файла по версии plotly.js из заголовка файла пакета (веб-процесс не импортирует plotly)"""
+    with open(packaged_plotly_js(), 'rb') as f:
+        match = PLOTLY_JS_VERSION.search(f.read(256))
+    if match is not None:
+        version = match.group(1).decode('ascii')
+    else:
+        from plotly.offline import get_plotlyjs_version
+        version = get_plotlyjs_version()
+    return f'{PLOTLY_JS_PREFIX}{version}{PLOTLY_JS_SUFFIX}'
+
+
+def is_plotly_js(filename):
+    """Общий файл plotly.js с версией в имени (его содержимое не меняется)"""
+    return filename.startswith(PLOTLY_JS_PREFIX) and filename.endswith(PLOTLY_JS_SUFFIX)
+
+
+def ensure_plotly_js(directory='charts'):
+    """Общий plotly.min.js рядом с HTML-графиками; имя файла для include_plotlyjs"""
+    filename = plotly_js_filename()
+    path = os.path.join(directory, filename)
+    if not os.path.exists(path):
+        # Копия файла пакета - то же, что plotly.offline.get_plotlyjs(), без импорта plotly
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        shutil.copyfile(packaged_plotly_js(), tmp_path)
+        os.replace(tmp_path, path)
+        print(f"[SUCCESS] Общий файл plotly.js: {path}")
+    return filename
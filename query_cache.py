@@ -0,0 +1,182 @@
+import os
+import re
+import json
+import time
+import glob
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+DEFAULT_CACHE_DIR = 'cache/queries'
+
+
+def normalize_sql(query):
+    """Нормализация текста запроса: пробелы и завершающая точка с запятой не влияют на ключ"""
+    return re.sub(r'\s+', ' ', str(query)).strip().rstrip(';').strip()
+
+
+def make_cache_key(query, params=None):
+    """Ключ кэша по нормализованному SQL и параметрам"""
+    payload = normalize_sql(query) + '\n' + json.dumps(params or {}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class QueryCache:
+    """Двухуровневый кэш результатов запросов: LRU в памяти и Parquet-файлы на диске.
+
+    Каждая запись живет ttl секунд на обоих уровнях. Потокобезопасен; дисковый уровень
+    общий для всех процессов, использующих тот же каталог.
+    """
+
+    def __init__(self, ttl=600, max_entries=128, max_bytes=256 * 2 ** 20,
+                 cache_dir=DEFAULT_CACHE_DIR, use_disk=True):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.use_disk = use_disk
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+        }
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.parquet')
+
+    def get(self, key):
+        """Результат из кэша (копия) или None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                df, expires_at, size = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return df.copy()
+                self._drop(key)
+                self._stats['expirations'] += 1
+
+        df = self._read_disk(key, now)
+        with self._lock:
+            if df is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+            self._store(key, df, now + self._remaining_disk_ttl(key, now))
+        return df.copy()
+
+    def put(self, key, df):
+        """Сохранение результата на обоих уровнях"""
+        with self._lock:
+            self._store(key, df.copy(), time.time() + self.ttl)
+        self._write_disk(key, df)
+
+    def invalidate(self, query=None, params=None):
+        """Сброс одной записи (по запросу и параметрам) или всего кэша"""
+        with self._lock:
+            if query is None:
+                keys = list(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+                paths = glob.glob(os.path.join(self.cache_dir, '*.parquet')) if self.use_disk else []
+            else:
+                key = make_cache_key(query, params)
+                keys = [key] if key in self._entries else []
+                for key_ in keys:
+                    self._drop(key_)
+                paths = [self._disk_path(key)] if self.use_disk else []
+            self._stats['invalidations'] += 1
+
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(keys)
+
+    def stats(self):
+        """Счетчики попаданий, промахов и вытеснений"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['hits'] = stats['memory_hits'] + stats['disk_hits']
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        return stats
+
+    def _store(self, key, df, expires_at):
+        if key in self._entries:
+            self._drop(key)
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (df, expires_at, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self._stats['evictions'] += 1
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _remaining_disk_ttl(self, key, now):
+        try:
+            return max(0.0, os.path.getmtime(self._disk_path(key)) + self.ttl - now)
+        except OSError:
+            return 0.0
+
+    def _read_disk(self, key, now):
+        if not self.use_disk:
+            return None
+        path = self._disk_path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl <= now:
+                os.remove(path)
+                with self._lock:
+                    self._stats['expirations'] += 1
+                return None
+            return pd.read_parquet(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[WARNING] Не удалось прочитать кэш {path}: {e}")
+            return None
+
+    def _write_disk(self, key, df):
+        if not self.use_disk:
+            return
+        path = self._disk_path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[WARNING] Не удалось записать кэш {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Общий для процесса кэш запросов"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = QueryCache()
+        return _default_cache
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+
+# Логические типы колонок результатов запросов и их представление в pandas:
+#   label  - строки с небольшим числом различных значений (категории)
+#   id     - идентификаторы строк
+#   count  - счетчики (COUNT, SUM по количествам)
+#   qty    - количество билетов в одной продаже
+#   price  - цена в одной строке продажи или лота: float32 хранит центы точно до $100000
+#   money  - суммы и средние денежных величин: float64, в float32 итоги теряли бы центы
+#   measure - прочие дробные величины (суммы квадратов, доли)
+LOGICAL_DTYPES = {
+    'label': 'category',
+    'id': 'int32',
+    'count': 'int32',
+    'qty': 'int16',
+    'price': 'float32',
+    'money': 'float64',
+    'measure': 'float64',
+}
+
+# Типы колонок по имени: имена колонок совпадают во всех запросах анализа,
+# отдельный запрос может переопределить их своей схемой
+COLUMN_TYPES = {
+    'catname': 'label',
+    'state': 'label',
+    'buyer_state': 'label',
+    'city': 'label',
+    'venuename': 'label',
+    'venuecity': 'label',
+    'venuestate': 'label',
+    'eventname': 'label',
+    'saleid': 'id',
+    'listid': 'id',
+    'eventid': 'id',
+    'venueid': 'id',
+    'buyerid': 'id',
+    'sellerid': 'id',
+    'sales_count': 'count',
+    'event_count': 'count',
+    'total_sales': 'count',
+    'total_events': 'count',
+    'user_count': 'count',
+    'sample_rows': 'count',
+    'tickets': 'count',
+    'tickets_sum': 'count',
+    'total_tickets': 'count',
+    'total_tickets_sold': 'count',
+    'qtysold': 'qty',
+    'pricepaid': 'price',
+    'commission': 'price',
+    'priceperticket': 'price',
+    'revenue': 'money',
+    'total_revenue': 'money',
+    'avg_transaction': 'money',
+    'avg_sale_amount': 'money',
+    'avg_revenue_per_event': 'money',
+    'avg_ticket_price': 'money',
+    'avg_price': 'money',
+    'listprice_sum': 'money',
+    'price_sum': 'money',
+    'price_sumsq': 'measure',
+    'revenue_sumsq': 'measure',
+    'tickets_sumsq': 'measure',
+}
+
+# Знаков после запятой у денежных величин при выгрузке в отчеты
+MONEY_DECIMALS = 2
+
+
+def frame_bytes(df):
+    """Память DataFrame с учетом содержимого строк"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _cast_integer(values, dtype):
+    """Целые в dtype, если значения в нем помещаются (иначе int64, без переполнения)"""
+    values = pd.to_numeric(values)
+    if (pd.api.types.is_float_dtype(values) and len(values) and not values.isna().any()
+            and values.abs().max() < 2 ** 53 and (values % 1 == 0).all()):
+        # SUM по целым в PostgreSQL - numeric (Decimal), после to_numeric - float с целыми значениями
+        values = values.astype('int64')
+    if values.isna().any() or not pd.api.types.is_integer_dtype(values):
+        # Пропуски (внешние соединения) и дробные значения остаются как есть
+        return values
+    limits = np.iinfo(dtype)
+    if len(values) and (values.min() < limits.min or values.max() > limits.max):
+        return values.astype('int64')
+    return values.astype(dtype)
+
+
+def _cast(values, dtype):
+    if dtype == 'category':
+        return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category')
+    if dtype.startswith('int'):
+        return _cast_integer(values, dtype)
+    # Decimal из numeric PostgreSQL приходит объектами - сначала в число
+    return pd.to_numeric(values).astype(dtype)
+
+
+def apply_schema(df, schema=None):
+    """Приведение колонок результата к объявленным типам.
+
+    schema - {колонка: логический тип} поверх COLUMN_TYPES; колонки без типа не меняются.
+    """
+    if df is None:
+        return None
+    types = dict(COLUMN_TYPES, **(schema or {}))
+    columns = {}
+    for column in df.columns:
+        kind = types.get(column)
+        if kind is None:
+            continue
+        dtype = LOGICAL_DTYPES[kind]
+        if str(df[column].dtype) != dtype:
+            columns[column] = _cast(df[column], dtype)
+    if not columns:
+        return df
+    return df.assign(**columns)
+
+
+def for_export(df):
+    """Колонки float32 в float64 с округлением до центов: в отчете - 12.3, а не 12.300000190734863"""
+    columns = {column: df[column].astype('float64').round(MONEY_DECIMALS)
+               for column in df.columns if df[column].dtype == 'float32'}
+    return df.assign(**columns) if columns else df
+
+
+def memory_note(typed_bytes, raw_bytes):
+    """Подпись памяти результата для вывода: после приведения типов и без него"""
+    note = f"{typed_bytes / 2 ** 10:.1f} КБ"
+    if raw_bytes > typed_bytes:
+        note += f" (без схемы {raw_bytes / 2 ** 10:.1f} КБ, -{1 - typed_bytes / raw_bytes:.0%})"
+    return note
@@ -0,0 +1,146 @@
+import time
+import argparse
+
+from sqlalchemy import text
+
+from db import get_engine
+from aggregate_store import DAILY_DELTA_QUERY, VENUE_DELTA_QUERY
+
+
+ROLLUP_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS agg_daily_sales (
+        sale_date DATE NOT NULL,
+        catname TEXT NOT NULL,
+        state TEXT NOT NULL,
+        sales_count BIGINT NOT NULL,
+        revenue NUMERIC(16, 2) NOT NULL,
+        tickets BIGINT NOT NULL,
+        listprice_sum NUMERIC(16, 2) NOT NULL,
+        PRIMARY KEY (sale_date, catname, state)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS agg_venue_events (
+        venueid INTEGER NOT NULL,
+        eventid INTEGER NOT NULL,
+        venuename TEXT,
+        venuecity TEXT,
+        venuestate TEXT,
+        sales_count BIGINT NOT NULL,
+        revenue NUMERIC(16, 2) NOT NULL,
+        PRIMARY KEY (venueid, eventid)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS agg_refresh_state (
+        rollup TEXT PRIMARY KEY,
+        last_saleid BIGINT NOT NULL,
+        refreshed_at TIMESTAMP NOT NULL
+    )
+    """,
+]
+
+REFRESH_DAILY = """
+INSERT INTO agg_daily_sales (sale_date, catname, state, sales_count, revenue, tickets, listprice_sum)
+""" + DAILY_DELTA_QUERY + """
+ON CONFLICT (sale_date, catname, state) DO UPDATE SET
+    sales_count = agg_daily_sales.sales_count + EXCLUDED.sales_count,
+    revenue = agg_daily_sales.revenue + EXCLUDED.revenue,
+    tickets = agg_daily_sales.tickets + EXCLUDED.tickets,
+    listprice_sum = agg_daily_sales.listprice_sum + EXCLUDED.listprice_sum
+"""
+
+REFRESH_VENUES = """
+INSERT INTO agg_venue_events (venueid, eventid, venuename, venuecity, venuestate, sales_count, revenue)
+""" + VENUE_DELTA_QUERY + """
+ON CONFLICT (venueid, eventid) DO UPDATE SET
+    venuename = EXCLUDED.venuename,
+    venuecity = EXCLUDED.venuecity,
+    venuestate = EXCLUDED.venuestate,
+    sales_count = agg_venue_events.sales_count + EXCLUDED.sales_count,
+    revenue = agg_venue_events.revenue + EXCLUDED.revenue
+"""
+
+ROLLUP_NAME = 'sales'
+
+# Чтение витрин для графиков вместо соединения сырых таблиц
+DAILY_ROLLUP_QUERY = """
+SELECT sale_date, catname, state, sales_count, revenue, tickets, listprice_sum
+FROM agg_daily_sales
+"""
+
+VENUE_ROLLUP_QUERY = """
+SELECT venueid, eventid, venuename, venuecity, venuestate, sales_count, revenue
+FROM agg_venue_events
+"""
+
+
+def _create_tables(conn):
+    for statement in ROLLUP_DDL:
+        conn.execute(text(statement))
+    # Строка состояния существует до первого обновления: ее блокировка упорядочивает
+    # параллельные обновления, иначе оба добавили бы весь диапазон saleid
+    conn.execute(text("INSERT INTO agg_refresh_state (rollup, last_saleid, refreshed_at) "
+                      "VALUES (:name, 0, CURRENT_TIMESTAMP) ON CONFLICT (rollup) DO NOTHING"),
+                 {'name': ROLLUP_NAME})
+
+
+def create_rollup_tables(engine):
+    """Создание таблиц-витрин агрегатов"""
+    with engine.begin() as conn:
+        _create_tables(conn)
+    print("[SUCCESS] Таблицы агрегатов созданы: agg_daily_sales, agg_venue_events, agg_refresh_state")
+
+
+def refresh_rollups(engine, full=False):
+    """Полное или инкрементальное (по saleid) обновление витрин в одной транзакции"""
+    started = time.perf_counter()
+    is_postgres = engine.dialect.name == 'postgresql'
+
+    with engine.begin() as conn:
+        _create_tables(conn)
+        lock = " FOR UPDATE" if is_postgres else ""
+        row = conn.execute(text(f"SELECT last_saleid FROM agg_refresh_state WHERE rollup = :name{lock}"),
+                           {'name': ROLLUP_NAME}).first()
+        low = 0 if full else row[0]
+        high = conn.execute(text("SELECT MAX(saleid) FROM sale")).scalar() or 0
+
+        if full:
+            for table in ('agg_daily_sales', 'agg_venue_events'):
+                conn.execute(text(f"TRUNCATE {table}" if is_postgres else f"DELETE FROM {table}"))
+        elif high <= low:
+            print(f"[INFO] Витрины агрегатов актуальны, отметка saleid={low}")
+            return 0
+
+        params = {'low': low, 'high': high}
+        conn.execute(text(REFRESH_DAILY), params)
+        conn.execute(text(REFRESH_VENUES), params)
+
+        conn.execute(text("UPDATE agg_refresh_state SET last_saleid = :high, "
+                          "refreshed_at = CURRENT_TIMESTAMP WHERE rollup = :name"),
+                     {'high': high, 'name': ROLLUP_NAME})
+
+    mode = "Полное" if full else "Инкрементальное"
+    print(f"[SUCCESS] {mode} обновление витрин агрегатов: saleid {low}..{high}, "
+          f"{time.perf_counter() - started:.2f} с")
+    return high - low
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Управление витринами агрегатов продаж в базе данных")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('create', help="создать таблицы агрегатов")
+    refresh_parser = subparsers.add_parser('refresh', help="обновить таблицы агрегатов")
+    refresh_parser.add_argument('--full', action='store_true', help="полная пересборка вместо инкрементальной")
+    args = parser.parse_args(argv)
+
+    engine = get_engine()
+    if args.command == 'create':
+        create_rollup_tables(engine)
+    else:
+        refresh_rollups(engine, full=args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import argparse
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from db import get_engine
+from time_window import month_starts, parse_window
+
+
+# Индексы под запросы с периодом: диапазон по saletime, затем соединения
+SALE_WINDOW_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_sale_saletime ON sale (saletime)",
+    "CREATE INDEX IF NOT EXISTS ix_sale_saletime_eventid ON sale (saletime, eventid)",
+    "CREATE INDEX IF NOT EXISTS ix_sale_eventid ON sale (eventid)",
+    "CREATE INDEX IF NOT EXISTS ix_sale_buyerid ON sale (buyerid)",
+    "CREATE INDEX IF NOT EXISTS ix_listing_listtime ON listing (listtime)",
+    "CREATE INDEX IF NOT EXISTS ix_events_starttime ON events (starttime)",
+]
+
+# В PostgreSQL покрывающий индекс: агрегаты по периоду читаются без обращения к таблице
+POSTGRES_COVERING_INDEX = ("CREATE INDEX IF NOT EXISTS ix_sale_saletime_covering ON sale (saletime) "
+                           "INCLUDE (eventid, buyerid, pricepaid, qtysold)")
+
+# Индексы секционированной таблицы создаются на родителе и наследуются секциями;
+# имена отличаются от индексов исходной таблицы, которая остается как sale_unpartitioned
+PARTITIONED_INDEXES = [
+    "CREATE INDEX ix_sale_part_saletime ON sale (saletime)",
+    "CREATE INDEX ix_sale_part_saleid ON sale (saleid)",
+    "CREATE INDEX ix_sale_part_eventid ON sale (eventid)",
+    "CREATE INDEX ix_sale_part_buyerid ON sale (buyerid)",
+    "CREATE INDEX ix_sale_part_listid ON sale (listid)",
+]
+
+EXPLAIN_QUERY = """
+SELECT DATE(s.saletime) AS sale_date, COUNT(s.saleid) AS sales_count, SUM(s.pricepaid) AS revenue
+FROM sale s
+{window}
+GROUP BY DATE(s.saletime)
+"""
+
+
+def _partition_name(month):
+    return f"sale_{month:%Y_%m}"
+
+
+def _next_month(month):
+    return datetime(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def index_statements(dialect):
+    """Индексы для запросов с периодом по времени продажи"""
+    statements = list(SALE_WINDOW_INDEXES)
+    if dialect == 'postgresql':
+        statements.append(POSTGRES_COVERING_INDEX)
+    return statements
+
+
+def partition_statements(first_month, last_month):
+    """Перевод sale в таблицу, секционированную по месяцам saletime (PostgreSQL).
+
+    Данные копируются в новую секционированную таблицу, которая затем подменяет
+    исходную; исходная остается как sale_unpartitioned до ручного удаления.
+    """
+    statements = [
+        "CREATE TABLE sale_partitioned (LIKE sale INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (saletime)",
+    ]
+    for month in month_starts(first_month, last_month):
+        statements.append(
+            f"CREATE TABLE {_partition_name(month)} PARTITION OF sale_partitioned "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')")
+    # Продажи вне диапазона месяцев (и без времени) - в секции по умолчанию
+    statements += [
+        "CREATE TABLE sale_default PARTITION OF sale_partitioned DEFAULT",
+        "INSERT INTO sale_partitioned SELECT * FROM sale",
+        "ALTER TABLE sale RENAME TO sale_unpartitioned",
+        "ALTER TABLE sale_partitioned RENAME TO sale",
+    ]
+    return statements + PARTITIONED_INDEXES + ["ANALYZE sale"]
+
+
+def add_month_statements(first_month, last_month):
+    """Новые месячные секции уже секционированной sale"""
+    return [f"CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF sale "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"
+            for month in month_starts(first_month, last_month)]
+
+
+def sale_time_bounds(engine):
+    """Первое и последнее время продажи"""
+    with engine.connect() as conn:
+        first, last = conn.execute(text("SELECT MIN(saletime), MAX(saletime) FROM sale")).one()
+    if isinstance(first, str):
+        first, last = datetime.fromisoformat(first), datetime.fromisoformat(last)
+    return first, last
+
+
+def is_partitioned(engine):
+    if engine.dialect.name != 'postgresql':
+        return False
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'sale')")).scalar()
+
+
+def run_statements(engine, statements, dry_run=False):
+    """Выполнение DDL в одной транзакции (или вывод SQL без выполнения)"""
+    if dry_run:
+        for statement in statements:
+            print(f"{statement};")
+        return
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+    print(f"[SUCCESS] Выполнено операторов: {len(statements)}")
+
+
+def explain_window(engine, window):
+    """План запроса за период: видно, какие секции и индексы он затрагивает"""
+    clause, params = window.clause('s.saletime') if window else ("", None)
+    prefix = "EXPLAIN QUERY PLAN" if engine.dialect.name == 'sqlite' else "EXPLAIN"
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"{prefix} {EXPLAIN_QUERY.format(window=clause)}"), params or {}).fetchall()
+    return [' | '.join(str(value) for value in row) for row in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Индексы и месячные секции таблицы sale для запросов с периодом")
+    parser.add_argument('command', choices=('indexes', 'partition', 'add-months', 'explain'),
+                        help="indexes - индексы по saletime; partition - перевод sale в секции по месяцам "
+                             "(PostgreSQL); add-months - новые секции; explain - план запроса за период")
+    parser.add_argument('--window', type=parse_window, default=None,
+                        help="период для explain и диапазон месяцев для partition/add-months "
+                             "(last:90, year:2008, 2008-01-01..2008-12-31)")
+    parser.add_argument('--dry-run', action='store_true', help="вывести SQL, не выполняя его")
+    args = parser.parse_args(argv)
+
+    engine = get_engine()
+    if args.command == 'indexes':
+        run_statements(engine, index_statements(engine.dialect.name), args.dry_run)
+        return
+    if args.command == 'explain':
+        for line in explain_window(engine, args.window):
+            print(line)
+        return
+
+    if engine.dialect.name != 'postgresql':
+        print(f"[ERROR] Секционирование поддерживается только в PostgreSQL (база: {engine.dialect.name})")
+        return
+    if args.window is not None and args.window.start and args.window.end:
+        first, last = args.window.start, args.window.end - timedelta(days=1)
+    else:
+        first, last = sale_time_bounds(engine)
+        if args.command == 'add-months':
+            # По умолчанию - секции на три месяца вперед от последней продажи
+            first = _next_month(datetime(last.year, last.month, 1))
+            last = _next_month(_next_month(first))
+    if args.command == 'partition':
+        if is_partitioned(engine):
+            print("[INFO] Таблица sale уже секционирована, новые секции: add-months")
+            return
+        run_statements(engine, partition_statements(first, last), args.dry_run)
+    else:
+        run_statements(engine, add_month_statements(first, last), args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import io
+import json
+import hashlib
+from decimal import Decimal
+
+from shards import SHARDED_SOURCES, Merge
+
+
+# Источник агрегатов API: сырые таблицы или витрина agg_daily_sales (rollups.py)
+API_SOURCES = ('sql', 'rollups')
+
+API_FORMATS = {
+    'json': 'application/json',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+# Дневные показатели продаж в двух источниках: выражения колонок и фильтров
+_RELATIONS = {
+    'sql': {
+        'from': """FROM sale s
+        JOIN events e ON s.eventid = e.eventid
+        JOIN category c ON e.catid = c.catid
+        JOIN "user" u ON s.buyerid = u.userid""",
+        'time': 's.saletime',
+        'sale_date': 'DATE(s.saletime)',
+        'catname': 'c.catname',
+        'state': 'u.state',
+        'sales_count': 'COUNT(s.saleid)',
+        'revenue': 'SUM(s.pricepaid)',
+        'tickets': 'SUM(s.qtysold)',
+    },
+    'rollups': {
+        'from': "FROM agg_daily_sales r",
+        'time': 'r.sale_date',
+        'sale_date': 'r.sale_date',
+        'catname': 'r.catname',
+        'state': 'r.state',
+        'sales_count': 'SUM(r.sales_count)',
+        'revenue': 'SUM(r.revenue)',
+        'tickets': 'SUM(r.tickets)',
+    },
+}
+
+# Наборы данных API: колонки группировки, порядок строк и его направление
+DATASETS = {
+    'daily': (['sale_date'], ['sale_date'], [True]),
+    'by-category': (['catname'], ['revenue'], [False]),
+    'by-state': (['state'], ['revenue'], [False]),
+}
+
+# Аддитивные показатели наборов данных: складываются при объединении шардов
+MEASURES = ['sales_count', 'revenue', 'tickets']
+
+SPLIT_COLUMNS = {'category': 'catname', 'state': 'state'}
+
+# Значения фильтров: из справочников, а не из таблицы продаж
+FILTER_QUERIES = {
+    'sql': {
+        'categories': "SELECT DISTINCT catname AS value FROM category ORDER BY value",
+        'states': 'SELECT DISTINCT state AS value FROM "user" ORDER BY value',
+    },
+    'rollups': {
+        'categories': "SELECT DISTINCT catname AS value FROM agg_daily_sales ORDER BY value",
+        'states': "SELECT DISTINCT state AS value FROM agg_daily_sales ORDER BY value",
+    },
+}
+
+# Значения справочников на каждом шарде одинаковые
+FILTER_MERGE = Merge(['value'], order='value', ascending=True, replicated=True)
+
+TOP_VENUES_QUERY = """
+SELECT v.venueid, v.venuename, v.venuecity, v.venuestate,
+       COUNT(DISTINCT e.eventid) AS event_count,
+       COUNT(s.saleid) AS sales_count,
+       SUM(s.pricepaid) AS revenue
+FROM sale s
+JOIN events e ON s.eventid = e.eventid
+JOIN category c ON e.catid = c.catid
+JOIN venue v ON e.venueid = v.venueid
+{where}
+GROUP BY v.venueid, v.venuename, v.venuecity, v.venuestate
+"""
+
+
+def _in_clause(column, name, values, params):
+    """column IN (:name_0, :name_1, ...) с параметрами для каждого значения"""
+    names = [f'{name}_{i}' for i in range(len(values))]
+    params.update(zip(names, values))
+    return f"{column} IN ({', '.join(':' + n for n in names)})"
+
+
+def _where(time_column, category_column, state_column, window, categories, states):
+    conditions, params = [], {}
+    if window is not None:
+        clause, window_params = window.clause(time_column, keyword='')
+        if clause:
+            conditions.append(clause.strip())
+            params.update(window_params)
+    if categories:
+        conditions.append(_in_clause(category_column, 'category', categories, params))
+    if states:
+        conditions.append(_in_clause(state_column, 'state', states, params))
+    return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+
+def build_query(dataset, source='sql', window=None, categories=(), states=(), limit=DEFAULT_LIMIT,
+                split=None):
+    """SQL, параметры и правило объединения (shards.Merge) набора данных с фильтрами;
+    split делит дневной ряд по категориям или штатам.
+
+    Сортировка и limit - в правиле объединения: первые строки отбираются по суммам
+    всех шардов, а не на каждом шарде отдельно.
+    """
+    if dataset == 'top-venues':
+        where, params = _where('s.saletime', 'c.catname', 'v.venuestate', window, categories, states)
+        merge = Merge(['venueid', 'venuename', 'venuecity', 'venuestate'],
+                      ['event_count', 'sales_count', 'revenue'], order='revenue', limit=limit,
+                      columns=['venuename', 'venuecity', 'venuestate', 'event_count', 'sales_count', 'revenue'])
+        return TOP_VENUES_QUERY.format(where=where), params, merge
+
+    relation = _RELATIONS[source]
+    keys, order, ascending = DATASETS[dataset]
+    if split:
+        keys = keys + [SPLIT_COLUMNS[split]]
+        order = order + [SPLIT_COLUMNS[split]]
+        ascending = ascending + [True]
+    where, params = _where(relation['time'], relation['catname'], relation['state'],
+                           window, categories, states)
+    select = ', '.join(f"{relation[key]} AS {key}" for key in keys)
+    group = ', '.join(relation[key] for key in keys)
+    query = f"""
+    SELECT {select},
+           {relation['sales_count']} AS sales_count,
+           {relation['revenue']} AS revenue,
+           {relation['tickets']} AS tickets
+    {relation['from']}
+    {where}
+    GROUP BY {group}
+    """
+    return query, params, Merge(keys, MEASURES, order=order, ascending=ascending, limit=limit)
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, float) and value != value:
+        return None
+    if hasattr(value, 'isoformat'):
+        # Даты без времени - в виде YYYY-MM-DD
+        if not any(getattr(value, part, 0) for part in ('hour', 'minute', 'second', 'microsecond')):
+            return value.isoformat()[:10]
+        return value.isoformat()
+    return value
+
+
+def encode_frame(df, fmt, meta=None):
+    """Колоночный JSON ({колонка: [значения]}) или поток Arrow IPC"""
+    if fmt == 'arrow':
+        import pyarrow as pa
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if meta:
+            table = table.replace_schema_metadata({k: json.dumps(v, default=str) for k, v in meta.items()})
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+
+    payload = dict(meta or {})
+    payload['rows'] = len(df)
+    payload['columns'] = {str(col): [_json_value(v) for v in df[col].tolist()] for col in df.columns}
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+class EncodedResult:
+    """Закодированный ответ API: байты, MIME-тип и ETag по содержимому"""
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+
+
+class SalesAPI:
+    """Агрегаты продаж с фильтрами на стороне базы для клиентских графиков.
+
+    Каждый вызов - один небольшой запрос через анализатор с общим кэшем
+    запросов; одинаковые фильтры отдаются из кэша.
+    """
+
+    def __init__(self, query_cache=None, source='sql', shards=None):
+        if source not in API_SOURCES:
+            raise ValueError(f"Неизвестный источник данных API: {source}")
+        if shards is not None and source not in SHARDED_SOURCES:
+            # Витрины обновляются по одной базе: с шардами API показывал бы часть данных
+            raise ValueError(f"Источник API {source} не поддерживает несколько баз")
+        self.query_cache = query_cache
+        self.source = source
+        self.shards = shards
+
+    def _analyzer(self):
+        from analytics import TicketSalesAnalyzer
+        return TicketSalesAnalyzer(query_cache=self.query_cache, shards=self.shards, request_scoped=True)
+
+    def fetch(self, dataset, window=None, categories=(), states=(), limit=DEFAULT_LIMIT, split=None):
+        """DataFrame набора данных или None при ошибке запроса"""
+        if dataset != 'top-venues' and dataset not in DATASETS:
+            raise KeyError(dataset)
+        if split is not None and (dataset != 'daily' or split not in SPLIT_COLUMNS):
+            raise ValueError(f"Разбиение {split} не поддерживается для {dataset}")
+        limit = min(max(int(limit), 1), MAX_LIMIT)
+        query, params, merge = build_query(dataset, self.source, window, list(categories), list(states),
+                                           limit, split)
+        return self._analyzer().execute_query(query, f"API {dataset}", params, merge=merge)
+
+    def filter_values(self):
+        """Значения для фильтров: категории и штаты"""
+        analyzer = self._analyzer()
+        values = {}
+        for name, query in FILTER_QUERIES[self.source].items():
+            df = analyzer.execute_query(query, merge=FILTER_MERGE)
+            values[name] = [] if df is None else df['value'].dropna().tolist()
+        return values
+
+    def encoded(self, dataset, fmt='json', **filters):
+        """Ответ API в заданном формате или None при ошибке запроса"""
+        df = self.fetch(dataset, **filters)
+        if df is None:
+            return None
+        meta = {'dataset': dataset, 'source': self.source}
+        return EncodedResult(encode_frame(df, fmt, meta), API_FORMATS[fmt])
@@ -0,0 +1,228 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+# Одна денормализованная выборка продаж вместо отдельного JOIN в каждом графике
+FACTS_QUERY = """
+SELECT s.saleid, s.listid, s.eventid, e.venueid,
+       s.saletime,
+       c.catname, u.state,
+       v.venuename, v.venuecity, v.venuestate,
+       s.pricepaid, s.qtysold, l.priceperticket
+FROM sale s
+JOIN events e ON s.eventid = e.eventid
+JOIN category c ON e.catid = c.catid
+JOIN "user" u ON s.buyerid = u.userid
+JOIN venue v ON e.venueid = v.venueid
+JOIN listing l ON s.listid = l.listid
+"""
+
+FACT_DTYPES = {
+    'saleid': 'int32',
+    'listid': 'int32',
+    'eventid': 'int32',
+    'venueid': 'int32',
+    'catname': 'category',
+    'state': 'category',
+    'venuename': 'category',
+    'venuecity': 'category',
+    'venuestate': 'category',
+    'pricepaid': 'float32',
+    'qtysold': 'int16',
+    'priceperticket': 'float32',
+}
+
+# Типы колонок при разборе выгрузки фактов в Arrow (без вывода типов по первому блоку)
+FACT_ARROW_TYPES = {
+    'saleid': 'int32',
+    'listid': 'int32',
+    'eventid': 'int32',
+    'venueid': 'int32',
+    'saletime': 'timestamp[us]',
+    'catname': 'string',
+    'state': 'string',
+    'venuename': 'string',
+    'venuecity': 'string',
+    'venuestate': 'string',
+    'pricepaid': 'float32',
+    'qtysold': 'int16',
+    'priceperticket': 'float32',
+}
+
+DAILY_KEYS = ['sale_date', 'catname', 'state']
+VENUE_KEYS = ['venueid', 'venuename', 'venuecity', 'venuestate', 'eventid']
+
+
+def compact_facts(df):
+    """Приведение выборки продаж к компактным типам"""
+    df = df.astype({col: dtype for col, dtype in FACT_DTYPES.items() if col in df.columns})
+    df['saletime'] = pd.to_datetime(df['saletime'])
+    return df
+
+
+def concat_facts(chunks):
+    """Склейка частей выборки с объединением категорий"""
+    if not chunks:
+        return pd.DataFrame(columns=list(FACT_DTYPES)).pipe(compact_facts)
+    if len(chunks) == 1:
+        return chunks[0]
+
+    columns = {}
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            columns[col] = union_categoricals([chunk[col] for chunk in chunks])
+        else:
+            columns[col] = np.concatenate([chunk[col].to_numpy() for chunk in chunks])
+    return pd.DataFrame(columns)
+
+
+def load_facts(engine, chunksize=200_000, backend='pandas'):
+    """Однократная выгрузка денормализованной таблицы фактов продаж"""
+    if backend == 'arrow':
+        import arrow_fetch
+        batches = arrow_fetch.iter_record_batches(engine, FACTS_QUERY, column_types=FACT_ARROW_TYPES)
+        chunks = [compact_facts(batch.to_pandas(date_as_object=False)) for batch in batches]
+    else:
+        chunks = [compact_facts(chunk)
+                  for chunk in pd.read_sql_query(FACTS_QUERY, engine, chunksize=chunksize)]
+    return concat_facts(chunks)
+
+
+def rollup_daily(facts):
+    """Агрегаты день × категория × штат с аддитивными показателями"""
+    # суммы считаются в 64-битных типах, компактные типы только для хранения строк
+    frame = facts.assign(
+        sale_date=facts['saletime'].dt.normalize(),
+        pricepaid=facts['pricepaid'].astype('float64'),
+        qtysold=facts['qtysold'].astype('int64'),
+        priceperticket=facts['priceperticket'].astype('float64'),
+    )
+    return frame.groupby(DAILY_KEYS, observed=True, sort=False).agg(
+        sales_count=('saleid', 'count'),
+        revenue=('pricepaid', 'sum'),
+        tickets=('qtysold', 'sum'),
+        listprice_sum=('priceperticket', 'sum'),
+    ).reset_index()
+
+
+def rollup_venues(facts):
+    """Агрегаты площадка × событие с аддитивными показателями"""
+    frame = facts.assign(pricepaid=facts['pricepaid'].astype('float64'))
+    return frame.groupby(VENUE_KEYS, observed=True, sort=False).agg(
+        sales_count=('saleid', 'count'),
+        revenue=('pricepaid', 'sum'),
+    ).reset_index()
+
+
+def pie_chart(daily):
+    """Выручка по категориям"""
+    df = daily.groupby('catname', observed=True)['revenue'].sum().reset_index()
+    return df.sort_values('revenue', ascending=False, ignore_index=True)
+
+
+def horizontal_bar_chart(daily):
+    """Средний чек по штатам (штаты с более чем 100 продажами)"""
+    df = daily.groupby('state', observed=True).agg(
+        revenue=('revenue', 'sum'),
+        total_sales=('sales_count', 'sum'),
+    ).reset_index()
+    df = df[df['total_sales'] > 100]
+    df = df.assign(avg_transaction=df['revenue'] / df['total_sales'])
+    df = df.sort_values('avg_transaction', ascending=False, ignore_index=True).head(15)
+    return df[['state', 'avg_transaction', 'total_sales']]
+
+
+def line_chart(daily):
+    """Количество продаж и выручка по месяцам"""
+    df = daily.assign(year=daily['sale_date'].dt.year, month=daily['sale_date'].dt.month)
+    df = df.groupby(['year', 'month']).agg(
+        total_sales=('sales_count', 'sum'),
+        total_revenue=('revenue', 'sum'),
+    ).reset_index()
+    return df.sort_values(['year', 'month'], ignore_index=True)
+
+
+def scatter_plot(daily):
+    """Средняя цена билета и количество проданных билетов по категориям"""
+    df = daily.groupby('catname', observed=True).agg(
+        listprice_sum=('listprice_sum', 'sum'),
+        sales_count=('sales_count', 'sum'),
+        total_tickets_sold=('tickets', 'sum'),
+    ).reset_index()
+    df = df[df['total_tickets_sold'] > 100]
+    df = df.assign(avg_ticket_price=df['listprice_sum'] / df['sales_count'])
+    return df[['avg_ticket_price', 'total_tickets_sold', 'catname']].reset_index(drop=True)
+
+
+def interactive_slider_chart(daily):
+    """Ежедневные продажи по категориям (период задает вызывающий код)"""
+    df = daily.groupby(['sale_date', 'catname'], observed=True).agg(
+        revenue=('revenue', 'sum'),
+        daily_sales=('sales_count', 'sum'),
+        daily_tickets=('tickets', 'sum'),
+    ).reset_index()
+    df['avg_price'] = df['revenue'] / df['daily_sales']
+    df = df.sort_values('sale_date', ignore_index=True)
+    return df[['sale_date', 'catname', 'avg_price', 'daily_sales', 'daily_tickets']]
+
+
+def interactive_category_sales(daily):
+    """Ежедневные продажи по категориям (период задает вызывающий код)"""
+    df = daily.groupby(['sale_date', 'catname'], observed=True).agg(
+        daily_sales=('sales_count', 'sum'),
+        daily_revenue=('revenue', 'sum'),
+        daily_tickets=('tickets', 'sum'),
+    ).reset_index()
+    df.insert(1, 'year', df['sale_date'].dt.year)
+    df.insert(2, 'month', df['sale_date'].dt.month)
+    return df.sort_values(['sale_date', 'catname'], ignore_index=True)
+
+
+def advanced_interactive_dashboard(daily):
+    """Ежедневные продажи по категориям и штатам (период задает вызывающий код).
+
+    Дисперсии оценок приближенного режима (колонки *_var) переносятся как есть.
+    """
+    df = daily[daily['revenue'] > 0].rename(columns={
+        'revenue': 'total_revenue',
+        'tickets': 'total_tickets',
+    })
+    df = df.assign(
+        month=df['sale_date'].dt.strftime('%Y-%m'),
+        avg_price=df['total_revenue'] / df['sales_count'],
+    )
+    df = df.sort_values('sale_date', ignore_index=True)
+    variances = [column for column in df.columns if column.endswith('_var')]
+    return df[['sale_date', 'month', 'catname', 'state', 'avg_price',
+               'sales_count', 'total_revenue', 'total_tickets'] + variances]
+
+
+def daily_series(daily):
+    """Дневные показатели рядов категория × штат (для поиска аномалий)"""
+    df = daily[DAILY_KEYS + ['sales_count', 'revenue', 'tickets']]
+    return df.sort_values('sale_date', ignore_index=True)
+
+
+def sales_summary(daily):
+    """Лист Sales_Summary: итоги по категориям"""
+    df = daily.groupby('catname', observed=True).agg(
+        total_sales=('sales_count', 'sum'),
+        total_tickets=('tickets', 'sum'),
+        total_revenue=('revenue', 'sum'),
+    ).reset_index()
+    df['avg_sale_amount'] = df['total_revenue'] / df['total_sales']
+    return df.sort_values('total_revenue', ascending=False, ignore_index=True)
+
+
+def venue_performance(venues):
+    """Лист Venue_Performance: события и выручка по площадкам"""
+    df = venues.groupby(['venueid', 'venuename', 'venuecity', 'venuestate'], observed=True).agg(
+        total_events=('eventid', 'nunique'),
+        total_revenue=('revenue', 'sum'),
+        sales_count=('sales_count', 'sum'),
+    ).reset_index()
+    df['avg_revenue_per_event'] = df['total_revenue'] / df['sales_count']
+    df = df.sort_values('total_revenue', ascending=False, ignore_index=True)
+    return df[['venuename', 'venuecity', 'venuestate', 'total_events',
+               'total_revenue', 'avg_revenue_per_event']]
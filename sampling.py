@@ -0,0 +1,124 @@
+import numpy as np
+
+
+# Способы выборки строк sale: SYSTEM - случайные страницы таблицы (быстрее всего),
+# BERNOULLI - случайные строки (читает все страницы, но соединения - только для выбранных)
+SAMPLE_METHODS = ('system', 'bernoulli')
+DEFAULT_SAMPLE_PERCENT = 10
+
+# Одинаковое зерно выборки дает одинаковые данные, и неизменные графики не перерисовываются
+SAMPLE_SEED = 42
+
+# Этапы анализа, у которых есть приближенный вариант запроса; отчеты всегда точные
+APPROX_STEPS = ('scatter_plot', 'advanced_interactive_dashboard')
+
+# Доверительные интервалы: 95%, нормальное приближение
+CONFIDENCE = 0.95
+Z_SCORE = 1.959964
+
+# Вне PostgreSQL выборка - по мультипликативному хэшу saleid в базисных пунктах
+HASH_MULTIPLIER = 2654435761
+HASH_MODULUS = 2 ** 32
+HASH_BUCKETS = 10000
+
+
+def parse_approx_steps(value):
+    """Этапы приближенного режима из аргумента: список через запятую или all"""
+    steps = [step.strip() for step in value.split(',') if step.strip()]
+    if steps == ['all']:
+        return set(APPROX_STEPS)
+    unknown = [step for step in steps if step not in APPROX_STEPS]
+    if unknown:
+        raise ValueError(f"Нет приближенного варианта для: {', '.join(unknown)} "
+                         f"(доступны: {', '.join(APPROX_STEPS)})")
+    return set(steps)
+
+
+class SaleSample:
+    """Выборка строк таблицы sale для приближенных запросов.
+
+    В PostgreSQL - TABLESAMPLE с REPEATABLE, в остальных СУБД - фильтр по хэшу
+    saleid (строковая выборка). Суммы по выборке делятся на долю выборки
+    (оценка Хорвица - Томпсона), средние считаются по выбранным строкам.
+    """
+
+    def __init__(self, percent=DEFAULT_SAMPLE_PERCENT, method='system', seed=SAMPLE_SEED):
+        if not 0 < percent <= 100:
+            raise ValueError(f"Доля выборки должна быть в (0, 100]: {percent}")
+        if method not in SAMPLE_METHODS:
+            raise ValueError(f"Неизвестный способ выборки: {method}")
+        self.percent = float(percent)
+        self.method = method
+        self.seed = seed
+
+    @property
+    def fraction(self):
+        return self.percent / 100
+
+    def key(self):
+        return (self.percent, self.method, self.seed)
+
+    def table(self, dialect, alias='s'):
+        """Источник строк sale вместо "sale s" в FROM"""
+        if dialect == 'postgresql':
+            return (f"sale {alias} TABLESAMPLE {self.method.upper()} ({self.percent}) "
+                    f"REPEATABLE ({self.seed})")
+        cutoff = round(self.fraction * HASH_BUCKETS)
+        return (f"(SELECT * FROM sale WHERE (saleid * {HASH_MULTIPLIER}) % {HASH_MODULUS} "
+                f"% {HASH_BUCKETS} < {cutoff}) {alias}")
+
+    def describe(self):
+        return {'percent': self.percent, 'method': self.method, 'confidence': CONFIDENCE}
+
+
+def total_variance(sample_sumsq, fraction):
+    """Дисперсия оценки суммы по строковой выборке доли fraction"""
+    return (1 - fraction) * sample_sumsq / fraction ** 2
+
+
+def estimate_totals(df, columns, fraction):
+    """Оценки сумм по выборке и их дисперсии (<колонка>_var).
+
+    columns - {колонка суммы: колонка суммы квадратов или None для числа строк}.
+    Дисперсии складываются при укрупнении групп, поэтому интервалы считаются в конце.
+    """
+    estimates = {}
+    for column, sumsq in columns.items():
+        squares = df[column] if sumsq is None else df[sumsq]
+        estimates[f'{column}_var'] = total_variance(squares.astype('float64'), fraction)
+        estimates[column] = df[column] / fraction
+    squares = [sumsq for sumsq in columns.values() if sumsq is not None]
+    return df.assign(**estimates).drop(columns=squares)
+
+
+def mean_interval(count, total, sumsq, fraction):
+    """Среднее по выборке и полуширина его доверительного интервала"""
+    count = count.astype('float64')
+    mean = total / count
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = ((sumsq - count * mean ** 2) / (count - 1)).clip(lower=0)
+        half_width = Z_SCORE * np.sqrt((1 - fraction) * variance / count)
+    return mean, half_width.where(count > 1)
+
+
+def add_intervals(df, columns):
+    """Полуширины доверительных интервалов (<колонка>_ci) вместо дисперсий (<колонка>_var)"""
+    if df is None:
+        return None
+    return df.assign(**{f'{column}_ci': Z_SCORE * np.sqrt(df[f'{column}_var']) for column in columns}) \
+        .drop(columns=[f'{column}_var' for column in columns])
+
+
+def mark_sampled(df, sample):
+    """Параметры выборки в attrs данных (для подписей графиков и отпечатков)"""
+    if df is not None:
+        df.attrs['sample'] = sample.describe()
+    return df
+
+
+def sample_note(df):
+    """Пометка о приближенных данных для заголовка графика"""
+    sample = df.attrs.get('sample')
+    if not sample:
+        return ""
+    return f" (выборка {sample['percent']:g}%, {sample['confidence']:.0%} ДИ)"
@@ -0,0 +1,267 @@
+import os
+import time
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from db import build_engine, load_db_config
+
+
+# Поведение при отказе шарда: fail - запрос завершается ошибкой,
+# partial - результат по ответившим шардам с предупреждением
+FAILURE_POLICIES = ('fail', 'partial')
+
+# Источники данных анализа, которые читают шарды: хранилище агрегатов и витрины
+# обновляются инкрементально по одной базе
+SHARDED_SOURCES = ('sql', 'facts')
+
+
+class ShardTimeout(Exception):
+    """Шард не ответил за отведенное время, запрос к нему отменен"""
+
+
+class ShardError(Exception):
+    """Запрос не выполнен на одном или нескольких шардах"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        super().__init__("; ".join(f"{name}: {error}" for name, error in failures.items()))
+
+
+def default_shard_urls():
+    """Адреса шардов из окружения (DATABASE_SHARDS, через запятую); пустой список - одна база"""
+    return parse_shard_urls(os.environ.get('DATABASE_SHARDS', ''))
+
+
+def parse_shard_urls(value):
+    return [url.strip() for url in value.split(',') if url.strip()]
+
+
+def default_shard_timeout():
+    """Таймаут запроса к шарду в секундах из окружения (SHARD_TIMEOUT, 0 - без таймаута)"""
+    return float(os.environ.get('SHARD_TIMEOUT', 0)) or None
+
+
+def shard_name(url):
+    """Имя шарда для сообщений: база и хост без пароля"""
+    url = make_url(url)
+    database = os.path.basename(url.database or '') or url.get_backend_name()
+    return f"{database}@{url.host}" if url.host else database
+
+
+class Merge:
+    """Правило объединения частичных агрегатов одного запроса, полученных с шардов.
+
+    keys - колонки группировки; sums - аддитивные колонки (SUM, COUNT);
+    ratios - {колонка: (числитель, знаменатель)}: средние из слагаемых, считаются
+    после сложения; having - {колонка: порог}: остаются строки с колонкой больше порога;
+    order/ascending - колонка или список колонок и направление, как в DataFrame.sort_values;
+    limit - отбор первых строк; columns - итоговые колонки;
+    replicated - запрос только к справочникам, которые на каждом шарде полные:
+    берется результат одного шарда. Условия having, сортировка и limit применяются
+    только к объединенному результату, поэтому в SQL таких запросов их нет.
+    """
+
+    def __init__(self, keys, sums=(), ratios=None, having=None, order=None, ascending=False,
+                 limit=None, columns=None, replicated=False):
+        self.keys = list(keys)
+        self.sums = list(sums)
+        self.ratios = dict(ratios or {})
+        self.having = dict(having or {})
+        self.order = order
+        self.ascending = ascending
+        self.limit = limit
+        self.columns = columns
+        self.replicated = replicated
+
+    @property
+    def finalizes(self):
+        return bool(self.ratios or self.having or self.order or self.limit or self.columns)
+
+    def combine(self, frames):
+        """Объединение результатов шардов (или доводка результата одной базы)"""
+        frames = [frame for frame in frames if frame is not None]
+        if self.replicated:
+            frames = frames[:1]
+        if len(frames) == 1 and not self.finalizes:
+            return frames[0]
+        df = pd.concat(frames, ignore_index=True)
+        # numeric PostgreSQL приходит объектами Decimal - складываются и делятся как числа
+        df = df.assign(**{column: pd.to_numeric(df[column]) for column in self.sums})
+        df = df.groupby(self.keys, sort=False, dropna=False)[self.sums].sum().reset_index()
+        for column, (numerator, denominator) in self.ratios.items():
+            df[column] = df[numerator] / df[denominator].where(df[denominator] != 0)
+        for column, threshold in self.having.items():
+            df = df[df[column] > threshold]
+        if self.order:
+            df = df.sort_values(self.order, ascending=self.ascending, kind='stable')
+        if self.limit:
+            df = df.head(self.limit)
+        if self.columns:
+            df = df[self.columns]
+        return df.reset_index(drop=True)
+
+
+def _cancel(dbapi_connection):
+    """Отмена выполняющегося запроса: psycopg2 - cancel(), sqlite3 - interrupt()"""
+    for method in ('cancel', 'interrupt'):
+        if hasattr(dbapi_connection, method):
+            try:
+                getattr(dbapi_connection, method)()
+            except Exception:
+                pass
+            return
+
+
+class Shard:
+    """Одна база шарда со своим пулом соединений"""
+
+    def __init__(self, url, timeout=None):
+        self.url = url
+        self.name = shard_name(url)
+        config = load_db_config(url)
+        if timeout:
+            # В PostgreSQL таймаут дублируется на сервере
+            config['statement_timeout_ms'] = int(timeout * 1000)
+        self.engine = build_engine(config)
+
+    def read(self, query, params, running):
+        """Результат запроса; соединение на время выполнения доступно для отмены"""
+        with self.engine.connect() as conn:
+            running[self.name] = conn.connection.dbapi_connection
+            try:
+                if params:
+                    return pd.read_sql_query(text(query), conn, params=params)
+                return pd.read_sql_query(text(query), conn)
+            finally:
+                running.pop(self.name, None)
+
+
+class ShardSet:
+    """Набор баз с одинаковой схемой TICKIT: запрос выполняется на всех одновременно.
+
+    Продажи, лоты и события разделены между шардами по событиям (каждое событие
+    со всеми его продажами - на одном шарде), справочники user, venue, category
+    и date на каждом шарде полные.
+
+    Время ответа определяется самым медленным шардом, а не суммой; шард, не
+    ответивший за timeout секунд, отменяется. При политике partial результат
+    собирается из ответивших шардов, имена остальных - в attrs['missing_shards'].
+    """
+
+    def __init__(self, urls, timeout=None, failures='fail'):
+        if not urls:
+            raise ValueError("Не заданы адреса шардов")
+        if failures not in FAILURE_POLICIES:
+            raise ValueError(f"Неизвестная политика отказов: {failures}")
+        self.shards = [Shard(url, timeout) for url in urls]
+        names = [shard.name for shard in self.shards]
+        if len(set(names)) != len(names):
+            # Одинаковые имена баз на разных хостах - различаем по номеру
+            for number, shard in enumerate(self.shards, 1):
+                shard.name = f"{number}:{shard.name}"
+        self.timeout = timeout
+        self.failures = failures
+
+    def __len__(self):
+        return len(self.shards)
+
+    @property
+    def dialect(self):
+        return self.shards[0].engine.dialect.name
+
+    def key(self):
+        """Состав шардов для ключей кэша: результаты разных наборов баз не смешиваются"""
+        return [shard.name for shard in self.shards]
+
+    def _run(self, task, cancel=None):
+        """task(shard) на всех шардах в потоках: ({шард: результат}, {шард: ошибка}, {шард: время})"""
+        started = time.perf_counter()
+        timings = {}
+
+        def timed(shard):
+            try:
+                return task(shard)
+            finally:
+                timings[shard.name] = time.perf_counter() - started
+
+        pool = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix='shard')
+        # Потоки шардов получают контекст вызывающего (журнал фоновой задачи)
+        futures = {pool.submit(contextvars.copy_context().run, timed, shard): shard for shard in self.shards}
+        done, not_done = wait(futures, timeout=self.timeout)
+        results, errors = {}, {}
+        for future, shard in futures.items():
+            if future in not_done:
+                errors[shard.name] = ShardTimeout(f"нет ответа за {self.timeout:g} с")
+                if cancel is not None:
+                    cancel(shard)
+            elif future.exception() is not None:
+                errors[shard.name] = future.exception()
+            else:
+                results[shard.name] = future.result()
+        # Не ждем отмененные запросы: поток завершится, когда драйвер прервет запрос
+        pool.shutdown(wait=False, cancel_futures=True)
+        return results, errors, timings
+
+    def _check(self, results, errors, description):
+        if errors and (self.failures == 'fail' or not results):
+            raise ShardError(errors)
+        if errors:
+            print(f"[WARNING] {description or 'Запрос'}: нет ответа от шардов "
+                  f"{', '.join(errors)} ({len(results)} из {len(self.shards)} ответили)")
+
+    def fetch(self, query, params=None, merge=None, description=""):
+        """Результат запроса со всех шардов, объединенный по merge (без него - строки подряд)"""
+        # {шард: соединение DBAPI} выполняющихся запросов (операции со словарем атомарны)
+        running = {}
+
+        def cancel(shard):
+            connection = running.get(shard.name)
+            if connection is not None:
+                _cancel(connection)
+
+        results, errors, timings = self._run(lambda shard: shard.read(query, params, running), cancel)
+        self._check(results, errors, description)
+        frames = [results[shard.name] for shard in self.shards if shard.name in results]
+        df = merge.combine(frames) if merge is not None else pd.concat(frames, ignore_index=True)
+        df.attrs['shard_timings'] = timings
+        if errors:
+            df.attrs['missing_shards'] = sorted(errors)
+        return df
+
+    def map(self, function, description=""):
+        """function(engine) на всех шардах одновременно: список результатов ответивших шардов"""
+        results, errors, _ = self._run(lambda shard: function(shard.engine))
+        self._check(results, errors, description)
+        return [results[shard.name] for shard in self.shards if shard.name in results]
+
+    def iter_chunks(self, query, params=None, chunksize=50000):
+        """Части результата со всех шардов по очереди (строки без объединения, ORDER BY - внутри шарда)"""
+        for shard in self.shards:
+            with shard.engine.connect().execution_options(stream_results=True) as conn:
+                yield from pd.read_sql_query(text(query), conn, params=params, chunksize=chunksize)
+
+    def dispose(self):
+        for shard in self.shards:
+            shard.engine.dispose()
+
+
+_default_shards = None
+_default_shards_lock = threading.Lock()
+
+
+def default_shard_set():
+    """Общий для процесса набор шардов из окружения (DATABASE_SHARDS, SHARD_TIMEOUT)
+    или None, если шарды не заданы и используется одна база DATABASE_URL"""
+    global _default_shards
+    urls = default_shard_urls()
+    if not urls:
+        return None
+    with _default_shards_lock:
+        if _default_shards is None:
+            _default_shards = ShardSet(urls, default_shard_timeout())
+        return _default_shards
@@ -0,0 +1,25 @@
+import io
+import os
+import sys
+
+import pytest
+
+# Модули проекта лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _OpenBuffer(io.BytesIO):
+    """Буфер временного потока: обертка app над ним переживает сам поток и не закрывает его"""
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    """Модуль приложения: при импорте он заменяет sys.stdout оберткой над его буфером,
+    поэтому импортируется поверх временного потока, а исходный возвращается после теста"""
+    monkeypatch.setattr(sys, 'stdout', io.TextIOWrapper(_OpenBuffer(), encoding='utf-8'))
+    import app
+    app.app.testing = True
+    return app
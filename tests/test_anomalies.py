@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from anomalies import ANOMALY_COLUMNS, detect_anomalies, score_panel, series_panel
+
+DATES = pd.date_range('2008-01-01', periods=120, freq='D')
+SPIKE_DAY = DATES[70]
+# Провал - за окном после всплеска: иначе всплеск раздувает стандартное отклонение zscore
+DROP_DAY = DATES[105]
+
+
+def _series(catname, state, values, dates=DATES):
+    return pd.DataFrame({'sale_date': dates, 'catname': catname, 'state': state, 'revenue': values})
+
+
+@pytest.fixture
+def daily():
+    """Ряды с недельной сезонностью и шумом; в ряду Jazz/CA - всплеск и провал"""
+    rng = np.random.default_rng(7)
+    weekly = np.tile([100, 90, 95, 110, 150, 220, 180], len(DATES) // 7 + 1)[:len(DATES)]
+    jazz = weekly * rng.normal(1, 0.05, len(DATES))
+    jazz[DATES.get_loc(SPIKE_DAY)] *= 4
+    jazz[DATES.get_loc(DROP_DAY)] = 5
+    pop = weekly * rng.normal(1, 0.05, len(DATES))
+    return pd.concat([_series('Jazz', 'CA', jazz), _series('Pop', 'NY', pop)], ignore_index=True)
+
+
+def test_series_panel_fills_gaps_after_first_sale():
+    daily = pd.concat([_series('Jazz', 'CA', [5.0, 7.0], DATES[[0, 3]]),
+                       _series('Pop', 'NY', [2.0], DATES[[2]])])
+    wide = series_panel(daily)
+    assert list(wide.index) == list(DATES[:4])
+    np.testing.assert_array_equal(wide[('Jazz', 'CA')], [5, 0, 0, 7])
+    # До первой продажи ряда - пропуск, а не ноль
+    np.testing.assert_array_equal(wide[('Pop', 'NY')], [np.nan, np.nan, 2, 0])
+
+
+@pytest.mark.parametrize('method', ['mad', 'zscore'])
+def test_flags_injected_spike_and_drop(daily, method):
+    df = detect_anomalies(daily, method=method)
+    assert list(df.columns) == ANOMALY_COLUMNS
+    jazz = df[df['catname'] == 'Jazz'].set_index('sale_date')
+    assert jazz.loc[SPIKE_DAY, 'direction'] == 'spike'
+    assert jazz.loc[DROP_DAY, 'direction'] == 'drop'
+    assert jazz.loc[DROP_DAY, 'score'] < 0 < jazz.loc[SPIKE_DAY, 'score']
+    # Сезонный пик выходных - не аномалия: ряд без выбросов не отмечен
+    assert (df['catname'] == 'Pop').sum() == 0
+    assert df.attrs['series'] == 2 and df.attrs['method'] == method
+
+
+def test_baseline_is_same_weekday_median(daily):
+    panel = score_panel(series_panel(daily))
+    day = DATES[50]
+    same_weekday = [day - pd.Timedelta(days=7 * i) for i in range(1, 5)]
+    values = panel['value'][('Pop', 'NY')]
+    assert panel['baseline'].loc[day, ('Pop', 'NY')] == pytest.approx(values.loc[same_weekday].median())
+
+
+def test_sparse_series_are_not_scored():
+    # Продажи раз в десять дней: каждая выглядела бы всплеском на фоне нулей
+    daily = _series('Opera', 'TX', np.where(np.arange(len(DATES)) % 10 == 0, 500.0, 0.0))
+    daily = daily[daily['revenue'] > 0]
+    assert detect_anomalies(daily).empty
+
+
+def test_empty_input():
+    df = detect_anomalies(pd.DataFrame(columns=['sale_date', 'catname', 'state', 'revenue']))
+    assert df.empty and df.attrs['series'] == 0
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        score_panel(pd.DataFrame({'a': [1.0, 2.0]}), method='iqr')
@@ -0,0 +1,156 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects.postgresql.psycopg2 import PGDialect_psycopg2
+
+import arrow_fetch
+
+# Вывод COPY ... WITH (FORMAT csv, HEADER true): пустое поле без кавычек - NULL,
+# перевод строки внутри значения - в кавычках
+COPY_CSV = (b'catname,sales,revenue,saletime\n'
+            b'Jazz,3,150.5,2008-01-05 10:00:00\n'
+            b'"Rock\nand Roll",1,,2008-01-06 11:30:00\n'
+            b',2,20.25,\n')
+
+
+class _FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def mogrify(self, sql, params):
+        for name, value in params.items():
+            sql = sql.replace(f'%({name})s', repr(value))
+        return sql.encode()
+
+    def copy_expert(self, sql, stream):
+        self.connection.sql = sql
+        if self.connection.error is not None:
+            raise self.connection.error
+        stream.write(self.connection.csv)
+
+
+class _FakeConnection:
+    encoding = 'UTF8'
+
+    def __init__(self, csv, error=None):
+        self.csv = csv
+        self.error = error
+        self.sql = None
+        self.closed = False
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+def _copy_engine(csv=COPY_CSV, error=None):
+    connection = _FakeConnection(csv, error)
+    return SimpleNamespace(dialect=PGDialect_psycopg2(), raw_connection=lambda: connection), connection
+
+
+def test_copy_result_is_parsed_by_arrow():
+    engine, connection = _copy_engine()
+    assert arrow_fetch.supports_copy(engine)
+    table = arrow_fetch.read_arrow_table(engine, "SELECT * FROM sales WHERE year = :year;", {'year': 2008})
+    assert connection.sql == "COPY (SELECT * FROM sales WHERE year = 2008) TO STDOUT WITH (FORMAT csv, HEADER true)"
+    assert connection.closed
+    df = arrow_fetch.arrow_to_frame(table)
+    assert df['catname'].dtype == pd.StringDtype('pyarrow')
+    assert df['catname'].tolist()[:2] == ['Jazz', 'Rock\nand Roll'] and pd.isna(df['catname'][2])
+    assert df['sales'].tolist() == [3, 1, 2]
+    assert pd.isna(df['revenue'][1]) and df['revenue'][2] == 20.25
+    assert pd.api.types.is_datetime64_any_dtype(df['saletime']) and pd.isna(df['saletime'][2])
+
+
+def test_copy_error_is_raised_and_connection_released():
+    engine, connection = _copy_engine(csv=b'', error=RuntimeError('relation "sales" does not exist'))
+    with pytest.raises(RuntimeError, match='does not exist'):
+        arrow_fetch.read_arrow_table(engine, "SELECT * FROM sales")
+    assert connection.closed
+
+
+def test_record_batches_stream_and_close_early(monkeypatch):
+    rows = b''.join(f'{i},{i * 0.5}\n'.encode() for i in range(100_000))
+    engine, connection = _copy_engine(csv=b'saleid,pricepaid\n' + rows)
+    monkeypatch.setattr(arrow_fetch, 'BLOCK_SIZE', 64 * 1024)
+    batches = arrow_fetch.iter_record_batches(engine, "SELECT saleid, pricepaid FROM sale")
+    first = next(batches)
+    assert 0 < first.num_rows < 100_000
+    # Досрочное закрытие освобождает канал и соединение
+    batches.close()
+    assert connection.closed
+
+
+def test_record_batches_split_rows_on_csv_boundaries(monkeypatch):
+    rows = b''.join(f'{i},"line {i}\nnext, ""quoted""",{i * 0.5}\n'.encode() for i in range(2000))
+    csv = b'saleid,note,pricepaid\n' + rows
+    monkeypatch.setattr(arrow_fetch, 'BLOCK_SIZE', 1000)
+    engine, _ = _copy_engine(csv=csv)
+    batches = list(arrow_fetch.iter_record_batches(engine, "SELECT * FROM sale"))
+    assert len(batches) > 1
+    # Типы колонок всех блоков - как у первого
+    assert len({batch.schema for batch in batches}) == 1
+    engine, _ = _copy_engine(csv=csv)
+    expected = arrow_fetch.read_arrow_table(engine, "SELECT * FROM sale")
+    assert pa.Table.from_batches(batches).equals(expected)
+    assert batches[0].column('note')[0].as_py() == 'line 0\nnext, "quoted"'
+
+
+def test_record_batches_type_mismatch_in_later_block(monkeypatch):
+    rows = b''.join(f'{i}\n'.encode() for i in range(5000)) + b'x\n'
+    monkeypatch.setattr(arrow_fetch, 'BLOCK_SIZE', 1000)
+    engine, connection = _copy_engine(csv=b'saleid\n' + rows)
+    with pytest.raises(pa.ArrowInvalid, match='int64'):
+        list(arrow_fetch.iter_record_batches(engine, "SELECT saleid FROM sale"))
+    assert connection.closed
+
+
+def test_read_frame_without_copy_matches_pandas(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sales.db'}")
+    pd.DataFrame({'catname': ['Jazz', 'Opera', None], 'sales': [3, 1, 2],
+                  'revenue': [150.5, None, 20.25]}).to_sql('sales', engine, index=False)
+    query = "SELECT catname, sales, revenue FROM sales WHERE sales >= :low"
+    df = arrow_fetch.read_frame(engine, query, {'low': 1})
+    expected = pd.read_sql_query(text(query), engine, params={'low': 1})
+    assert df['catname'].dtype == pd.StringDtype('pyarrow')
+    pd.testing.assert_frame_equal(df.astype({'catname': object}).fillna(-1),
+                                  expected.fillna(-1), check_dtype=False)
+
+
+def test_read_frame_falls_back_when_arrow_parse_fails(tmp_path, monkeypatch, capsys):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sales.db'}")
+    pd.DataFrame({'value': ['1', 'x']}).to_sql('t', engine, index=False)
+
+    def broken(*args, **kwargs):
+        raise pa.ArrowInvalid("CSV conversion error to int64: invalid value 'x'")
+
+    monkeypatch.setattr(arrow_fetch, 'read_arrow_table', broken)
+    df = arrow_fetch.read_frame(engine, "SELECT value FROM t")
+    assert df['value'].tolist() == ['1', 'x']
+    assert '[WARNING]' in capsys.readouterr().out
+
+
+def test_analyzer_arrow_backend_matches_pandas(tmp_path, monkeypatch):
+    import analytics
+    import tickit_synth
+    engine = create_engine(f"sqlite:///{tmp_path / 'tickit.db'}")
+    tickit_synth.load_synthetic_tickit(engine, scale=0.05)
+    monkeypatch.setattr(analytics, 'get_engine', lambda: engine)
+    results = {}
+    for backend in arrow_fetch.FETCH_BACKENDS:
+        analyzer = analytics.TicketSalesAnalyzer(request_scoped=True)
+        analyzer.fetch_backend = backend
+        results[backend] = analyzer.query_horizontal_bar_chart()
+    plain = lambda df: df.astype({column: object for column in df.select_dtypes(['category', 'string'])})
+    pd.testing.assert_frame_equal(plain(results['pandas']), plain(results['arrow']), check_dtype=False)
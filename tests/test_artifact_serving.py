@@ -0,0 +1,112 @@
+import gzip
+import os
+
+import pytest
+
+from artifacts import ArtifactIndex, ArtifactManifest, version
+
+HTML = ('<html><body>' + ''.join(f'<p>Продажи {i}</p>' for i in range(400)) + '</body></html>').encode()
+XLSX = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def client(app_module, tmp_path, monkeypatch):
+    """Приложение над каталогом tmp_path с опубликованными HTML-графиком и отчетом"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('charts')
+    os.makedirs('exports')
+    with open('charts/sales.html', 'wb') as f:
+        f.write(HTML)
+    with open('exports/report.xlsx', 'wb') as f:
+        f.write(XLSX)
+    manifest = ArtifactManifest('charts/manifest.json')
+    manifest.publish('run-1', ['charts/sales.html', 'exports/report.xlsx'], complete=True)
+    # send_from_directory ищет каталоги относительно корня приложения
+    monkeypatch.setattr(app_module.app, 'root_path', str(tmp_path))
+    index = ArtifactIndex('charts/manifest.json', check_interval=0)
+    monkeypatch.setattr(app_module, 'artifact_index', index)
+    return app_module.app.test_client(), index
+
+
+def test_original_without_accept_encoding(client):
+    client, index = client
+    entry = index.get('charts/sales.html')
+    assert set(entry['encodings']) == {'br', 'gzip'}
+    response = client.get('/interactive/sales.html', headers={'Accept-Encoding': 'identity'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == HTML
+    assert response.get_etag() == (entry['sha256'], False)
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_gzip_copy_with_its_own_etag(client):
+    client, index = client
+    entry = index.get('charts/sales.html')
+    response = client.get('/interactive/sales.html', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/html'
+    assert gzip.decompress(response.data) == HTML
+    assert response.get_etag() == (f"{entry['sha256']}-gzip", False)
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_brotli_preferred_over_gzip(client):
+    brotli = pytest.importorskip('brotli')
+    client, index = client
+    response = client.get('/interactive/sales.html', headers={'Accept-Encoding': 'gzip, deflate, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.data) == HTML
+    # Клиент, запретивший br, получает gzip
+    response = client.get('/interactive/sales.html', headers={'Accept-Encoding': 'br;q=0, gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+
+def test_if_none_match_returns_not_modified_per_representation(client):
+    client, index = client
+    sha256 = index.get('charts/sales.html')['sha256']
+    response = client.get('/interactive/sales.html',
+                          headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{sha256}-gzip"'})
+    assert response.status_code == 304 and response.data == b''
+    # ETag несжатого файла не подходит к сжатой копии
+    response = client.get('/interactive/sales.html',
+                          headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{sha256}"'})
+    assert response.status_code == 200
+    response = client.get('/exports/report.xlsx', headers={'If-None-Match': f'"{index.get("exports/report.xlsx")["sha256"]}"'})
+    assert response.status_code == 304
+
+
+def test_range_request_returns_partial_content(client):
+    client, index = client
+    sha256 = index.get('exports/report.xlsx')['sha256']
+    response = client.get('/exports/report.xlsx', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(XLSX)}'
+    assert response.data == XLSX[100:200]
+    # If-Range с текущим ETag - докачка, с устаревшим - файл целиком
+    response = client.get('/exports/report.xlsx', headers={'Range': 'bytes=-10', 'If-Range': f'"{sha256}"'})
+    assert response.status_code == 206 and response.data == XLSX[-10:]
+    response = client.get('/exports/report.xlsx', headers={'Range': 'bytes=-10', 'If-Range': '"stale"'})
+    assert response.status_code == 200 and response.data == XLSX
+    response = client.get('/exports/report.xlsx', headers={'Range': f'bytes={len(XLSX)}-'})
+    assert response.status_code == 416
+
+
+def test_versioned_url_is_cached_as_immutable(client):
+    client, index = client
+    entry = index.get('exports/report.xlsx')
+    response = client.get(f'/exports/report.xlsx?v={version(entry)}')
+    assert response.cache_control.max_age == 365 * 24 * 3600 and response.cache_control.immutable
+    response = client.get('/exports/report.xlsx?v=outdated')
+    assert response.cache_control.max_age == 0 and not response.cache_control.immutable
+
+
+def test_file_rewritten_after_manifest_is_served_as_is(client):
+    client, index = client
+    sha256 = index.get('charts/sales.html')['sha256']
+    with open('charts/sales.html', 'wb') as f:
+        f.write(b'<html>new</html>')
+    response = client.get('/interactive/sales.html', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200 and response.data == b'<html>new</html>'
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_etag()[0] != sha256
@@ -0,0 +1,101 @@
+import asyncio
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+import async_queries
+from async_queries import AsyncQueryExecutor, QueryTimeout
+from query_cache import make_cache_key
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'sales.db'}"
+    engine = create_engine(url)
+    pd.DataFrame({'catname': ['Jazz', 'Opera', 'Pop'], 'revenue': [150.5, 80.0, 20.25]}).to_sql(
+        'sales', engine, index=False)
+    monkeypatch.setenv('DATABASE_URL', url)
+    monkeypatch.setattr(async_queries, 'get_engine', lambda: engine)
+    # Без асинхронного драйвера запросы выполняются через общий движок в потоках
+    monkeypatch.setattr(async_queries, 'async_driver', lambda url: None)
+    return engine
+
+
+def test_results_errors_and_timings_by_key(engine):
+    executor = AsyncQueryExecutor(concurrency=2)
+    results, timings = executor.run({
+        'top': ("SELECT catname FROM sales WHERE revenue > :low ORDER BY revenue DESC", {'low': 50}),
+        'total': ("SELECT SUM(revenue) AS revenue FROM sales", None),
+        'broken': ("SELECT * FROM missing_table", None),
+    })
+    assert results['top']['catname'].tolist() == ['Jazz', 'Opera']
+    assert results['total']['revenue'][0] == pytest.approx(250.75)
+    assert isinstance(results['broken'], Exception)
+    assert set(timings) == {'top', 'total', 'broken'}
+
+
+def test_concurrency_limit_and_timeout(engine, monkeypatch):
+    active = peak = 0
+
+    async def read(self, engine, query, params):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        try:
+            await asyncio.sleep(0.5 if query == 'slow' else 0.01)
+        finally:
+            active -= 1
+        return pd.DataFrame({'query': [query]})
+
+    monkeypatch.setattr(AsyncQueryExecutor, '_read', read)
+    executor = AsyncQueryExecutor(concurrency=2, timeout=0.1)
+    statements = {f'q{i}': (f'q{i}', None) for i in range(6)}
+    statements['slow'] = ('slow', None)
+    results, _ = executor.run(statements)
+    assert peak == 2
+    assert all(results[f'q{i}']['query'][0] == f'q{i}' for i in range(6))
+    assert isinstance(results['slow'], QueryTimeout)
+
+
+def test_prefetch_runs_repeated_statements_once(engine, monkeypatch):
+    seen = []
+    run = AsyncQueryExecutor.run
+
+    def recording_run(self, statements):
+        seen.extend(statements)
+        return run(self, statements)
+
+    monkeypatch.setattr(AsyncQueryExecutor, 'run', recording_run)
+    query = "SELECT catname FROM sales WHERE revenue > :low"
+    results, timings, driver = async_queries.prefetch(
+        [(query, {'low': 50}), (query + ';', {'low': 50}), (query, {'low': 10})])
+    assert len(seen) == 2
+    assert results[make_cache_key(query, {'low': 10})]['catname'].tolist() == ['Jazz', 'Opera', 'Pop']
+    assert driver is None
+
+
+def test_analyzer_steps_read_prefetched_results(tmp_path, monkeypatch):
+    import analytics
+    import tickit_synth
+    url = f"sqlite:///{tmp_path / 'tickit.db'}"
+    engine = create_engine(url)
+    tickit_synth.load_synthetic_tickit(engine, scale=0.05)
+    monkeypatch.setenv('DATABASE_URL', url)
+    monkeypatch.setattr(analytics, 'get_engine', lambda: engine)
+    monkeypatch.setattr(async_queries, 'get_engine', lambda: engine)
+    monkeypatch.setattr(async_queries, 'async_driver', lambda url: None)
+
+    expected = analytics.TicketSalesAnalyzer(request_scoped=True).query_horizontal_bar_chart()
+    analyzer = analytics.TicketSalesAnalyzer(request_scoped=True)
+    statements = analyzer.collect_queries()
+    assert statements and all(isinstance(query, str) for query, _ in statements)
+    analyzer.prefetch_queries()
+    prefetched = len(analyzer._prefetched)
+    assert prefetched and all(isinstance(df, pd.DataFrame) for df in analyzer._prefetched.values())
+
+    # Этап берет готовый результат, а не выполняет запрос заново
+    monkeypatch.setattr(analytics.pd, 'read_sql_query', None)
+    df = analyzer.query_horizontal_bar_chart()
+    assert len(analyzer._prefetched) == prefetched - 1
+    pd.testing.assert_frame_equal(df, expected)
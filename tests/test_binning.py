@@ -0,0 +1,86 @@
+import io
+from types import SimpleNamespace
+
+import numpy as np
+import pyarrow.csv as pa_csv
+import pytest
+
+from arrow_fetch import arrow_to_frame
+from binning import (HistogramBinner, fixed_edges, histogram_frame, log_edges, quantile_edges,
+                     quantiles_from_histogram)
+
+
+def test_quantiles_of_uniform_histogram_are_linear():
+    edges = fixed_edges(0, 100, 10)
+    counts = np.full(10, 5)
+    np.testing.assert_allclose(quantiles_from_histogram(counts, edges, [0.1, 0.25, 0.5, 0.9]),
+                               [10, 25, 50, 90])
+
+
+def test_quantiles_interpolate_inside_bucket():
+    edges = np.array([0.0, 10.0, 20.0, 30.0])
+    counts = np.array([0, 4, 0])
+    # Все значения во второй корзине: квантили распределены по ее ширине
+    np.testing.assert_allclose(quantiles_from_histogram(counts, edges, [0.25, 0.5, 0.75]),
+                               [12.5, 15.0, 17.5])
+
+
+def test_quantiles_match_numpy_on_fine_grid():
+    values = np.random.default_rng(0).lognormal(3, 0.8, 20000).clip(1, 500)
+    grid = fixed_edges(1, 500, 2048)
+    counts = np.histogram(values, bins=grid)[0]
+    fractions = np.arange(1, 10) / 10
+    step = grid[1] - grid[0]
+    np.testing.assert_allclose(quantiles_from_histogram(counts, grid, fractions),
+                               np.quantile(values, fractions), atol=step)
+
+
+def test_quantiles_of_empty_histogram_are_nan():
+    assert np.isnan(quantiles_from_histogram(np.zeros(4), fixed_edges(0, 4, 4), [0.5])).all()
+
+
+def test_quantile_edges_are_clipped_and_unique():
+    edges = quantile_edges([5, 5, 7, 600], low=1, high=500)
+    np.testing.assert_array_equal(edges, [1, 5, 7, 500])
+
+
+def test_log_edges_require_positive_low():
+    with pytest.raises(ValueError):
+        log_edges(0, 100, 5)
+    np.testing.assert_allclose(log_edges(1, 1000, 3), [1, 10, 100, 1000])
+
+
+def test_histogram_frame():
+    df = histogram_frame(np.array([0, 1, 2]), [3, 4], 'fixed')
+    assert df.to_dict('list') == {'bin_left': [0, 1], 'bin_right': [1, 2], 'count': [3, 4]}
+    assert df.attrs['bin_strategy'] == 'fixed'
+
+
+class _ArrowAnalyzer:
+    """Анализатор PostgreSQL с выборкой FETCH_BACKEND=arrow: результат приходит через COPY в CSV"""
+
+    def __init__(self, csv):
+        self.engine = SimpleNamespace(dialect=SimpleNamespace(name='postgresql'))
+        self.shards = None
+        self.csv = csv
+        self.queries = []
+
+    def execute_query(self, query, description, params=None):
+        self.queries.append((query, params))
+        return arrow_to_frame(pa_csv.read_csv(io.BytesIO(self.csv)))
+
+
+def test_server_quantiles_parse_arrow_csv_rows():
+    analyzer = _ArrowAnalyzer(b"quantile\n12.5\n40\n87.25\n")
+    binner = HistogramBinner(analyzer, 'pricepaid', "FROM sales {sample} WHERE pricepaid BETWEEN :low AND :high",
+                             {}, low=1, high=500)
+    quantiles = binner.quantiles([0.25, 0.5, 0.75])
+    np.testing.assert_allclose(quantiles, [12.5, 40, 87.25])
+    query, params = analyzer.queries[0]
+    assert 'unnest' in query and params['fractions'] == [0.25, 0.5, 0.75]
+
+
+def test_server_quantiles_of_empty_range_are_none():
+    binner = HistogramBinner(_ArrowAnalyzer(b"quantile\n"), 'pricepaid', "FROM sales {sample}", {}, low=1, high=500)
+    assert binner.quantiles([0.5]) is None
+    assert binner.histogram(bins=4, strategy='quantile') is None
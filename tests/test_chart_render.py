@@ -0,0 +1,104 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+
+from chart_render import ChartRenderer, RenderCache, RenderedChart
+from query_cache import QueryCache
+from time_window import TimeWindow
+
+
+def _chart(size, etag='etag'):
+    return RenderedChart(b'x' * size, 'image/png', etag, datetime(2008, 1, 1))
+
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+    import tickit_synth
+    path = tmp_path_factory.mktemp('render') / 'tickit.db'
+    tickit_synth.load_synthetic_tickit(create_engine(f"sqlite:///{path}"), scale=0.1)
+    return f"sqlite:///{path}"
+
+
+@pytest.fixture
+def renderer(database, monkeypatch):
+    import analytics
+    engine = create_engine(database)
+    monkeypatch.setattr(analytics, 'get_engine', lambda: engine)
+    return ChartRenderer(query_cache=QueryCache(ttl=60, use_disk=False))
+
+
+def test_render_cache_evicts_least_recently_used():
+    cache = RenderCache(max_bytes=100, max_entries=2)
+    cache.put('a', _chart(10))
+    cache.put('b', _chart(10))
+    assert cache.get('a') is not None
+    cache.put('c', _chart(10))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'evictions': 1, 'entries': 2, 'bytes': 20}
+
+
+def test_render_cache_respects_byte_budget():
+    cache = RenderCache(max_bytes=100)
+    cache.put('a', _chart(60))
+    cache.put('b', _chart(60))
+    assert cache.get('a') is None and cache.get('b') is not None
+    cache.put('huge', _chart(500))
+    assert cache.get('huge') is None
+    assert cache.stats()['bytes'] == 60
+
+
+def test_repeated_render_is_served_from_cache(renderer):
+    first = renderer.render('pie_chart', dpi=50)
+    assert first.mimetype == 'image/png' and first.body.startswith(b'\x89PNG')
+    assert renderer.render('pie_chart', dpi=50) is first
+    stats = renderer.cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1
+
+
+def test_etag_depends_on_parameters_and_data(renderer):
+    base = renderer.render('pie_chart', dpi=50)
+    assert renderer.render('pie_chart', dpi=60).etag != base.etag
+    window = TimeWindow.between('2008-03-01', '2008-03-31')
+    assert renderer.render('pie_chart', window=window, dpi=50).etag != base.etag
+    # Значения dpi вне допустимого диапазона ограничиваются
+    assert renderer.render('pie_chart', dpi=1).etag == renderer.render('pie_chart', dpi=30).etag
+
+
+@pytest.mark.parametrize('fmt, mimetype, magic', [
+    ('svg', 'image/svg+xml', b'<?xml'),
+    ('webp', 'image/webp', b'RIFF'),
+])
+def test_vector_and_webp_formats(renderer, fmt, mimetype, magic):
+    chart = renderer.render('bar_chart', dpi=40, fmt=fmt)
+    assert chart.mimetype == mimetype and chart.body.startswith(magic)
+
+
+def test_render_rejects_unknown_chart_and_format(renderer):
+    with pytest.raises(KeyError):
+        renderer.render('excel_export')
+    with pytest.raises(ValueError):
+        renderer.render('pie_chart', fmt='gif')
+    assert renderer.render('pie_chart', window=TimeWindow.year(1990)) is None
+
+
+def test_render_endpoint_etag_and_errors(app_module, renderer, monkeypatch):
+    monkeypatch.setattr(app_module, '_chart_renderer', renderer)
+    client = app_module.app.test_client()
+
+    response = client.get('/render/pie_chart?dpi=50&year=2008')
+    assert response.status_code == 200 and response.mimetype == 'image/png'
+    etag = response.headers['ETag']
+    assert 'no-cache' in response.headers['Cache-Control'] or 'max-age=0' in response.headers['Cache-Control']
+
+    cached = client.get('/render/pie_chart?dpi=50&year=2008', headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.data == b''
+    changed = client.get('/render/pie_chart?dpi=60&year=2008', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+    assert client.get('/render/pie_chart?dpi=high').status_code == 400
+    assert client.get('/render/pie_chart?format=gif').status_code == 400
+    assert client.get('/render/unknown_chart').status_code == 404
+    assert client.get('/render/pie_chart?year=1990').status_code == 404
+    assert client.get('/render/stats').get_json()['entries'] == 2
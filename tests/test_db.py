@@ -0,0 +1,59 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+
+import db
+
+
+def _config(url, **overrides):
+    config = {'url': url, 'pool_size': 1, 'max_overflow': 0, 'pool_timeout': 5,
+              'pool_recycle': 1800, 'pool_pre_ping': False, 'statement_timeout_ms': 0}
+    config.update(overrides)
+    return config
+
+
+def test_database_url_is_required(monkeypatch):
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    with pytest.raises(RuntimeError, match='DATABASE_URL'):
+        db.load_db_config()
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///example.db')
+    assert db.load_db_config()['url'] == 'sqlite:///example.db'
+
+
+def test_waits_are_counted_when_pool_is_exhausted(tmp_path):
+    engine = db.build_engine(_config(f"sqlite:///{tmp_path / 'pool.db'}"))
+    metrics = db.PoolMetrics()
+    metrics.attach(engine)
+
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+    assert metrics.snapshot()['waits'] == 0
+
+    held = engine.connect()
+    released = threading.Timer(0.2, held.close)
+    released.start()
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+    released.join()
+
+    stats = metrics.snapshot()
+    assert stats['waits'] == 1 and stats['wait_timeouts'] == 0
+    assert stats['wait_seconds_total'] >= 0.15
+    engine.dispose()
+
+
+def test_wait_timeouts_are_counted(tmp_path):
+    engine = db.build_engine(_config(f"sqlite:///{tmp_path / 'pool.db'}", pool_timeout=0))
+    metrics = db.PoolMetrics()
+    metrics.attach(engine)
+    held = engine.connect()
+    started = time.perf_counter()
+    with pytest.raises(Exception, match='QueuePool limit'):
+        engine.connect()
+    assert time.perf_counter() - started < 2
+    held.close()
+    stats = metrics.snapshot()
+    assert stats['waits'] == 1 and stats['wait_timeouts'] == 1
+    engine.dispose()
@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from time_window import TimeWindow
+
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+    import tickit_synth
+    path = tmp_path_factory.mktemp('excel') / 'tickit.db'
+    tickit_synth.load_synthetic_tickit(create_engine(f"sqlite:///{path}"), scale=0.1)
+    return f"sqlite:///{path}"
+
+
+def _analyzer(database, monkeypatch, source='sql', window=None):
+    import analytics
+    monkeypatch.setattr(analytics, 'get_engine', lambda: create_engine(database))
+    analyzer = analytics.TicketSalesAnalyzer(source=source, request_scoped=True)
+    analyzer.window = window
+    return analyzer
+
+
+def _assert_same(expected, actual, rtol=1e-9):
+    plain = lambda df: df.astype({column: object for column in df.select_dtypes(['category', 'string'])}) \
+        .reset_index(drop=True)
+    pd.testing.assert_frame_equal(plain(expected), plain(actual), check_dtype=False, rtol=rtol)
+
+
+def test_sql_sheets_are_limited_to_window(database, monkeypatch):
+    window = TimeWindow.between('2008-03-01', '2008-05-31')
+    windowed = _analyzer(database, monkeypatch, window=window).prepare_data_for_excel_export()
+    full = _analyzer(database, monkeypatch).prepare_data_for_excel_export()
+    assert 0 < windowed['Sales_Summary']['total_sales'].sum() < full['Sales_Summary']['total_sales'].sum()
+    # Площадки и география покупателей - за все время
+    _assert_same(full['Venue_Performance'], windowed['Venue_Performance'])
+    _assert_same(full['User_Geography'], windowed['User_Geography'])
+
+
+@pytest.mark.parametrize('window', [None, TimeWindow.between('2008-03-01', '2008-05-31')])
+def test_sql_and_facts_sheets_match(database, monkeypatch, window):
+    sql = _analyzer(database, monkeypatch, window=window).prepare_data_for_excel_export()
+    facts = _analyzer(database, monkeypatch, source='facts', window=window).prepare_data_for_excel_export()
+    for sheet in ('Sales_Summary', 'Venue_Performance'):
+        # Цены в выгрузке фактов - float32
+        _assert_same(sql[sheet], facts[sheet], rtol=1e-5)
+
+
+def _chunks(rows, size):
+    for start in range(0, rows, size):
+        index = range(start, min(rows, start + size))
+        yield pd.DataFrame({'saleid': list(index), 'catname': [f'cat{i % 3}' for i in index],
+                            'pricepaid': [i * 1.5 for i in index]})
+
+
+def test_streaming_export_splits_sheets_at_row_limit(tmp_path, monkeypatch):
+    from openpyxl import load_workbook
+    from analytics import write_excel_export_streaming
+    monkeypatch.chdir(tmp_path)
+    assert write_excel_export_streaming({'Sales_Detail': _chunks(10, 3), 'Empty': iter([])},
+                                        'detail.xlsx', max_rows=5)
+
+    workbook = load_workbook(tmp_path / 'exports' / 'detail.xlsx')
+    # Четыре строки данных и заголовок на лист; пустой поток не создает листа
+    assert workbook.sheetnames == ['Sales_Detail', 'Sales_Detail_2', 'Sales_Detail_3']
+    sheets = pd.read_excel(tmp_path / 'exports' / 'detail.xlsx', sheet_name=None)
+    assert [len(sheet) for sheet in sheets.values()] == [4, 4, 2]
+    pd.testing.assert_frame_equal(pd.concat(sheets.values(), ignore_index=True),
+                                  pd.concat(_chunks(10, 3), ignore_index=True))
+    assert all(workbook[name].freeze_panes == 'A2' for name in workbook.sheetnames)
+
+
+def test_streaming_export_matches_regular_export(tmp_path, monkeypatch):
+    from analytics import write_excel_export, write_excel_export_streaming
+    monkeypatch.chdir(tmp_path)
+    frame = pd.concat(_chunks(50, 7), ignore_index=True)
+    assert write_excel_export({'Sales': frame}, 'regular.xlsx')
+    assert write_excel_export_streaming({'Sales': _chunks(50, 7)}, 'streaming.xlsx')
+    pd.testing.assert_frame_equal(pd.read_excel(tmp_path / 'exports' / 'regular.xlsx'),
+                                  pd.read_excel(tmp_path / 'exports' / 'streaming.xlsx'))
+
+
+def test_streaming_export_failure_leaves_no_file(tmp_path, monkeypatch):
+    from analytics import write_excel_export_streaming
+    monkeypatch.chdir(tmp_path)
+
+    def broken():
+        yield from _chunks(5, 5)
+        raise RuntimeError("соединение потеряно")
+
+    assert not write_excel_export_streaming({'Sales': broken()}, 'broken.xlsx')
+    assert not (tmp_path / 'exports' / 'broken.xlsx').exists()
+
+
+def test_analyzer_streams_detail_sheet(database, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    analyzer = _analyzer(database, monkeypatch, window=TimeWindow.between('2008-03-01', '2008-03-31'))
+    assert analyzer.export_to_excel_streaming('report.xlsx', chunksize=500, include_detail=True)
+    sheets = pd.read_excel(tmp_path / 'exports' / 'report.xlsx', sheet_name=None)
+    assert {'Sales_Summary', 'User_Geography', 'Venue_Performance', 'Sales_Detail'} <= set(sheets)
+    detail = sheets['Sales_Detail']
+    assert len(detail) == sheets['Sales_Summary']['total_sales'].sum() > 500
+    assert detail['saleid'].is_monotonic_increasing
+    assert detail['saletime'].between('2008-03-01', '2008-04-01').all()
@@ -0,0 +1,124 @@
+import contextvars
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from jobs import JobManager
+
+
+def _manager(monkeypatch):
+    """Менеджер задач создается в теле теста, после подмены sys.stdout захватом pytest;
+    monkeypatch возвращает исходный поток после теста"""
+    monkeypatch.setattr(sys, 'stdout', sys.stdout)
+    return JobManager(max_workers=2)
+
+
+def _wait(job):
+    list(job.follow(poll_interval=0.05))
+    assert job.finished
+    return job
+
+
+def test_status_transitions_and_log(monkeypatch):
+    manager = _manager(monkeypatch)
+    release = threading.Event()
+    statuses = []
+
+    def func(job):
+        statuses.append(job.status)
+        print("первая строка")
+        job.progress(1, 2, 'step')
+        release.wait(5)
+        print("вторая строка")
+
+    job, created = manager.submit('analysis', func)
+    assert created and job.status in ('queued', 'running')
+    release.set()
+    _wait(job)
+    assert statuses == ['running']
+    assert job.status == 'succeeded' and job.error is None
+    assert job.lines == ['первая строка', 'вторая строка']
+    assert job.to_dict()['progress'] == {'done': 1, 'total': 2, 'step': 'step'}
+    assert job.started_at is not None and job.finished_at >= job.started_at
+
+
+def test_exception_marks_job_failed(monkeypatch):
+    manager = _manager(monkeypatch)
+    def func(job):
+        print("перед ошибкой")
+        raise RuntimeError("сбой этапа")
+
+    job = _wait(manager.submit('analysis', func)[0])
+    assert job.status == 'failed' and job.error == "сбой этапа"
+    assert job.lines[0] == "перед ошибкой"
+    assert any('RuntimeError: сбой этапа' in line for line in job.lines)
+
+
+def test_single_flight_while_running(monkeypatch):
+    manager = _manager(monkeypatch)
+    release = threading.Event()
+    first, created = manager.submit('analysis', lambda job: release.wait(5))
+    second, joined_created = manager.submit('analysis', lambda job: None)
+    other, other_created = manager.submit('other', lambda job: None)
+    assert created and not joined_created and second is first
+    assert other_created and other is not first
+    release.set()
+    _wait(first)
+    _wait(other)
+
+    third, created = manager.submit('analysis', lambda job: None)
+    assert created and third is not first
+    _wait(third)
+    assert [job.id for job in manager.list()] == [first.id, other.id, third.id]
+    assert manager.get(first.id) is first
+
+
+def test_output_of_worker_threads_goes_to_job_log(monkeypatch):
+    manager = _manager(monkeypatch)
+    def func(job):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, print, f"поток {number}")
+                       for number in range(2)]
+            for future in futures:
+                future.result()
+
+    job = _wait(manager.submit('analysis', func)[0])
+    assert sorted(job.lines) == ['поток 0', 'поток 1']
+
+
+def test_output_of_shard_threads_goes_to_job_log(monkeypatch, tmp_path):
+    manager = _manager(monkeypatch)
+    from shards import ShardSet
+    shards = ShardSet([f"sqlite:///{tmp_path / f'shard{number}.db'}" for number in range(2)])
+
+    def func(job):
+        shards.map(lambda engine: print(f"шард {engine.url.database.rsplit('/', 1)[-1]}"), "Проверка")
+
+    job = _wait(manager.submit('analysis', func)[0])
+    assert {'шард shard0.db', 'шард shard1.db'} <= set(job.lines)
+
+
+def test_analysis_errors_fail_the_job(monkeypatch, app_module):
+    import analytics
+
+    def run_complete_analysis(self, progress=None, **kwargs):
+        self.report_error("Ошибка выполнения запроса: нет таблицы")
+
+    monkeypatch.setattr(analytics, 'get_engine', lambda: None)
+    monkeypatch.setattr(analytics.TicketSalesAnalyzer, 'run_complete_analysis', run_complete_analysis)
+    monkeypatch.setattr('shards.default_shard_set', lambda: None)
+    manager = _manager(monkeypatch)
+    job = _wait(manager.submit('complete_analysis', app_module._complete_analysis_job)[0])
+    assert job.status == 'failed'
+    assert "нет таблицы" in job.error
+    assert "[ERROR] Ошибка выполнения запроса: нет таблицы" in job.lines
+
+
+def test_main_exit_code_reflects_errors(monkeypatch):
+    import analytics
+    monkeypatch.setattr(analytics, 'get_engine', lambda: None)
+    monkeypatch.setattr(analytics.TicketSalesAnalyzer, 'run_complete_analysis',
+                        lambda self, **kwargs: self.report_error("сбой"))
+    assert analytics.main(['--source', 'sql']) == 1
+    monkeypatch.setattr(analytics.TicketSalesAnalyzer, 'run_complete_analysis', lambda self, **kwargs: None)
+    assert analytics.main(['--source', 'sql']) == 0
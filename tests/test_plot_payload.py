@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from plot_payload import ensure_plotly_js, fit_point_budget, payload_note, plotly_js_filename
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def daily():
+    """Два месяца дневных продаж по трем категориям"""
+    dates = pd.date_range('2008-01-01', '2008-02-29', freq='D')
+    rng = np.random.default_rng(1)
+    frames = []
+    for catname in ('Jazz', 'Opera', 'Pop'):
+        sales = rng.integers(1, 20, len(dates))
+        frames.append(pd.DataFrame({
+            'sale_date': dates,
+            'catname': catname,
+            'daily_sales': sales,
+            'avg_price': rng.uniform(10, 200, len(dates)),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _fit(df, budget):
+    return fit_point_budget(df, 'sale_date', ['catname'], ['daily_sales'],
+                            {'avg_price': 'daily_sales'}, budget)
+
+
+def _largest_frame(df):
+    return df.groupby(df['sale_date'].dt.to_period('M')).size().max()
+
+
+def test_fits_budget_without_changes(daily):
+    result = _fit(daily, budget=1000)
+    pd.testing.assert_frame_equal(result, daily)
+    assert result.attrs['grain'] == 'D' and not result.attrs['sampled']
+    assert payload_note(result) == ""
+
+
+def test_zero_budget_disables_limit(daily):
+    result = _fit(daily, budget=0)
+    assert len(result) == len(daily) and result.attrs['grain'] == 'D'
+
+
+def test_coarsens_to_weeks_preserving_totals(daily):
+    result = _fit(daily, budget=20)
+    assert result.attrs['grain'] == 'W' and not result.attrs['sampled']
+    assert result.attrs['source_points'] == len(daily)
+    assert _largest_frame(result) <= 20
+    # Неделя на стыке месяцев делится между кадрами: точка не выходит за свой месяц
+    assert result['sale_date'].min() == pd.Timestamp('2008-01-01')
+    assert (result['sale_date'] >= pd.Timestamp('2008-02-01')).sum() > 0
+
+    by_month = lambda df: df.groupby([df['sale_date'].dt.to_period('M'), 'catname'])['daily_sales'].sum()
+    pd.testing.assert_series_equal(by_month(result), by_month(daily))
+
+    # Средняя цена - взвешенная по продажам, а не среднее дневных средних
+    weighted = lambda df: (df['avg_price'] * df['daily_sales']).groupby(df['catname']).sum()
+    pd.testing.assert_series_equal(weighted(result), weighted(daily))
+
+
+def test_coarsens_to_months(daily):
+    result = _fit(daily, budget=3)
+    assert result.attrs['grain'] == 'M' and not result.attrs['sampled']
+    assert len(result) == 6
+    assert "месяц" in payload_note(result)
+
+
+def test_samples_frames_when_months_do_not_fit(daily):
+    result = _fit(daily, budget=2)
+    assert result.attrs['sampled'] and result.attrs['grain'] == 'M'
+    assert _largest_frame(result) == 2
+    # Выборка воспроизводима
+    pd.testing.assert_frame_equal(result, _fit(daily, budget=2))
+    assert "выборка" in payload_note(result)
+
+
+def test_keeps_source_attrs(daily):
+    daily.attrs['sample'] = {'percent': 10.0}
+    assert _fit(daily, budget=20).attrs['sample'] == {'percent': 10.0}
+
+
+def test_plotly_js_copy_matches_package(tmp_path):
+    from plotly.offline import get_plotlyjs, get_plotlyjs_version
+    filename = ensure_plotly_js(str(tmp_path))
+    assert filename == f'plotly-{get_plotlyjs_version()}.min.js' == plotly_js_filename()
+    assert (tmp_path / filename).read_text(encoding='utf-8') == get_plotlyjs()
+
+
+def test_explorer_does_not_import_plotly(tmp_path):
+    # Отдельный процесс: в процессе тестов plotly мог быть загружен другими тестами
+    probe = (
+        "import sys\n"
+        f"sys.path.insert(0, {ROOT!r})\n"
+        "import app\n"
+        "response = app.app.test_client().get('/explorer')\n"
+        "assert response.status_code == 200, response.status_code\n"
+        "assert b'/interactive/plotly-' in response.data\n"
+        "print(sorted(name for name in sys.modules if name.split('.')[0] == 'plotly'))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', probe], cwd=tmp_path, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == '[]'
+    assert len(list((tmp_path / 'charts').glob('plotly-*.min.js'))) == 1
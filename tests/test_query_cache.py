@@ -0,0 +1,127 @@
+import os
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+import query_cache
+from query_cache import QueryCache, make_cache_key
+
+
+class _Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(query_cache, 'time', clock)
+    return clock
+
+
+def _frame(rows=3):
+    return pd.DataFrame({'catname': [f'cat{i}' for i in range(rows)], 'revenue': [float(i) for i in range(rows)]})
+
+
+def test_cache_key_ignores_whitespace_and_semicolon():
+    assert make_cache_key("SELECT 1;", {'a': 1}) == make_cache_key("  SELECT\n 1 ", {'a': 1})
+    assert make_cache_key("SELECT 1", {'a': 1}) != make_cache_key("SELECT 1", {'a': 2})
+
+
+def test_miss_then_memory_hit_returns_copy(tmp_path, clock):
+    cache = QueryCache(ttl=60, cache_dir=str(tmp_path))
+    assert cache.get('key') is None
+    cache.put('key', _frame())
+    cached = cache.get('key')
+    pd.testing.assert_frame_equal(cached, _frame())
+    cached.loc[0, 'revenue'] = -1
+    assert cache.get('key').loc[0, 'revenue'] == 0
+    stats = cache.stats()
+    assert (stats['misses'], stats['memory_hits'], stats['disk_hits'], stats['entries']) == (1, 2, 0, 1)
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path, clock):
+    QueryCache(ttl=60, cache_dir=str(tmp_path)).put('key', _frame())
+    assert os.path.exists(tmp_path / 'key.parquet')
+    other = QueryCache(ttl=60, cache_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(other.get('key'), _frame())
+    other.get('key')
+    stats = other.stats()
+    assert stats['disk_hits'] == 1 and stats['memory_hits'] == 1
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = QueryCache(ttl=60, cache_dir=str(tmp_path))
+    cache.put('key', _frame())
+    clock.now += 59
+    assert cache.get('key') is not None
+    # Дисковый уровень сверяет время изменения файла с тем же сроком
+    os.utime(tmp_path / 'key.parquet', (clock.now - 59, clock.now - 59))
+    clock.now += 2
+    assert cache.get('key') is None
+    assert not os.path.exists(tmp_path / 'key.parquet')
+    stats = cache.stats()
+    assert stats['expirations'] == 2 and stats['misses'] == 1 and stats['entries'] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = QueryCache(ttl=60, max_entries=2, use_disk=False)
+    cache.put('a', _frame())
+    cache.put('b', _frame())
+    cache.get('a')
+    cache.put('c', _frame())
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_frames_over_byte_budget_are_not_kept_in_memory(clock):
+    cache = QueryCache(ttl=60, max_bytes=1024, use_disk=False)
+    cache.put('big', _frame(1000))
+    assert cache.get('big') is None
+    assert cache.stats()['bytes'] == 0
+
+
+def test_invalidate_one_query_or_everything(tmp_path, clock):
+    cache = QueryCache(ttl=60, cache_dir=str(tmp_path))
+    query = "SELECT catname, SUM(pricepaid) FROM sale GROUP BY catname"
+    cache.put(make_cache_key(query, {'year': 2008}), _frame())
+    cache.put(make_cache_key(query, {'year': 2009}), _frame())
+    cache.put(make_cache_key("SELECT 1"), _frame())
+
+    assert cache.invalidate(query, {'year': 2008}) == 1
+    assert cache.get(make_cache_key(query, {'year': 2008})) is None
+    assert cache.get(make_cache_key(query, {'year': 2009})) is not None
+
+    assert cache.invalidate() == 2
+    assert cache.get(make_cache_key("SELECT 1")) is None
+    assert list(tmp_path.glob('*.parquet')) == []
+    assert cache.stats()['invalidations'] == 2
+
+
+def test_analyzer_reads_repeated_query_from_cache(tmp_path, monkeypatch):
+    import analytics
+    url = f"sqlite:///{tmp_path / 'sales.db'}"
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sale (catname TEXT, pricepaid REAL)"))
+        conn.execute(text("INSERT INTO sale VALUES ('Jazz', 10), ('Jazz', 5), ('Opera', 7)"))
+    monkeypatch.setattr(analytics, 'get_engine', lambda: engine)
+    cache = QueryCache(ttl=60, cache_dir=str(tmp_path / 'cache'))
+    analyzer = analytics.TicketSalesAnalyzer(query_cache=cache, request_scoped=True)
+    query = "SELECT catname, SUM(pricepaid) AS revenue FROM sale GROUP BY catname ORDER BY catname"
+
+    first = analyzer.execute_query(query, "Выручка")
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO sale VALUES ('Jazz', 100)"))
+    second = analyzer.execute_query(query, "Выручка")
+    pd.testing.assert_frame_equal(first, second)
+    assert cache.stats()['memory_hits'] == 1
+
+    cache.invalidate(query)
+    fresh = analyzer.execute_query(query, "Выручка")
+    assert fresh['revenue'].tolist() == [115.0, 7.0]
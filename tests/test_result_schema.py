@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from result_schema import apply_schema, for_export, memory_note
+
+
+def test_declared_types_applied_by_column_name():
+    df = pd.DataFrame({
+        'catname': ['Jazz', 'Jazz', 'Opera'],
+        'saleid': [1, 2, 3],
+        'qtysold': [1, 4, 2],
+        'pricepaid': [10.5, 20.25, 99999.99],
+        'revenue': [Decimal('10.50'), Decimal('20.25'), Decimal('99999.99')],
+        'note': ['a', 'b', 'c'],
+    })
+    typed = apply_schema(df)
+    assert isinstance(typed['catname'].dtype, pd.CategoricalDtype)
+    assert typed['saleid'].dtype == 'int32'
+    assert typed['qtysold'].dtype == 'int16'
+    assert typed['pricepaid'].dtype == 'float32'
+    assert typed['revenue'].dtype == 'float64' and typed['revenue'][2] == 99999.99
+    # Колонка без объявленного типа не меняется
+    assert typed['note'].dtype == object
+
+
+def test_integer_out_of_range_falls_back_to_int64():
+    big = np.iinfo('int32').max + 1
+    typed = apply_schema(pd.DataFrame({'sales_count': [1, big], 'tickets': [-big - 1, 2], 'saleid': [1, 2]}))
+    assert typed['sales_count'].dtype == 'int64' and typed['sales_count'][1] == big
+    assert typed['tickets'].dtype == 'int64' and typed['tickets'][0] == -big - 1
+    assert typed['saleid'].dtype == 'int32'
+    typed = apply_schema(pd.DataFrame({'qtysold': [1, 40000]}))
+    assert typed['qtysold'].dtype == 'int64' and typed['qtysold'][1] == 40000
+
+
+def test_integer_nulls_fractions_and_numeric_sums():
+    typed = apply_schema(pd.DataFrame({'sales_count': [1.0, None], 'tickets': [1.5, 2.0],
+                                       'event_count': [Decimal(3), Decimal(4)],
+                                       'total_tickets': [Decimal(3), Decimal(2 ** 40)]}))
+    assert typed['sales_count'].dtype == 'float64' and pd.isna(typed['sales_count'][1])
+    assert typed['tickets'].tolist() == [1.5, 2.0]
+    # Целые суммы numeric (Decimal) - тоже целые, с тем же переходом на int64
+    assert typed['event_count'].dtype == 'int32' and typed['event_count'].tolist() == [3, 4]
+    assert typed['total_tickets'].dtype == 'int64' and typed['total_tickets'][1] == 2 ** 40
+
+
+def test_schema_overrides_and_empty_frames():
+    df = pd.DataFrame({'revenue': [1.25], 'catname': ['Jazz']})
+    typed = apply_schema(df, {'revenue': 'price'})
+    assert typed['revenue'].dtype == 'float32'
+    empty = apply_schema(pd.DataFrame({'sales_count': pd.Series([], dtype='int64')}))
+    assert empty['sales_count'].dtype == 'int32'
+    assert apply_schema(None) is None
+    typed = apply_schema(pd.DataFrame({'saleid': np.array([1], dtype='int32')}))
+    assert typed['saleid'].dtype == 'int32'
+
+
+def test_for_export_rounds_float32_to_cents():
+    df = apply_schema(pd.DataFrame({'pricepaid': [12.3, 0.1], 'revenue': [1 / 3, 2.0]}))
+    assert df['pricepaid'][0] != 12.3
+    exported = for_export(df)
+    assert exported['pricepaid'].dtype == 'float64' and exported['pricepaid'].tolist() == [12.3, 0.1]
+    # float64 не округляется
+    assert exported['revenue'][0] == 1 / 3
+    assert for_export(pd.DataFrame({'revenue': [1.0]})).equals(pd.DataFrame({'revenue': [1.0]}))
+
+
+def test_memory_note():
+    assert memory_note(1024, 4096) == "1.0 КБ (без схемы 4.0 КБ, -75%)"
+    assert memory_note(1024, 1024) == "1.0 КБ"
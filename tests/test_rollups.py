@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import rollups
+import tickit_synth
+
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+    path = tmp_path_factory.mktemp('rollups') / 'tickit.db'
+    tickit_synth.load_synthetic_tickit(create_engine(f"sqlite:///{path}"), scale=0.1)
+    return f"sqlite:///{path}"
+
+
+@pytest.fixture
+def engine(database):
+    engine = create_engine(database)
+    with engine.begin() as conn:
+        for table in ('agg_daily_sales', 'agg_venue_events', 'agg_refresh_state'):
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    yield engine
+    engine.dispose()
+
+
+def _totals(engine):
+    with engine.connect() as conn:
+        sales = conn.execute(text("SELECT COUNT(*), ROUND(SUM(pricepaid), 2) FROM sale")).one()
+        daily = conn.execute(text("SELECT SUM(sales_count), ROUND(SUM(revenue), 2) FROM agg_daily_sales")).one()
+        venues = conn.execute(text("SELECT SUM(sales_count), ROUND(SUM(revenue), 2) FROM agg_venue_events")).one()
+        mark = conn.execute(text("SELECT last_saleid FROM agg_refresh_state")).scalars().all()
+    return tuple(sales), tuple(daily), tuple(venues), mark
+
+
+def test_first_refresh_covers_all_sales(engine):
+    assert rollups.refresh_rollups(engine) > 0
+    sales, daily, venues, mark = _totals(engine)
+    assert daily == sales and venues == sales
+    assert len(mark) == 1
+
+
+def test_incremental_refresh_adds_only_new_sales(engine):
+    with engine.begin() as conn:
+        high = conn.execute(text("SELECT MAX(saleid) FROM sale")).scalar()
+        conn.execute(text("CREATE TABLE late_sale AS SELECT * FROM sale WHERE saleid > :cut"),
+                     {'cut': high - 500})
+        conn.execute(text("DELETE FROM sale WHERE saleid > :cut"), {'cut': high - 500})
+    try:
+        rollups.refresh_rollups(engine)
+        assert rollups.refresh_rollups(engine) == 0
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO sale SELECT * FROM late_sale"))
+        assert rollups.refresh_rollups(engine) == 500
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS late_sale"))
+
+    sales, daily, venues, mark = _totals(engine)
+    assert daily == sales and venues == sales
+    assert mark == [high]
+
+    rollups.refresh_rollups(engine, full=True)
+    assert _totals(engine) == (sales, daily, venues, mark)
+
+
+def test_concurrent_first_refreshes_do_not_double_count(engine):
+    barrier = threading.Barrier(2)
+    errors = []
+
+    def refresh():
+        barrier.wait()
+        try:
+            rollups.refresh_rollups(engine)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=refresh) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    sales, daily, venues, mark = _totals(engine)
+    assert daily == sales and venues == sales
+    assert len(mark) == 1
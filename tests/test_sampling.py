@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from sampling import (APPROX_STEPS, Z_SCORE, SaleSample, add_intervals, estimate_totals, mark_sampled,
+                      mean_interval, parse_approx_steps, sample_note)
+
+
+def test_parse_approx_steps():
+    assert parse_approx_steps('all') == set(APPROX_STEPS)
+    assert parse_approx_steps('scatter_plot, ') == {'scatter_plot'}
+    with pytest.raises(ValueError):
+        parse_approx_steps('scatter_plot,pie_chart')
+
+
+@pytest.mark.parametrize('percent, method', [(0, 'system'), (101, 'system'), (10, 'cluster')])
+def test_sale_sample_validation(percent, method):
+    with pytest.raises(ValueError):
+        SaleSample(percent, method)
+
+
+def test_postgres_sample_is_repeatable_tablesample():
+    assert SaleSample(5, 'bernoulli').table('postgresql') == \
+        "sale s TABLESAMPLE BERNOULLI (5.0) REPEATABLE (42)"
+
+
+def test_hash_sample_selects_fraction_deterministically():
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sale (saleid INTEGER PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO sale VALUES (:id)"), [{'id': i} for i in range(1, 50001)])
+        query = f"SELECT saleid FROM {SaleSample(10).table('sqlite')}"
+        first = [row[0] for row in conn.execute(text(query))]
+        second = [row[0] for row in conn.execute(text(query))]
+    assert first == second
+    assert len(first) / 50000 == pytest.approx(0.10, abs=0.005)
+
+
+def test_estimate_totals_scales_sums_and_keeps_input():
+    df = pd.DataFrame({'revenue': [30.0, 50.0], 'revenue_sumsq': [500.0, 1300.0], 'sales_count': [2, 3]})
+    original = df.copy()
+    result = estimate_totals(df, {'revenue': 'revenue_sumsq', 'sales_count': None}, fraction=0.1)
+    pd.testing.assert_frame_equal(df, original)
+    assert list(result.columns) == ['revenue', 'sales_count', 'revenue_var', 'sales_count_var']
+    np.testing.assert_allclose(result['revenue'], [300, 500])
+    np.testing.assert_allclose(result['sales_count'], [20, 30])
+    # (1 - f) * сумма квадратов / f^2
+    np.testing.assert_allclose(result['revenue_var'], [0.9 * 500 / 0.01, 0.9 * 1300 / 0.01])
+    np.testing.assert_allclose(result['sales_count_var'], [0.9 * 2 / 0.01, 0.9 * 3 / 0.01])
+
+
+def test_total_intervals_cover_population_total():
+    """Оценка суммы по строковой выборке несмещенная, 95% интервалы накрывают итог в ~95% выборок"""
+    rng = np.random.default_rng(0)
+    population = rng.lognormal(4, 1, 20000)
+    fraction = 0.05
+    estimates, covered = [], 0
+    for _ in range(400):
+        sample = population[rng.random(len(population)) < fraction]
+        df = pd.DataFrame({'revenue': [sample.sum()], 'revenue_sumsq': [(sample ** 2).sum()]})
+        df = add_intervals(estimate_totals(df, {'revenue': 'revenue_sumsq'}, fraction), ['revenue'])
+        estimate, half_width = df['revenue'].iloc[0], df['revenue_ci'].iloc[0]
+        estimates.append(estimate)
+        covered += abs(estimate - population.sum()) <= half_width
+    assert np.mean(estimates) == pytest.approx(population.sum(), rel=0.01)
+    assert 0.91 <= covered / 400 <= 0.99
+
+
+def test_mean_interval():
+    values = np.array([10.0, 12.0, 14.0, 20.0])
+    mean, half_width = mean_interval(pd.Series([4, 1]), pd.Series([values.sum(), 5.0]),
+                                     pd.Series([(values ** 2).sum(), 25.0]), fraction=0.2)
+    assert mean.tolist() == [14.0, 5.0]
+    expected = Z_SCORE * np.sqrt(0.8 * values.var(ddof=1) / 4)
+    assert half_width.iloc[0] == pytest.approx(expected)
+    # По одной строке разброс не оценить
+    assert np.isnan(half_width.iloc[1])
+
+
+def test_add_intervals_and_note():
+    df = add_intervals(pd.DataFrame({'tickets': [100.0], 'tickets_var': [25.0]}), ['tickets'])
+    assert list(df.columns) == ['tickets', 'tickets_ci']
+    assert df['tickets_ci'].iloc[0] == pytest.approx(Z_SCORE * 5)
+    assert sample_note(df) == ""
+    assert sample_note(mark_sampled(df, SaleSample(10))) == " (выборка 10%, 95% ДИ)"
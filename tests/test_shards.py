@@ -0,0 +1,231 @@
+import sqlite3
+import threading
+import time
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from shards import Merge, ShardError, ShardSet, ShardTimeout, parse_shard_urls
+
+# Таблицы, разделенные между шардами по событиям; остальные - полные на каждом шарде
+PARTITIONED = ('events', 'listing', 'sale')
+
+QUERY_METHODS = ['query_pie_chart', 'query_bar_chart', 'query_horizontal_bar_chart', 'query_line_chart',
+                 'query_histogram', 'query_scatter_plot', 'query_anomalies', 'query_interactive_slider_chart',
+                 'query_interactive_category_sales', 'query_advanced_interactive_dashboard']
+
+
+def _split(source, paths):
+    """Шарды базы source: события, лоты и продажи по eventid % len(paths), справочники целиком"""
+    import tickit_synth
+    con = sqlite3.connect(source)
+    for number, path in enumerate(paths):
+        shard = sqlite3.connect(path)
+        shard.execute(f"ATTACH DATABASE '{source}' AS src")
+        for table in tickit_synth.TABLE_ORDER:
+            shard.execute(con.execute("SELECT sql FROM sqlite_master WHERE name = ?", (table,)).fetchone()[0])
+            where = f"WHERE eventid % {len(paths)} = {number}" if table in PARTITIONED else ""
+            shard.execute(f'INSERT INTO "{table}" SELECT * FROM src."{table}" {where}')
+        shard.commit()
+        shard.close()
+    con.close()
+
+
+@pytest.fixture(scope='module')
+def databases(tmp_path_factory):
+    """Синтетическая база TICKIT и два ее шарда: (адрес базы, адреса шардов)"""
+    import tickit_synth
+    directory = tmp_path_factory.mktemp('shards')
+    source = str(directory / 'tickit.sqlite')
+    tickit_synth.load_synthetic_tickit(create_engine(f'sqlite:///{source}'), scale=0.1)
+    paths = [str(directory / f'shard{number}.sqlite') for number in range(2)]
+    _split(source, paths)
+    return f'sqlite:///{source}', [f'sqlite:///{path}' for path in paths]
+
+
+def _analyzers(databases, monkeypatch, source='sql'):
+    import analytics
+    url, shard_urls = databases
+    monkeypatch.setattr(analytics, 'get_engine', lambda: create_engine(url))
+    single = analytics.TicketSalesAnalyzer(source=source, request_scoped=True)
+    sharded = analytics.TicketSalesAnalyzer(source=source, shards=ShardSet(shard_urls), request_scoped=True)
+    return single, sharded
+
+
+def _assert_same(expected, actual):
+    assert expected is not None and actual is not None
+    plain = lambda df: df.astype({column: object for column in df.select_dtypes('category')}) \
+        .reset_index(drop=True)
+    pd.testing.assert_frame_equal(plain(expected), plain(actual), check_dtype=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize('method', QUERY_METHODS)
+def test_sharded_query_matches_single_database(databases, monkeypatch, method):
+    single, sharded = _analyzers(databases, monkeypatch)
+    expected = getattr(single, method)()
+    assert len(expected) > 0
+    _assert_same(expected, getattr(sharded, method)())
+
+
+def test_sharded_quantile_histogram_matches_single_database(databases, monkeypatch):
+    single, sharded = _analyzers(databases, monkeypatch)
+    single.histogram_strategy = sharded.histogram_strategy = 'quantile'
+    _assert_same(single.query_histogram(), sharded.query_histogram())
+
+
+def test_sharded_excel_sheets_match_single_database(databases, monkeypatch):
+    single, sharded = _analyzers(databases, monkeypatch)
+    expected, actual = single.prepare_data_for_excel_export(), sharded.prepare_data_for_excel_export()
+    assert set(expected) == set(actual)
+    for sheet in expected:
+        _assert_same(expected[sheet], actual[sheet])
+
+
+def test_sharded_facts_match_single_database(databases, monkeypatch):
+    single, sharded = _analyzers(databases, monkeypatch, source='facts')
+    for method in ('query_horizontal_bar_chart', 'query_scatter_plot', 'prepare_data_for_excel_export'):
+        expected, actual = getattr(single, method)(), getattr(sharded, method)()
+        if isinstance(expected, dict):
+            for sheet in expected:
+                _assert_same(expected[sheet], actual[sheet])
+        else:
+            _assert_same(expected, actual)
+
+
+@pytest.mark.parametrize('dataset, filters', [
+    ('daily', {'split': 'state', 'limit': 40}),
+    ('by-category', {'limit': 3}),
+    ('by-state', {'limit': 5, 'categories': ['Musicals', 'Plays']}),
+    ('top-venues', {'limit': 4}),
+])
+def test_sharded_api_matches_single_database(databases, monkeypatch, dataset, filters):
+    from sales_api import SalesAPI
+    _analyzers(databases, monkeypatch)
+    shards = ShardSet(databases[1])
+    expected = SalesAPI().fetch(dataset, **filters)
+    assert len(expected) == filters['limit']
+    _assert_same(expected, SalesAPI(shards=shards).fetch(dataset, **filters))
+    assert SalesAPI().filter_values() == SalesAPI(shards=shards).filter_values()
+    with pytest.raises(ValueError):
+        SalesAPI(source='rollups', shards=shards)
+
+
+def test_sharded_sources_are_limited(databases):
+    import analytics
+    with pytest.raises(ValueError):
+        analytics.TicketSalesAnalyzer(source='rollups', shards=ShardSet(databases[1]))
+
+
+def test_merge_averages_from_components():
+    frames = [pd.DataFrame({'state': ['CA', 'NY'], 'revenue': [100.0, 10.0], 'total_sales': [1, 1]}),
+              pd.DataFrame({'state': ['CA'], 'revenue': [20.0], 'total_sales': [3]})]
+    merge = Merge(['state'], ['revenue', 'total_sales'], ratios={'avg': ('revenue', 'total_sales')},
+                  order='avg', columns=['state', 'avg'])
+    result = merge.combine(frames)
+    # Среднее CA - 120 / 4, а не среднее средних шардов (100 и 6.67)
+    assert result.to_dict('list') == {'state': ['CA', 'NY'], 'avg': [30.0, 10.0]}
+
+
+def test_merge_filters_and_limits_after_summing():
+    frames = [pd.DataFrame({'venue': ['a', 'b', 'c'], 'events': [5, 4, 1]}),
+              pd.DataFrame({'venue': ['c', 'b'], 'events': [6, 1]})]
+    top = Merge(['venue'], ['events'], order='events', limit=2).combine(frames)
+    # c не входит в топ-2 первого шарда, но в сумме первая
+    assert top.to_dict('list') == {'venue': ['c', 'a'], 'events': [7, 5]}
+    having = Merge(['venue'], ['events'], having={'events': 5}).combine(frames)
+    assert sorted(having['venue']) == ['c']
+
+
+def test_merge_orders_by_several_columns():
+    frames = [pd.DataFrame({'day': [2, 1], 'state': ['NY', 'CA'], 'n': [1, 1]}),
+              pd.DataFrame({'day': [1, 1], 'state': ['NY', 'CA'], 'n': [1, 1]})]
+    result = Merge(['day', 'state'], ['n'], order=['day', 'state'], ascending=[True, True]).combine(frames)
+    assert result.to_dict('list') == {'day': [1, 1, 2], 'state': ['CA', 'NY', 'NY'], 'n': [2, 1, 1]}
+
+
+def test_merge_handles_decimal_and_null_keys():
+    frames = [pd.DataFrame({'state': ['CA', None], 'revenue': [Decimal('1.10'), Decimal('2.00')], 'n': [1, 2]}),
+              pd.DataFrame({'state': [None], 'revenue': [Decimal('0.25')], 'n': [2]})]
+    result = Merge(['state'], ['revenue', 'n'], ratios={'avg': ('revenue', 'n')}, order='revenue').combine(frames)
+    # Строки с NULL в ключе складываются, как одна группа GROUP BY
+    assert len(result) == 2 and result['state'].isna().iloc[0]
+    assert result['revenue'].tolist() == pytest.approx([2.25, 1.10])
+    assert result['avg'].tolist() == pytest.approx([0.5625, 1.10])
+
+
+def test_merge_replicated_and_passthrough():
+    frame = pd.DataFrame({'value': ['b', 'a']})
+    assert Merge(['value'], order='value', ascending=True, replicated=True) \
+        .combine([frame, frame.copy()])['value'].tolist() == ['a', 'b']
+    # Без доводки результат одной базы возвращается как есть
+    assert Merge(['value']).combine([frame]) is frame
+
+
+def test_parse_shard_urls():
+    assert parse_shard_urls(' sqlite:///a.db, ,sqlite:///b.db ') == ['sqlite:///a.db', 'sqlite:///b.db']
+
+
+def _numbers_db(path, maximum):
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE t (n INTEGER)")
+    con.execute("INSERT INTO t VALUES (?)", (maximum,))
+    con.commit()
+    con.close()
+    return f'sqlite:///{path}'
+
+
+# Время запроса растет с max(n): на маленьком шарде - мгновенно, на большом - минуты
+COUNT_QUERY = """
+WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < (SELECT MAX(n) FROM t))
+SELECT COUNT(*) AS n FROM c
+"""
+
+
+@pytest.fixture
+def slow_shards(tmp_path):
+    return [_numbers_db(str(tmp_path / 'fast.sqlite'), 10), _numbers_db(str(tmp_path / 'slow.sqlite'), 10 ** 12)]
+
+
+def _shard_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith('shard')]
+
+
+def test_timeout_cancels_slow_shard(slow_shards):
+    shards = ShardSet(slow_shards, timeout=0.5)
+    started = time.perf_counter()
+    with pytest.raises(ShardError) as error:
+        shards.fetch(COUNT_QUERY, merge=Merge([], ['n']))
+    assert time.perf_counter() - started < 5
+    assert list(error.value.failures) == ['slow.sqlite']
+    assert isinstance(error.value.failures['slow.sqlite'], ShardTimeout)
+    # Запрос прерван драйвером (sqlite3 interrupt), а не брошен выполняться в фоне
+    deadline = time.perf_counter() + 5
+    while _shard_threads() and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    assert not _shard_threads()
+
+
+def test_partial_policy_returns_answered_shards(slow_shards):
+    shards = ShardSet(slow_shards, timeout=0.5, failures='partial')
+    df = shards.fetch(COUNT_QUERY)
+    assert df['n'].tolist() == [10]
+    assert df.attrs['missing_shards'] == ['slow.sqlite']
+    assert list(df.attrs['shard_timings']) == ['fast.sqlite']
+
+
+def test_failed_shard_under_each_policy(tmp_path):
+    urls = [_numbers_db(str(tmp_path / 'ok.sqlite'), 3), f'sqlite:///{tmp_path / "empty.sqlite"}']
+    with pytest.raises(ShardError) as error:
+        ShardSet(urls).fetch("SELECT MAX(n) AS n FROM t")
+    assert list(error.value.failures) == ['empty.sqlite']
+
+    df = ShardSet(urls, failures='partial').fetch("SELECT MAX(n) AS n FROM t")
+    assert df['n'].tolist() == [3] and df.attrs['missing_shards'] == ['empty.sqlite']
+
+
+def test_all_shards_failing_is_an_error_even_when_partial(tmp_path):
+    urls = [f'sqlite:///{tmp_path / "a.sqlite"}', f'sqlite:///{tmp_path / "b.sqlite"}']
+    with pytest.raises(ShardError):
+        ShardSet(urls, failures='partial').fetch("SELECT MAX(n) AS n FROM t")
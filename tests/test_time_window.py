@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from time_window import TimeWindow, parse_window, window_from_args
+
+
+def test_parse_window_formats():
+    assert parse_window('year:2008') == TimeWindow(datetime(2008, 1, 1), datetime(2009, 1, 1))
+    # Конец периода включительно: граница - начало следующего дня
+    assert parse_window('2008-03-01..2008-06-30') == TimeWindow(datetime(2008, 3, 1), datetime(2008, 7, 1))
+    assert parse_window('2008-03-01..') == TimeWindow(start=datetime(2008, 3, 1))
+    assert parse_window('..2008-06-30') == TimeWindow(end=datetime(2008, 7, 1))
+    assert parse_window('') is None
+    assert parse_window('all') is None
+
+
+def test_parse_last_days():
+    window = parse_window('last:30')
+    assert (window.end - window.start).days == 30
+    assert window.end > datetime.now() >= window.start
+
+
+@pytest.mark.parametrize('spec', ['last:0', 'year:abc', '2008-13-01..', '2008-06-30..2008-03-01', 'month:3'])
+def test_parse_window_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_window(spec)
+
+
+def test_clause_is_sargable_range():
+    clause, params = TimeWindow(datetime(2008, 3, 1), datetime(2008, 7, 1)).clause('s.saletime')
+    assert clause == "WHERE s.saletime >= :window_start AND s.saletime < :window_end"
+    assert params == {'window_start': datetime(2008, 3, 1), 'window_end': datetime(2008, 7, 1)}
+
+
+def test_clause_with_open_ends():
+    assert TimeWindow(start=datetime(2008, 3, 1)).clause('l.listtime', 'AND') == \
+        ("AND l.listtime >= :window_start", {'window_start': datetime(2008, 3, 1)})
+    assert TimeWindow(end=datetime(2008, 7, 1)).clause('t', '') == \
+        (" t < :window_end", {'window_end': datetime(2008, 7, 1)})
+    assert TimeWindow().clause('t') == ("", None)
+
+
+def test_clause_matches_mask():
+    times = pd.Series(pd.to_datetime(['2008-02-29 23:59:59', '2008-03-01 00:00:00', '2008-06-30 23:00:00', '2008-07-01 00:00:00']))
+    window = parse_window('2008-03-01..2008-06-30')
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sale (saletime TIMESTAMP)"))
+        conn.execute(text("INSERT INTO sale VALUES (:t)"), [{'t': t.to_pydatetime()} for t in times])
+        clause, params = window.clause('saletime')
+        selected = conn.execute(text(f"SELECT COUNT(*) FROM sale {clause}"), params).scalar()
+    assert selected == window.mask(times).sum() == 2
+
+
+def test_window_from_args():
+    assert window_from_args({'year': '2008'}) == TimeWindow.year(2008)
+    assert window_from_args({'start': '2008-03-01', 'end': '2008-03-31'}) == \
+        TimeWindow(datetime(2008, 3, 1), datetime(2008, 4, 1))
+    assert window_from_args({'window': 'year:2008', 'year': '2007'}) == TimeWindow.year(2008)
+    assert window_from_args({}) is None
@@ -0,0 +1,236 @@
+import io
+import os
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+
+# Размеры таблиц образца TICKIT (масштаб 1x)
+TICKIT_ROWS = {
+    'venue': 202,
+    'user': 49990,
+    'events': 8798,
+    'listing': 192497,
+    'sale': 172456,
+}
+
+CATEGORIES = [
+    (1, 'Sports', 'MLB', 'Major League Baseball'),
+    (2, 'Sports', 'NHL', 'National Hockey League'),
+    (3, 'Sports', 'NFL', 'National Football League'),
+    (4, 'Sports', 'NBA', 'National Basketball Association'),
+    (5, 'Sports', 'MLS', 'Major League Soccer'),
+    (6, 'Shows', 'Musicals', 'Musical theatre'),
+    (7, 'Shows', 'Plays', 'All non-musical theatre'),
+    (8, 'Shows', 'Opera', 'All opera and light opera'),
+    (9, 'Concerts', 'Pop', 'All rock and pop music concerts'),
+    (10, 'Concerts', 'Jazz', 'All jazz singers and bands'),
+    (11, 'Concerts', 'Classical', 'All symphony, concerto, and choir concerts'),
+]
+
+STATES = ['CA', 'NY', 'TX', 'FL', 'IL', 'PA', 'OH', 'MI', 'GA', 'NC', 'NJ', 'VA', 'WA', 'MA',
+          'AZ', 'IN', 'TN', 'MO', 'MD', 'WI', 'MN', 'CO', 'AL', 'SC', 'LA', 'KY', 'OR', 'OK',
+          'CT', 'IA', 'MS', 'AR', 'KS', 'UT', 'NV', 'NM', 'WV', 'NE', 'ID', 'HI', 'ME', 'NH',
+          'RI', 'MT', 'DE', 'SD', 'ND', 'AK', 'VT', 'WY']
+
+YEAR_START = pd.Timestamp('2008-01-01')
+SECONDS_IN_YEAR = 366 * 24 * 3600
+
+TABLE_ORDER = ('category', 'venue', 'user', 'events', 'listing', 'sale')
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_sale_saleid ON sale (saleid)",
+    "CREATE INDEX IF NOT EXISTS ix_sale_eventid ON sale (eventid)",
+    "CREATE INDEX IF NOT EXISTS ix_sale_listid ON sale (listid)",
+    "CREATE INDEX IF NOT EXISTS ix_sale_buyerid ON sale (buyerid)",
+    "CREATE INDEX IF NOT EXISTS ix_sale_saletime ON sale (saletime)",
+    "CREATE INDEX IF NOT EXISTS ix_listing_listid ON listing (listid)",
+    "CREATE INDEX IF NOT EXISTS ix_listing_eventid ON listing (eventid)",
+    "CREATE INDEX IF NOT EXISTS ix_events_eventid ON events (eventid)",
+    "CREATE INDEX IF NOT EXISTS ix_venue_venueid ON venue (venueid)",
+    "CREATE INDEX IF NOT EXISTS ix_user_userid ON \"user\" (userid)",
+    "CREATE INDEX IF NOT EXISTS ix_category_catid ON category (catid)",
+]
+
+
+def table_sizes(scale):
+    """Число строк каждой таблицы при заданном масштабе"""
+    sizes = {name: max(1, int(rows * scale)) for name, rows in TICKIT_ROWS.items()}
+    sizes['category'] = len(CATEGORIES)
+    return sizes
+
+
+def _weights(rng, n, skew=1.2):
+    """Неравномерные веса (популярные площадки, активные покупатели)"""
+    weights = rng.pareto(skew, n) + 1
+    return weights / weights.sum()
+
+
+def generate_dimensions(sizes, rng):
+    """Таблицы-справочники: category, venue, user, events"""
+    category = pd.DataFrame(CATEGORIES, columns=['catid', 'catgroup', 'catname', 'catdesc'])
+
+    n_venues = sizes['venue']
+    venue_states = rng.choice(STATES, n_venues, p=_weights(rng, len(STATES)))
+    venue = pd.DataFrame({
+        'venueid': np.arange(1, n_venues + 1),
+        'venuename': [f'Venue {i}' for i in range(1, n_venues + 1)],
+        'venuecity': [f'City {i % max(1, n_venues // 3)}' for i in range(n_venues)],
+        'venuestate': venue_states,
+        'venueseats': rng.choice([0, 10000, 20000, 40000, 70000], n_venues),
+    })
+
+    n_users = sizes['user']
+    user_ids = np.arange(1, n_users + 1)
+    user = pd.DataFrame({
+        'userid': user_ids,
+        'username': [f'user{i:07d}' for i in user_ids],
+        'firstname': 'First',
+        'lastname': 'Last',
+        'city': [f'City {i % 500}' for i in user_ids],
+        'state': rng.choice(STATES, n_users, p=_weights(rng, len(STATES))),
+        'email': [f'user{i}@example.com' for i in user_ids],
+    })
+
+    n_events = sizes['events']
+    catid = rng.integers(1, len(CATEGORIES) + 1, n_events)
+    starttime = YEAR_START + pd.to_timedelta(rng.integers(0, SECONDS_IN_YEAR, n_events), unit='s')
+    events = pd.DataFrame({
+        'eventid': np.arange(1, n_events + 1),
+        'venueid': rng.choice(venue['venueid'].to_numpy(), n_events, p=_weights(rng, n_venues)),
+        'catid': catid,
+        'eventname': [f'Event {i}' for i in range(1, n_events + 1)],
+        'starttime': starttime.floor('h'),
+    })
+    return {'category': category, 'venue': venue, 'user': user, 'events': events}
+
+
+def generate_listing(sizes, events, rng):
+    """Предложения билетов: цена с хвостом дорогих билетов, время до начала события"""
+    n = sizes['listing']
+    event_index = rng.choice(len(events), n, p=_weights(rng, len(events), skew=2.0))
+    starttime = events['starttime'].to_numpy()[event_index]
+    lead = pd.to_timedelta(rng.integers(3600, 120 * 24 * 3600, n), unit='s').to_numpy()
+    listtime = np.maximum(starttime - lead, YEAR_START.to_datetime64())
+    numtickets = rng.integers(1, 31, n)
+    priceperticket = np.round(np.clip(rng.lognormal(4.3, 0.9, n), 10, 2500), 2)
+    return pd.DataFrame({
+        'listid': np.arange(1, n + 1),
+        'sellerid': rng.integers(1, sizes['user'] + 1, n),
+        'eventid': events['eventid'].to_numpy()[event_index],
+        'numtickets': numtickets,
+        'priceperticket': priceperticket,
+        'totalprice': np.round(numtickets * priceperticket, 2),
+        'listtime': listtime,
+    })
+
+
+def generate_sales(sizes, listing, rng, chunk_rows=1000000):
+    """Продажи частями по chunk_rows строк (генератор DataFrame)"""
+    n_total = sizes['sale']
+    listing_weights = _weights(rng, len(listing), skew=3.0)
+    listid = listing['listid'].to_numpy()
+    eventid = listing['eventid'].to_numpy()
+    sellerid = listing['sellerid'].to_numpy()
+    price = listing['priceperticket'].to_numpy()
+    listtime = listing['listtime'].to_numpy()
+    buyer_weights = _weights(rng, sizes['user'], skew=1.5)
+
+    saleid = 1
+    for start in range(0, n_total, chunk_rows):
+        n = min(chunk_rows, n_total - start)
+        index = rng.choice(len(listing), n, p=listing_weights)
+        qtysold = rng.integers(1, 5, n)
+        pricepaid = np.round(qtysold * price[index], 2)
+        delay = pd.to_timedelta(rng.integers(60, 60 * 24 * 3600, n), unit='s').to_numpy()
+        saletime = np.minimum(listtime[index] + delay, np.datetime64('2008-12-31T23:59:59'))
+        yield pd.DataFrame({
+            'saleid': np.arange(saleid, saleid + n),
+            'listid': listid[index],
+            'sellerid': sellerid[index],
+            'buyerid': rng.choice(sizes['user'], n, p=buyer_weights) + 1,
+            'eventid': eventid[index],
+            'qtysold': qtysold,
+            'pricepaid': pricepaid,
+            'commission': np.round(pricepaid * 0.15, 2),
+            'saletime': saletime,
+        })
+        saleid += n
+
+
+def _copy_postgres(engine, name, df):
+    """Быстрая загрузка в PostgreSQL через COPY"""
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            columns = ', '.join(df.columns)
+            cursor.copy_expert(f'COPY "{name}" ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _write_table(engine, name, df, first_chunk):
+    if engine.dialect.name == 'postgresql':
+        if first_chunk:
+            df.head(0).to_sql(name, engine, index=False, if_exists='replace')
+        _copy_postgres(engine, name, df)
+    else:
+        df.to_sql(name, engine, index=False, if_exists='replace' if first_chunk else 'append',
+                  chunksize=50000)
+
+
+def load_synthetic_tickit(engine, scale=1.0, seed=0, chunk_rows=1000000):
+    """Генерация и загрузка синтетических таблиц TICKIT; возвращает число строк по таблицам"""
+    rng = np.random.default_rng(seed)
+    sizes = table_sizes(scale)
+    started = time.perf_counter()
+
+    tables = generate_dimensions(sizes, rng)
+    tables['listing'] = generate_listing(sizes, tables['events'], rng)
+    for name in TABLE_ORDER[:-1]:
+        _write_table(engine, name, tables[name], first_chunk=True)
+
+    sale_rows = 0
+    for i, chunk in enumerate(generate_sales(sizes, tables['listing'], rng, chunk_rows)):
+        _write_table(engine, 'sale', chunk, first_chunk=i == 0)
+        sale_rows += len(chunk)
+
+    with engine.begin() as conn:
+        for statement in INDEXES:
+            conn.execute(text(statement))
+        conn.execute(text("ANALYZE"))
+
+    rows = {name: len(tables[name]) for name in TABLE_ORDER[:-1]}
+    rows['sale'] = sale_rows
+    print(f"[SUCCESS] Синтетические данные TICKIT x{scale:g} загружены за "
+          f"{time.perf_counter() - started:.1f} с: "
+          + ', '.join(f"{name}={count}" for name, count in rows.items()))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных TICKIT")
+    parser.add_argument('--url', default='sqlite:///data/tickit_sf1.sqlite',
+                        help="база данных для загрузки (SQLAlchemy URL)")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="масштаб относительно образца TICKIT (1, 10, 100)")
+    parser.add_argument('--seed', type=int, default=0, help="зерно генератора случайных чисел")
+    args = parser.parse_args(argv)
+
+    url = make_url(args.url)
+    if url.get_backend_name() == 'sqlite' and url.database and os.path.dirname(url.database):
+        # Каталог файла SQLite (по умолчанию data/) в свежей копии репозитория отсутствует
+        os.makedirs(os.path.dirname(url.database), exist_ok=True)
+    load_synthetic_tickit(create_engine(url), scale=args.scale, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
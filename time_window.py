@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+
+# Год образца TICKIT: окно по умолчанию для графиков за год
+DEFAULT_YEAR = 2008
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+class TimeWindow:
+    """Полуоткрытый период [start, end) по времени продажи; None - граница не задана"""
+
+    def __init__(self, start=None, end=None, label=None):
+        if start is not None and end is not None and start >= end:
+            raise ValueError(f"Пустой период: {start:%Y-%m-%d} - {end:%Y-%m-%d}")
+        self.start = start
+        self.end = end
+        self.label = label or self._describe()
+
+    @classmethod
+    def last_days(cls, days, now=None):
+        """Последние days дней, включая сегодняшний"""
+        if days < 1:
+            raise ValueError(f"Число дней должно быть положительным: {days}")
+        today = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        return cls(today - timedelta(days=days - 1), today + timedelta(days=1), f"последние {days} дн.")
+
+    @classmethod
+    def year(cls, year):
+        return cls(datetime(year, 1, 1), datetime(year + 1, 1, 1), f"{year} год")
+
+    @classmethod
+    def between(cls, start=None, end=None):
+        """Период по датам YYYY-MM-DD, конец включительно"""
+        start = datetime.strptime(start, DATE_FORMAT) if start else None
+        end = datetime.strptime(end, DATE_FORMAT) + timedelta(days=1) if end else None
+        return cls(start, end)
+
+    def _describe(self):
+        start = f"{self.start:%Y-%m-%d}" if self.start else "..."
+        end = f"{self.end - timedelta(days=1):%Y-%m-%d}" if self.end else "..."
+        return f"{start} - {end}"
+
+    def clause(self, column, keyword='WHERE'):
+        """Сравнения по диапазону (используют индекс и отсечение секций) и параметры запроса"""
+        conditions, params = [], {}
+        if self.start is not None:
+            conditions.append(f"{column} >= :window_start")
+            params['window_start'] = self.start
+        if self.end is not None:
+            conditions.append(f"{column} < :window_end")
+            params['window_end'] = self.end
+        if not conditions:
+            return "", None
+        return f"{keyword} " + " AND ".join(conditions), params
+
+    def mask(self, dates):
+        """Булева маска значений Series дат, попадающих в период"""
+        mask = dates.notna()
+        if self.start is not None:
+            mask &= dates >= self.start
+        if self.end is not None:
+            mask &= dates < self.end
+        return mask
+
+    def key(self):
+        """Представление для ключей кэша и отпечатков"""
+        return [self.start.isoformat() if self.start else None, self.end.isoformat() if self.end else None]
+
+    def __eq__(self, other):
+        return isinstance(other, TimeWindow) and (self.start, self.end) == (other.start, other.end)
+
+    def __hash__(self):
+        return hash((self.start, self.end))
+
+    def __repr__(self):
+        return f"TimeWindow({self.label})"
+
+
+def parse_window(spec):
+    """Период из строки: last:30, year:2008, 2008-03-01..2008-06-30 (концы можно опустить)"""
+    spec = (spec or '').strip()
+    if not spec or spec == 'all':
+        return None
+    if spec.startswith('last:'):
+        return TimeWindow.last_days(int(spec[len('last:'):]))
+    if spec.startswith('year:'):
+        return TimeWindow.year(int(spec[len('year:'):]))
+    if '..' in spec:
+        start, end = spec.split('..', 1)
+        return TimeWindow.between(start.strip() or None, end.strip() or None)
+    raise ValueError(f"Неизвестный формат периода: {spec}")
+
+
+def window_from_args(args):
+    """Период из параметров запроса: window=, last_days=, year= или start=/end="""
+    if args.get('window'):
+        return parse_window(args['window'])
+    if args.get('last_days'):
+        return TimeWindow.last_days(int(args['last_days']))
+    if args.get('year'):
+        return TimeWindow.year(int(args['year']))
+    if args.get('start') or args.get('end'):
+        return TimeWindow.between(args.get('start'), args.get('end'))
+    return None
+
+
+def month_starts(start, end):
+    """Начала месяцев от месяца start до месяца end включительно"""
+    current = datetime(start.year, start.month, 1)
+    months = []
+    while current <= end:
+        months.append(current)
+        current = datetime(current.year + (current.month == 12), current.month % 12 + 1, 1)
+    return months
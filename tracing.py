@@ -0,0 +1,276 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import uuid
+import hashlib
+import resource
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+
+DEFAULT_TRACE_DIR = 'traces'
+LAST_RUN_FILE = 'last_run.json'
+
+# Фазы этапа анализа в сводке (в порядке выполнения)
+PHASES = ('query', 'frame_build', 'render', 'write')
+
+# Текущий трассировщик и этап - свои у каждого потока
+_local = threading.local()
+
+
+def new_run_id():
+    """Идентификатор запуска: время и случайный суффикс"""
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+def sql_hash(query):
+    """Короткий хэш нормализованного текста запроса"""
+    normalized = re.sub(r'\s+', ' ', str(query)).strip().rstrip(';').strip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def _rss_mb():
+    """Текущий размер резидентной памяти процесса (Linux), иначе пиковый"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+class Span:
+    """Открытый интервал трассировки; set() добавляет атрибуты (строки, байты, ...)"""
+
+    def __init__(self, name, cat, step, args):
+        self.name = name
+        self.cat = cat
+        self.step = step
+        self.args = args
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+class _NullSpan:
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Сбор интервалов одного запуска анализа и запись трассы в JSON lines и формате Chrome"""
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or new_run_id()
+        self.started_at = datetime.now()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def merge(self, spans):
+        """Добавление интервалов, записанных в другом процессе"""
+        with self._lock:
+            self.spans.extend(spans)
+
+    def summary(self):
+        """Разбивка по этапам: время, процессорное время, строки и байты по фазам"""
+        steps = {}
+        for span in self.spans:
+            if not span['step']:
+                continue
+            step = steps.setdefault(span['step'], {
+                'wall': 0.0, 'peak_rss_mb': 0.0, 'rows': 0, 'bytes': 0, 'raw_bytes': 0, 'queries': 0,
+                **{phase: {'wall': 0.0, 'cpu': 0.0} for phase in PHASES},
+            })
+            step['peak_rss_mb'] = max(step['peak_rss_mb'], span['peak_rss_mb'])
+            name = span['name']
+            if span['cat'] == 'step':
+                step['wall'] += span['dur']
+            elif name == 'render' and span['pid'] != os.getpid():
+                # Параллельный режим: отрисовка в процессе пула идет вне интервала этапа
+                step['wall'] += span['dur']
+            if name in ('query', 'render', 'write'):
+                step[name]['wall'] += span['dur']
+                step[name]['cpu'] += span['cpu']
+                if name == 'query':
+                    step['queries'] += 1
+                    step['rows'] += span['args'].get('rows', 0)
+                    step['bytes'] += span['args'].get('bytes', 0)
+                    # Память результата до приведения типов (у ответов из кэша - та же)
+                    step['raw_bytes'] += span['args'].get('raw_bytes', span['args'].get('bytes', 0))
+            elif name == 'prepare':
+                step['frame_build']['wall'] += span['dur']
+                step['frame_build']['cpu'] += span['cpu']
+
+        for step in steps.values():
+            # Фазы вложены: prepare включает запросы, render - запись файла
+            for outer, inner in (('frame_build', 'query'), ('render', 'write')):
+                for measure in ('wall', 'cpu'):
+                    step[outer][measure] = max(0.0, step[outer][measure] - step[inner][measure])
+        return steps
+
+    def write(self, directory=DEFAULT_TRACE_DIR, keep_runs=20):
+        """Запись трассы (.jsonl и .trace.json) и сводки последнего запуска"""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.run_id)
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span['ts'])
+
+        with open(f'{base}.jsonl', 'w', encoding='utf-8') as f:
+            for span in spans:
+                f.write(json.dumps(span, ensure_ascii=False, default=str) + '\n')
+
+        events = [{
+            'name': span['name'] if span['cat'] == 'step' else f"{span['step'] or ''}:{span['name']}",
+            'cat': span['cat'],
+            'ph': 'X',
+            'ts': span['ts'],
+            'dur': span['dur'] * 1e6,
+            'pid': span['pid'],
+            'tid': span['tid'],
+            'args': dict(span['args'], cpu_ms=round(span['cpu'] * 1000, 3),
+                         rss_mb=round(span['rss_mb'], 1)),
+        } for span in spans]
+        with open(f'{base}.trace.json', 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, default=str)
+
+        summary = {
+            'run_id': self.run_id,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'wall': (max(s['ts'] + s['dur'] * 1e6 for s in spans) - min(s['ts'] for s in spans)) / 1e6
+            if spans else 0.0,
+            'peak_rss_mb': max((s['peak_rss_mb'] for s in spans), default=0.0),
+            'trace_files': [f'{base}.jsonl', f'{base}.trace.json'],
+            'steps': self.summary(),
+        }
+        tmp_path = os.path.join(directory, f'{LAST_RUN_FILE}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, os.path.join(directory, LAST_RUN_FILE))
+
+        runs = sorted(glob.glob(os.path.join(directory, '*.jsonl')), key=os.path.getmtime)
+        for old in runs[:-keep_runs] if keep_runs else []:
+            base_old = old[:-len('.jsonl')]
+            for path in (old, f'{base_old}.trace.json', f'{base_old}.prof', f'{base_old}.html'):
+                if os.path.exists(path):
+                    os.remove(path)
+        print(f"[INFO] Трасса запуска: {base}.trace.json")
+        return summary
+
+
+@contextmanager
+def activate(tracer):
+    """Сделать трассировщик текущим для потока на время блока"""
+    previous = current_tracer()
+    _local.tracer = tracer
+    try:
+        yield tracer
+    finally:
+        _local.tracer = previous
+
+
+def current_tracer():
+    return getattr(_local, 'tracer', None)
+
+
+def current_step():
+    return getattr(_local, 'step', None)
+
+
+@contextmanager
+def span(name, cat='phase', step=None, **args):
+    """Интервал трассировки; без активного трассировщика ничего не записывает"""
+    tracer = current_tracer()
+    if tracer is None:
+        yield _NULL_SPAN
+        return
+
+    previous_step = current_step()
+    step = step or (name if cat == 'step' else previous_step)
+    _local.step = step
+    current = Span(name, cat, step, args)
+    ts = time.time()
+    wall_started = time.perf_counter()
+    cpu_started = time.thread_time()
+    try:
+        yield current
+    except Exception as e:
+        current.args['error'] = str(e)
+        raise
+    finally:
+        _local.step = previous_step
+        tracer.record({
+            'run_id': tracer.run_id,
+            'name': name,
+            'cat': cat,
+            'step': step,
+            'ts': ts * 1e6,
+            'dur': time.perf_counter() - wall_started,
+            'cpu': time.thread_time() - cpu_started,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'rss_mb': _rss_mb(),
+            'peak_rss_mb': _peak_rss_mb(),
+            'args': current.args,
+        })
+
+
+@contextmanager
+def profiled(kind, path):
+    """Необязательный профилировщик на время блока: cprofile или pyinstrument"""
+    if not kind:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if kind == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("[WARNING] pyinstrument не установлен, профилирование отключено")
+            yield
+            return
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(f'{path}.html', 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+            print(f"[INFO] Профиль pyinstrument: {path}.html")
+        return
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(f'{path}.prof')
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+        print(f"[INFO] Профиль cProfile: {path}.prof")
+
+
+def load_last_run(directory=DEFAULT_TRACE_DIR):
+    """Сводка последнего запуска или None"""
+    try:
+        with open(os.path.join(directory, LAST_RUN_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None